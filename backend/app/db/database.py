@@ -4,6 +4,7 @@ from sqlalchemy.pool import QueuePool
 from config.config import get_settings
 import sqlalchemy as sa
 from sqlalchemy.types import UserDefinedType
+import numpy as np
 
 settings = get_settings()
 
@@ -17,7 +18,11 @@ engine = create_engine(
     pool_size=5,
     max_overflow=10,
     pool_timeout=30,
-    pool_pre_ping=True
+    pool_pre_ping=True,
+    # Default vector search settings, so searches using them need no SET first
+    connect_args={
+        "options": f"-c hnsw.ef_search={settings.HNSW_EF_SEARCH} -c ivfflat.probes={settings.IVFFLAT_PROBES}"
+    }
 )
 
 # Enable pgvector extension
@@ -48,6 +53,8 @@ def get_db():
 
 # Custom Vector type for SQLAlchemy
 class Vector(UserDefinedType):
+    cache_ok = True
+
     def __init__(self, dim):
         self.dim = dim
 
@@ -56,12 +63,17 @@ class Vector(UserDefinedType):
 
     def bind_processor(self, dialect):
         def process(value):
-            return value
+            # Send lists and numpy arrays as pgvector text literals
+            if value is None or isinstance(value, str):
+                return value
+            return '[' + ','.join(str(float(v)) for v in value) + ']'
         return process
 
     def result_processor(self, dialect, coltype):
         def process(value):
-            return value
+            if value is None or not isinstance(value, str):
+                return value
+            return np.array(value[1:-1].split(','), dtype=np.float32)
         return process
 
 # Register the vector type
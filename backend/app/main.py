@@ -8,7 +8,12 @@ import uvicorn
 from app.routers import auth, assistant
 from app.models.user import Base
 from app.db.database import engine
-from google.cloud import aiplatform
+from app.services.answer_cache import AnswerCache
+from app.services.embedding_cache import EmbeddingCache
+from app.services.vector_cache import VectorCache
+from app.services.cpu_pool import shutdown_pool
+from app.services.vertex import VertexAIService
+from contextlib import asynccontextmanager
 import os
 
 settings = get_settings()
@@ -16,14 +21,16 @@ settings = get_settings()
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
-# Initialize Vertex AI
-try:
-    aiplatform.init(
-        project=settings.GOOGLE_CLOUD_PROJECT,
-        location=settings.GOOGLE_CLOUD_LOCATION
-    )
-except Exception as e:
-    print(f"Warning: Could not initialize Vertex AI: {e}")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One Vertex AI client per process, shared by every request
+    try:
+        app.state.vertex_service = VertexAIService()
+    except Exception as e:
+        print(f"Warning: Could not initialize Vertex AI: {e}")
+        app.state.vertex_service = None
+    yield
+    shutdown_pool()
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -31,7 +38,8 @@ app = FastAPI(
     description="AI-driven executive assistant API",
     version=settings.VERSION,
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -72,7 +80,7 @@ async def health_check():
             "service": "adam-ai-backend",
             "version": settings.VERSION,
             "environment": settings.ENV,
-            "vertex_ai_status": "initialized" if aiplatform._has_been_initialized else "not_initialized"
+            "vertex_ai_status": "initialized" if app.state.vertex_service is not None else "not_initialized"
         }
     )
 
@@ -88,6 +96,15 @@ async def api_status():
             "email_processing": True,
             "rag": True,
             "style_analysis": True
+        },
+        "metrics": {
+            "embedding_cache": EmbeddingCache.metrics(),
+            "answer_cache": AnswerCache.metrics(),
+            "vector_cache": VectorCache.metrics(),
+            "vertex_single_flight": (
+                app.state.vertex_service.single_flight.metrics()
+                if app.state.vertex_service is not None else None
+            )
         }
     }
 
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
+from app.db.database import Base, Vector
+from datetime import datetime
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = "embedding_cache"
+    
+    content_hash = Column(String(64), primary_key=True)  # SHA-256 of the embedded text
+    model = Column(String, primary_key=True)             # Embedding model the vector came from
+    embedding = Column(Vector(1536), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class AnswerCacheEntry(Base):
+    __tablename__ = "answer_cache"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    scope_hash = Column(String(64), nullable=False)      # Retrieval filters and models the answer was produced with
+    query_hash = Column(String(64), nullable=False)      # SHA-256 of the normalized query
+    chunk_ids_hash = Column(String(64), nullable=False)  # SHA-256 of the sorted retrieved chunk IDs
+    query_embedding = Column(Vector(1536), nullable=False)
+    response = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    
+    __table_args__ = (
+        Index('ix_answer_cache_query', 'user_id', 'scope_hash', 'query_hash'),
+        Index('ix_answer_cache_chunks', 'user_id', 'scope_hash', 'chunk_ids_hash'),
+    )
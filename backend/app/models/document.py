@@ -1,19 +1,34 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Text, Boolean
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, String, DateTime, ForeignKey, JSON, Text, Boolean, Index
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import relationship
 from app.db.database import Base, Vector
 from datetime import datetime
 
 class DocumentChunk(Base):
     __tablename__ = "document_chunks"
+    # One partition per user, see app.services.chunk_partitions. The filter
+    # indexes lead with user_id because the default partition mixes users.
+    __table_args__ = (
+        Index('ix_document_chunks_user_timestamp', 'user_id', 'email_timestamp'),
+        Index('ix_document_chunks_user_sender', 'user_id', 'sender_address', 'email_timestamp'),
+        Index('ix_document_chunks_user_thread', 'user_id', 'thread_id'),
+        Index('ix_document_chunks_labels', 'labels', postgresql_using='gin'),
+        {'postgresql_partition_by': 'LIST (user_id)'}
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
     source_type = Column(String, nullable=False)  # 'email', 'drive', 'calendar'
     source_id = Column(String, nullable=False)    # Original document ID (e.g., email ID)
     chunk_index = Column(Integer, nullable=False) # Position in the original document
     content = Column(Text, nullable=False)        # The actual text chunk
     chunk_metadata = Column(JSON)                 # Additional metadata (subject, sender, etc.)
     embedding = Column(Vector(1536))             # Vector embedding (using 1536 for Vertex AI's dimension)
+    email_timestamp = Column(DateTime)           # When the email was sent; used for search filters
+    sender = Column(String)                      # From header of the email
+    sender_address = Column(String)              # Lowercased address from the From header
+    thread_id = Column(String)                   # Gmail thread ID
+    labels = Column(ARRAY(String))               # Gmail labels
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -21,7 +36,7 @@ class DocumentChunk(Base):
     
     class Config:
         indexes = [
-            ("embedding", "vector_l2_ops")  # Index for vector similarity search
+            ("embedding", "vector_l2_ops")  # HNSW index in each user's partition
         ]
 
 class EmailMetadata(Base):
@@ -37,7 +52,28 @@ class EmailMetadata(Base):
     timestamp = Column(DateTime)
     labels = Column(JSON)      # Gmail labels
     is_processed = Column(Boolean, default=False)
+    canonical_email_id = Column(String)  # Near-duplicate of this email, whose chunks stand in for it
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
-    user = relationship("User", back_populates="email_metadata") 
\ No newline at end of file
+    user = relationship("User", back_populates="email_metadata")
+
+class EmailFingerprint(Base):
+    __tablename__ = "email_fingerprints"
+    
+    email_id = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    simhash = Column(BigInteger, nullable=False)  # 64-bit SimHash of the cleaned body, stored signed
+    band_0 = Column(SmallInteger, nullable=False)  # 8-bit slices of the SimHash for candidate lookup
+    band_1 = Column(SmallInteger, nullable=False)
+    band_2 = Column(SmallInteger, nullable=False)
+    band_3 = Column(SmallInteger, nullable=False)
+    band_4 = Column(SmallInteger, nullable=False)
+    band_5 = Column(SmallInteger, nullable=False)
+    band_6 = Column(SmallInteger, nullable=False)
+    band_7 = Column(SmallInteger, nullable=False)
+    
+    __table_args__ = tuple(
+        Index(f"ix_email_fingerprints_user_band_{i}", "user_id", f"band_{i}")
+        for i in range(8)
+    ) 
\ No newline at end of file
@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index, text
+from sqlalchemy.dialects.postgresql import JSON
+from app.db.database import Base
+from datetime import datetime
+
+# Statuses that hold the per-user slot for a job kind
+ACTIVE_JOB_STATUSES = ('queued', 'running')
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    kind = Column(String(32), nullable=False)               # 'sync', 'backfill' or 'style'
+    status = Column(String(16), nullable=False, default='queued')  # queued, running, succeeded, failed
+    params = Column(JSON, default=dict)
+    progress = Column(JSON, default=dict)                   # Stats checkpointed while the job runs
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)  # Not claimable before this
+    locked_by = Column(String)                              # Worker holding the job
+    locked_at = Column(DateTime)                            # Last heartbeat from that worker
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # At most one queued or running job of each kind per user
+        Index(
+            "uq_ingestion_jobs_active",
+            "user_id",
+            "kind",
+            unique=True,
+            postgresql_where=text("status IN ('queued', 'running')")
+        ),
+        Index("ix_ingestion_jobs_claim", "status", "run_after"),
+    )
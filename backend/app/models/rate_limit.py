@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime
+from app.db.database import Base
+
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limit_buckets"
+    
+    key = Column(String, primary_key=True)  # e.g. 'gmail:global' or 'vertex:user:42'
+    tokens = Column(Float, nullable=False)  # Negative while a large request is being paid off
+    updated_at = Column(DateTime, nullable=False)  # UTC, from the database clock
+    blocked_until = Column(DateTime)        # Set from 429s and Retry-After
+    strikes = Column(Integer, nullable=False, default=0)  # Consecutive 429s, for backoff
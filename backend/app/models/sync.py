@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from app.db.database import Base
+from datetime import datetime
+
+class MailboxSyncState(Base):
+    __tablename__ = "mailbox_sync_state"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    history_id = Column(String)          # Gmail historyId the next incremental sync starts from
+    last_synced_at = Column(DateTime)
+    backfill_page_token = Column(String)  # First unpersisted page of an interrupted backfill
+    backfill_started_at = Column(DateTime)
+    backfill_completed_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,14 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.db.database import get_db
 from app.models.user import User
-from app.routers.auth import get_current_user
-from app.services.gmail import GmailService
-from app.services.email_processor import EmailProcessor
+from app.routers.auth import get_current_user, get_current_superuser
+from app.services.job_queue import JobQueue
 from app.services.rag import RAGService
-from app.services.vertex import VertexAIService
-from typing import Dict, List, Optional
+from app.services.style_profile import StyleProfileService
+from app.services.vector_search import ChunkFilters, SearchOptions
+from app.services.vertex import VertexAIService, get_vertex_service
+from typing import AsyncIterator, Dict, List, Optional
 from pydantic import BaseModel
+import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/assistant",
@@ -19,38 +25,36 @@ class QueryRequest(BaseModel):
     query: str
     time_window_days: Optional[int] = None
     source_type: Optional[str] = None
+    search: Optional[SearchOptions] = None  # Overrides the deployment's vector search settings
+    filters: Optional[ChunkFilters] = None  # Sender, thread, labels and date range of the emails searched
 
 class ProcessEmailsRequest(BaseModel):
     max_emails: Optional[int] = 100
+    backfill: bool = False  # Ingest the whole inbox instead of the newest max_emails
 
 @router.post("/process-emails")
 async def process_emails(
     request: ProcessEmailsRequest,
-    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Process user's emails in the background."""
+    """Queue processing of the user's emails for the ingestion workers."""
     try:
-        # Initialize services
-        vertex_service = VertexAIService()
-        gmail_service = GmailService({
-            'access_token': current_user.access_token,
-            'refresh_token': current_user.refresh_token
-        })
-        email_processor = EmailProcessor(db, vertex_service)
+        job_queue = JobQueue(db)
         
-        # Add email processing to background tasks
-        background_tasks.add_task(
-            email_processor.process_emails,
-            current_user.id,
-            gmail_service,
-            request.max_emails
-        )
+        if request.backfill:
+            job = job_queue.enqueue(current_user.id, 'backfill')
+        else:
+            job = job_queue.enqueue(
+                current_user.id,
+                'sync',
+                {'max_emails': request.max_emails}
+            )
         
         return {
-            "message": "Email processing started",
-            "status": "processing"
+            "message": "Email processing queued",
+            "status": job.status,
+            "job_id": job.id
         }
         
     except Exception as e:
@@ -59,16 +63,46 @@ async def process_emails(
             detail=f"Error starting email processing: {str(e)}"
         )
 
+@router.get("/jobs")
+async def list_jobs(
+    limit: int = 20,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """List the user's recent ingestion jobs with their progress."""
+    jobs = JobQueue(db).list_jobs(current_user.id, min(limit, 100))
+    return {"jobs": [JobQueue.describe(job) for job in jobs]}
+
+@router.get("/jobs/summary")
+async def jobs_summary(
+    current_user: User = Depends(get_current_superuser),
+    db: Session = Depends(get_db)
+):
+    """Aggregate ingestion status across all users."""
+    return JobQueue(db).summary()
+
+@router.get("/jobs/{job_id}")
+async def get_job(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Report an ingestion job's counters, per-stage throughput and ETA."""
+    job = JobQueue(db).get_job(job_id)
+    if job is None or (job.user_id != current_user.id and not current_user.is_superuser):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobQueue.describe(job)
+
 @router.post("/query")
 async def query_assistant(
     request: QueryRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    vertex_service: VertexAIService = Depends(get_vertex_service)
 ):
     """Query the assistant using RAG."""
     try:
         # Initialize services
-        vertex_service = VertexAIService()
         rag_service = RAGService(db, vertex_service)
         
         # Process query
@@ -76,7 +110,9 @@ async def query_assistant(
             user_id=current_user.id,
             query=request.query,
             time_window_days=request.time_window_days,
-            source_type=request.source_type
+            source_type=request.source_type,
+            search=request.search,
+            filters=request.filters
         )
         
         return {
@@ -89,24 +125,96 @@ async def query_assistant(
             detail=f"Error processing query: {str(e)}"
         )
 
+@router.post("/query/stream")
+async def stream_query_assistant(
+    request: QueryRequest,
+    http_request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    vertex_service: VertexAIService = Depends(get_vertex_service)
+):
+    """Query the assistant using RAG, streaming the answer as server-sent events.
+
+    Emits one ``sources`` event with the retrieved chunks' metadata, then a
+    ``token`` event per piece of generated text and a final ``done`` event
+    (or ``error`` if generation fails). Generation stops when the client
+    disconnects.
+    """
+    try:
+        rag_service = RAGService(db, vertex_service)
+        
+        # Retrieve up front so lookup errors still surface as an HTTP error
+        # and the database session is not needed while streaming
+        chunks = await rag_service.retrieve(
+            user_id=current_user.id,
+            query=request.query,
+            time_window_days=request.time_window_days,
+            source_type=request.source_type,
+            search=request.search,
+            filters=request.filters
+        )
+        sources = RAGService.describe_sources(chunks)
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing query: {str(e)}"
+        )
+    
+    async def events() -> AsyncIterator[str]:
+        yield _sse_event("sources", {"sources": sources})
+        
+        tokens = rag_service.stream_answer(request.query, chunks)
+        try:
+            async for token in tokens:
+                if await http_request.is_disconnected():
+                    logger.info(f"Client disconnected, cancelling answer for user {current_user.id}")
+                    return
+                yield _sse_event("token", {"text": token})
+            yield _sse_event("done", {})
+        except Exception as e:
+            logger.error(f"Error streaming query response: {str(e)}")
+            yield _sse_event("error", {"detail": f"Error processing query: {str(e)}"})
+        finally:
+            # Closes the upstream Vertex stream if we stopped early
+            await tokens.aclose()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Keep reverse proxies from buffering the stream
+        }
+    )
+
+def _sse_event(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @router.get("/analyze-style")
 async def analyze_writing_style(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Analyze the user's writing style."""
+    """Return the user's stored writing-style profile.
+
+    Profiles are built and refreshed by background ``style`` jobs; if none
+    exists yet, one is queued and its job ID returned.
+    """
     try:
-        # Initialize services
-        vertex_service = VertexAIService()
-        rag_service = RAGService(db, vertex_service)
+        profile = StyleProfileService(db).get_profile(current_user)
+        if profile is None:
+            job = JobQueue(db).enqueue(current_user.id, 'style')
+            return {
+                "message": "Style analysis queued",
+                "status": job.status,
+                "job_id": job.id
+            }
         
-        # Analyze style
-        style_analysis = await rag_service.analyze_user_style(current_user.id)
-        
-        return style_analysis
+        return profile
         
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error analyzing writing style: {str(e)}"
-        ) 
\ No newline at end of file
+        )
@@ -53,6 +53,11 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except jwt.JWTError:
         raise HTTPException(status_code=401, detail="Could not validate credentials")
 
+async def get_current_superuser(current_user: User = Depends(get_current_user)):
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    return current_user
+
 @router.get("/me")
 async def get_user_info(current_user: User = Depends(get_current_user)):
     """Get current user information"""
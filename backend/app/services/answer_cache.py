@@ -0,0 +1,132 @@
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+import json
+import re
+import numpy as np
+from sqlalchemy import Float, delete, literal, select
+from sqlalchemy.orm import Session
+from app.db.database import Vector
+from app.models.cache import AnswerCacheEntry
+from app.services.embedding_cache import content_hash
+from config.config import get_settings
+import logging
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+def normalize_query(query: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r'\s+', ' ', query.lower()).strip().rstrip('?.!').strip()
+
+class AnswerCache:
+    """Generated RAG answers, stored in Postgres per user.
+
+    A query is answered from the cache when its normalized text matches a
+    cached one (before any embedding or retrieval), or when retrieval
+    returned the same chunks for a query whose embedding is within
+    ``ANSWER_CACHE_MAX_DISTANCE`` of a cached one. Entries expire after
+    ``ANSWER_CACHE_TTL_SECONDS`` and all of a user's entries are dropped
+    whenever new chunks are written for them.
+
+    ``scope`` holds everything besides the query that shapes the answer
+    (retrieval filters, model names); only entries with the same scope match.
+    """
+
+    _metrics: Dict[str, int] = {'exact_hits': 0, 'semantic_hits': 0, 'misses': 0}
+
+    def __init__(self, db: Session, scope: Dict):
+        self.db = db
+        self.scope_hash = content_hash(json.dumps(scope, sort_keys=True, default=str))
+        self.ttl = timedelta(seconds=settings.ANSWER_CACHE_TTL_SECONDS)
+
+    def get(self, user_id: int, query: str) -> Optional[str]:
+        """Return the cached answer to the same normalized query, if any."""
+        response = self.db.scalar(
+            select(AnswerCacheEntry.response)
+            .where(
+                AnswerCacheEntry.user_id == user_id,
+                AnswerCacheEntry.scope_hash == self.scope_hash,
+                AnswerCacheEntry.query_hash == content_hash(normalize_query(query)),
+                AnswerCacheEntry.expires_at > datetime.utcnow()
+            )
+            .order_by(AnswerCacheEntry.created_at.desc())
+            .limit(1)
+        )
+        if response is not None:
+            self._metrics['exact_hits'] += 1
+        return response
+
+    def get_similar(self, user_id: int, query_embedding: np.ndarray, chunk_ids: List[int]) -> Optional[str]:
+        """Return the answer to a near-duplicate query that retrieved the same chunks."""
+        distance = AnswerCacheEntry.query_embedding.op('<=>', return_type=Float)(
+            literal(query_embedding, Vector(1536))
+        )
+        response = self.db.scalar(
+            select(AnswerCacheEntry.response)
+            .where(
+                AnswerCacheEntry.user_id == user_id,
+                AnswerCacheEntry.scope_hash == self.scope_hash,
+                AnswerCacheEntry.chunk_ids_hash == self._chunk_ids_hash(chunk_ids),
+                AnswerCacheEntry.expires_at > datetime.utcnow(),
+                distance <= settings.ANSWER_CACHE_MAX_DISTANCE
+            )
+            .order_by(distance)
+            .limit(1)
+        )
+        self._metrics['semantic_hits' if response is not None else 'misses'] += 1
+        return response
+
+    def put(
+        self,
+        user_id: int,
+        query: str,
+        query_embedding: np.ndarray,
+        chunk_ids: List[int],
+        response: str
+    ) -> None:
+        """Store a generated answer; failures are logged rather than raised."""
+        now = datetime.utcnow()
+        try:
+            self.db.add(AnswerCacheEntry(
+                user_id=user_id,
+                scope_hash=self.scope_hash,
+                query_hash=content_hash(normalize_query(query)),
+                chunk_ids_hash=self._chunk_ids_hash(chunk_ids),
+                query_embedding=query_embedding,
+                response=response,
+                created_at=now,
+                expires_at=now + self.ttl
+            ))
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error caching answer for user {user_id}: {str(e)}")
+
+    @staticmethod
+    def invalidate(db: Session, user_id: int) -> None:
+        """Drop a user's cached answers as part of the caller's transaction."""
+        db.execute(delete(AnswerCacheEntry).where(AnswerCacheEntry.user_id == user_id))
+
+    @staticmethod
+    def purge_expired(db: Session) -> int:
+        """Delete expired entries and return how many."""
+        result = db.execute(
+            delete(AnswerCacheEntry).where(AnswerCacheEntry.expires_at <= datetime.utcnow())
+        )
+        db.commit()
+        logger.info(f"Purged {result.rowcount} expired answer cache entries")
+        return result.rowcount
+
+    @classmethod
+    def metrics(cls) -> Dict:
+        """Lookup counts and hit rate for this process since startup."""
+        lookups = sum(cls._metrics.values())
+        hits = lookups - cls._metrics['misses']
+        return {
+            **cls._metrics,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0
+        }
+
+    @staticmethod
+    def _chunk_ids_hash(chunk_ids: List[int]) -> str:
+        return content_hash(','.join(str(chunk_id) for chunk_id in sorted(chunk_ids)))
@@ -0,0 +1,238 @@
+from typing import List, Set
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.services.vector_search import index_definition, index_name
+from config.config import get_settings
+import logging
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARTITION = 'document_chunks_default'
+
+# Namespace for the advisory locks serializing partition changes for one user
+PARTITION_LOCK_NAMESPACE = 21
+
+class ChunkPartitions:
+    """Per-user partitions of ``document_chunks``.
+
+    ``document_chunks`` is list-partitioned by ``user_id``. Each user gets
+    a partition with its own vector index (HNSW by default, see
+    ``VECTOR_INDEX_TYPE``), so a vector search only walks the graph of that
+    user's chunks. Rows of users without a partition land in
+    ``document_chunks_default``, which holds the pre-partitioning data
+    until ``move_user`` moves them out; see
+    ``scripts/partition_document_chunks.py``.
+    """
+
+    _known: Set[int] = set()  # Users known to have a partition in this process
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def partition_name(user_id: int) -> str:
+        return f"document_chunks_u{int(user_id)}"
+
+    def has_partition(self, user_id: int) -> bool:
+        if user_id in self._known:
+            return True
+        exists = self.db.scalar(
+            text("""
+            SELECT EXISTS (
+                SELECT 1 FROM pg_inherits
+                WHERE inhrelid = to_regclass(:name)
+                  AND inhparent = 'document_chunks'::regclass
+            )
+            """),
+            {"name": self.partition_name(user_id)}
+        )
+        if exists:
+            self._known.add(user_id)
+        return exists
+
+    def ensure(self, user_id: int) -> bool:
+        """Create an empty partition for a user who has no chunks yet.
+
+        Users whose chunks are still in the default partition are left
+        there for ``move_user``. Returns whether the user has a partition.
+        """
+        if self.has_partition(user_id):
+            return True
+        try:
+            self._lock(user_id)
+            if self.has_partition(user_id) or self._in_default(user_id):
+                self.db.commit()
+                return self.has_partition(user_id)
+
+            name = self.partition_name(user_id)
+            self.db.execute(text(
+                f"CREATE TABLE {name} PARTITION OF document_chunks FOR VALUES IN ({int(user_id)})"
+            ))
+            self._create_indexes(name)
+            self.db.commit()
+            self._known.add(user_id)
+            logger.info(f"Created chunk partition {name}")
+            return True
+
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error creating chunk partition for user {user_id}: {str(e)}")
+            raise
+
+    def move_user(self, user_id: int, batch_size: int = 5000) -> int:
+        """Move a user's chunks from the default partition into their own; returns rows moved.
+
+        Rows are copied into a standalone table in batches and indexed there
+        while searches keep reading the default partition. A final short
+        transaction copies rows added meanwhile, deletes the originals and
+        attaches the table, so searches never see a partial mailbox.
+        That transaction locks the default partition against writes before
+        its last copy, as ingestion does not take the user's partition lock,
+        and attaching rechecks the default partition, which briefly blocks
+        access to the users still in it.
+        """
+        name = self.partition_name(user_id)
+        try:
+            self._lock(user_id)
+            if self.has_partition(user_id):
+                self.db.commit()
+                return 0
+
+            self.db.execute(text(f"DROP TABLE IF EXISTS {name}"))  # Left over from an interrupted move
+            self.db.execute(text(
+                f"CREATE TABLE {name} (LIKE document_chunks INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING INDEXES)"
+            ))
+            # Lets ATTACH skip scanning the new partition
+            self.db.execute(text(
+                f"ALTER TABLE {name} ADD CONSTRAINT {name}_user_check CHECK (user_id = {int(user_id)})"
+            ))
+            self.db.commit()
+
+            last_id = 0
+            moved = 0
+            while True:
+                self._lock(user_id)
+                copied = self._copy_batch(name, user_id, last_id, batch_size)
+                self.db.commit()
+                if not copied:
+                    break
+                moved += len(copied)
+                last_id = max(copied)
+
+            self._create_indexes(name, moved)
+            self.db.commit()
+
+            self._lock(user_id)
+            # Rows inserted after the last copy would be lost to the DELETE below
+            self.db.execute(text(f"LOCK TABLE {DEFAULT_PARTITION} IN SHARE ROW EXCLUSIVE MODE"))
+            while True:
+                copied = self._copy_batch(name, user_id, last_id, batch_size)
+                if not copied:
+                    break
+                moved += len(copied)
+                last_id = max(copied)
+            self.db.execute(
+                text(f"DELETE FROM {DEFAULT_PARTITION} WHERE user_id = :user_id"),
+                {"user_id": user_id}
+            )
+            self.db.execute(text(
+                f"ALTER TABLE document_chunks ATTACH PARTITION {name} FOR VALUES IN ({int(user_id)})"
+            ))
+            self.db.execute(text(f"ALTER TABLE {name} DROP CONSTRAINT {name}_user_check"))
+            self.db.commit()
+            self._known.add(user_id)
+            logger.info(f"Moved {moved} chunks for user {user_id} into {name}")
+            return moved
+
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error moving chunks for user {user_id}: {str(e)}")
+            raise
+
+    def users_in_default(self) -> List[int]:
+        """Users with chunks still in the default partition, smallest first."""
+        return list(self.db.scalars(text(
+            f"SELECT user_id FROM {DEFAULT_PARTITION} GROUP BY user_id ORDER BY count(*), user_id"
+        )))
+
+    def partitioned_users(self) -> List[int]:
+        """Users that have their own partition."""
+        names = self.db.scalars(text("""
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'document_chunks'::regclass
+              AND c.relname <> :default_partition
+        """), {"default_partition": DEFAULT_PARTITION})
+        prefix = self.partition_name(0)[:-1]
+        return sorted(int(name[len(prefix):]) for name in names)
+
+    def _lock(self, user_id: int) -> None:
+        """Hold the user's partition lock until the end of the current transaction."""
+        self.db.execute(
+            text("SELECT pg_advisory_xact_lock(:namespace, :user_id)"),
+            {"namespace": PARTITION_LOCK_NAMESPACE, "user_id": user_id}
+        )
+
+    def _in_default(self, user_id: int) -> bool:
+        return self.db.scalar(
+            text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE user_id = :user_id)"),
+            {"user_id": user_id}
+        )
+
+    def _copy_batch(self, name: str, user_id: int, after_id: int, batch_size: int) -> List[int]:
+        return list(self.db.scalars(
+            text(f"""
+            INSERT INTO {name}
+            SELECT * FROM {DEFAULT_PARTITION}
+            WHERE user_id = :user_id AND id > :after_id
+            ORDER BY id
+            LIMIT :batch_size
+            RETURNING id
+            """),
+            {"user_id": user_id, "after_id": after_id, "batch_size": batch_size}
+        ))
+
+    def rebuild_indexes(self, user_id: int) -> bool:
+        """Give a user's partition the configured vector index and drop any others.
+
+        Needed after changing ``VECTOR_SIMILARITY_METRIC`` or
+        ``VECTOR_INDEX_TYPE``, or to re-cluster an ivfflat index once the
+        partition has grown. Indexes are built concurrently, so searches
+        and ingestion continue meanwhile. Returns whether an index was built.
+        """
+        if not self.has_partition(user_id):
+            return False
+        built = self._rebuild_table_indexes(self.partition_name(user_id))
+        logger.info(f"Vector index for user {user_id} is {index_name(self.partition_name(user_id))}")
+        return built
+
+    def rebuild_default_indexes(self) -> bool:
+        """Like ``rebuild_indexes``, for the users still in the default partition."""
+        built = self._rebuild_table_indexes(DEFAULT_PARTITION)
+        logger.info(f"Vector index for the default partition is {index_name(DEFAULT_PARTITION)}")
+        return built
+
+    def _rebuild_table_indexes(self, name: str) -> bool:
+        wanted = index_name(name)
+        self.db.commit()
+        with self.db.get_bind().connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            existing = set(conn.scalars(
+                text("""
+                SELECT indexname FROM pg_indexes
+                WHERE tablename = :table AND indexdef LIKE '%(embedding %'
+                """),
+                {"table": name}
+            ))
+            built = wanted not in existing
+            if built:
+                rows = conn.scalar(text(f"SELECT count(*) FROM {name}"))
+                conn.execute(text(f"CREATE INDEX CONCURRENTLY {wanted} ON {name} {index_definition(name, rows=rows)}"))
+            for index in existing - {wanted}:
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index}"))
+        return built
+
+    def _create_indexes(self, name: str, rows: int = 0) -> None:
+        self.db.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {index_name(name)} ON {name} {index_definition(name, rows=rows)}"
+        ))
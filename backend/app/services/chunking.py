@@ -0,0 +1,130 @@
+from typing import Deque, Iterable, Iterator, List
+from collections import deque
+import re
+
+# Patterns are compiled once; none of them use DOTALL scans to the end of the text
+SIGNATURE_PATTERN = re.compile(r'--\s*\n')
+NESTED_QUOTE_PATTERN = re.compile(r'>\s*>')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+SENTENCE_BOUNDARY_PATTERN = re.compile(r'(?<=[.!?])\s+')
+
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """Approximate model tokens from length (about four characters per token)."""
+    return tokens_for_chars(len(text))
+
+def tokens_for_chars(chars: int) -> int:
+    return (chars + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def clean_text(text: str) -> str:
+    """Strip signatures and quoted replies from an email body and collapse whitespace.
+
+    Each rule truncates the text at its first match, in order: a ``--``
+    signature separator, an ``On ... wrote:`` reply header, then nested ``>``
+    quoting. Every rule is a single linear search.
+    """
+    match = SIGNATURE_PATTERN.search(text)
+    if match:
+        text = text[:match.start()]
+
+    # First "On" that is followed somewhere by "wrote:"
+    wrote = text.rfind('wrote:')
+    if wrote != -1:
+        on = text.find('On', 0, wrote)
+        if on != -1:
+            text = text[:on]
+
+    match = NESTED_QUOTE_PATTERN.search(text)
+    if match:
+        text = text[:match.start()]
+
+    return WHITESPACE_PATTERN.sub(' ', text).strip()
+
+def iter_sentences(pieces: Iterable[str]) -> Iterator[str]:
+    """Yield sentences from text that arrives in pieces, holding at most one partial sentence.
+
+    Each piece is scanned once: the search resumes where the previous one
+    ended, or at a trailing whitespace run the next piece may continue.
+    """
+    buffer = ''
+    scan_from = 0
+    for piece in pieces:
+        buffer += piece
+        start = 0
+        resume = len(buffer)
+        # Searching from an offset still lets the lookbehind see the character before it
+        for match in SENTENCE_BOUNDARY_PATTERN.finditer(buffer, scan_from):
+            if match.end() == len(buffer):
+                # The next piece may continue this whitespace run
+                resume = match.start()
+                break
+            if match.start() > start:
+                yield buffer[start:match.start()]
+            start = match.end()
+        buffer = buffer[start:]
+        scan_from = resume - start
+
+    buffer = buffer.strip()
+    if buffer:
+        yield buffer
+
+class TextChunker:
+    """Groups sentences into chunks sized in estimated model tokens.
+
+    Chunks hold up to ``chunk_tokens`` tokens, counting the spaces sentences
+    are joined with, and each new chunk starts with the trailing sentences
+    of the previous one, up to ``overlap_tokens``.
+    Sentences longer than a chunk are split on whitespace. The text is read
+    once, and only the sentences of the current chunk are kept in memory.
+    """
+
+    def __init__(self, chunk_tokens: int, overlap_tokens: int):
+        if overlap_tokens >= chunk_tokens:
+            raise ValueError("overlap_tokens must be smaller than chunk_tokens")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def chunk(self, text: str) -> List[str]:
+        """Split already-cleaned text into chunks."""
+        return list(self.iter_chunks([text]))
+
+    def iter_chunks(self, pieces: Iterable[str]) -> Iterator[str]:
+        """Yield chunks from already-cleaned text that arrives in pieces."""
+        window: Deque[str] = deque()
+        window_chars = 0  # Length of the window's parts joined with spaces
+        has_new = False  # Whether the window holds anything not yet emitted
+
+        def tokens_with(part: str) -> int:
+            return tokens_for_chars(window_chars + 1 + len(part) if window else len(part))
+
+        for sentence in iter_sentences(pieces):
+            for part in self._split_long(sentence):
+                if has_new and tokens_with(part) > self.chunk_tokens:
+                    yield ' '.join(window)
+                    has_new = False
+                    # Keep the tail of the chunk as overlap, leaving room for this part
+                    while window and (
+                        tokens_for_chars(window_chars) > self.overlap_tokens
+                        or tokens_with(part) > self.chunk_tokens
+                    ):
+                        window_chars -= len(window.popleft()) + (1 if window else 0)
+
+                window_chars += len(part) + (1 if window else 0)
+                window.append(part)
+                has_new = True
+
+        if has_new:
+            yield ' '.join(window)
+
+    def _split_long(self, sentence: str) -> Iterator[str]:
+        """Split a sentence longer than one chunk on whitespace."""
+        max_chars = self.chunk_tokens * CHARS_PER_TOKEN
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(' ', 0, max_chars + 1)
+            if cut <= 0:
+                cut = max_chars
+            yield sentence[:cut]
+            sentence = sentence[cut:].lstrip()
+        if sentence:
+            yield sentence
@@ -0,0 +1,79 @@
+from typing import Dict, List, Optional, Set, Tuple
+import logging
+from sqlalchemy.engine import Row
+from app.services.chunking import WHITESPACE_PATTERN, estimate_tokens, iter_sentences
+from config.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+class ContextPacker:
+    """Turns retrieved chunks into prompt context that fits a token budget.
+
+    Chunks from the same source become one passage, placed at the rank of
+    that source's best chunk. Within a passage, chunks are put back in
+    document order and consecutive ones are joined, so the overlap the
+    chunker repeats at their boundaries appears once. Any sentence already
+    included (from overlap, or from text quoted across a thread) is left
+    out. Passages are added in rank order until ``max_tokens`` is reached.
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None):
+        self.max_tokens = max_tokens or settings.RAG_CONTEXT_MAX_TOKENS
+
+    def pack(self, chunks: List[Row]) -> List[str]:
+        """Return one context passage per source, most relevant first."""
+        seen: Set[str] = set()
+        passages: List[str] = []
+        used = 0
+
+        for group in self._group_by_source(chunks):
+            segments: List[str] = []
+            sentences: List[str] = []
+            previous_index = None
+            full = False
+
+            for chunk in group:
+                if previous_index is not None and chunk.chunk_index != previous_index + 1 and sentences:
+                    # Not adjacent to the previous chunk: mark the gap
+                    segments.append(' '.join(sentences))
+                    sentences = []
+                previous_index = chunk.chunk_index
+
+                for sentence in iter_sentences([chunk.content]):
+                    key = WHITESPACE_PATTERN.sub(' ', sentence).strip().lower()
+                    if key in seen:
+                        continue
+                    tokens = estimate_tokens(sentence) + 1
+                    if used + tokens > self.max_tokens:
+                        full = True
+                        break
+                    seen.add(key)
+                    sentences.append(sentence)
+                    used += tokens
+                if full:
+                    break
+
+            if sentences:
+                segments.append(' '.join(sentences))
+            if segments:
+                passages.append(' ... '.join(segments))
+            if full:
+                break
+
+        logger.debug(
+            f"Packed {len(chunks)} chunks ({sum(estimate_tokens(chunk.content) for chunk in chunks)} tokens) "
+            f"into {len(passages)} passages ({used} tokens)"
+        )
+        return passages
+
+    @staticmethod
+    def _group_by_source(chunks: List[Row]) -> List[List[Row]]:
+        """Group chunks by source in rank order of each source's best chunk, chunks in document order."""
+        groups: Dict[Tuple[str, str], List[Row]] = {}
+        for chunk in chunks:
+            groups.setdefault((chunk.source_type, chunk.source_id), []).append(chunk)
+        return [
+            sorted(group, key=lambda chunk: chunk.chunk_index)
+            for group in groups.values()
+        ]
@@ -0,0 +1,71 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import multiprocessing
+from app.services.chunking import TextChunker, clean_text
+from app.services.mime import parse_message
+from app.services.near_duplicate import simhash
+from config.config import get_settings
+import logging
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def get_pool() -> Optional[ProcessPoolExecutor]:
+    """Return the shared ingest process pool, or None when INGEST_PROCESS_WORKERS is 0."""
+    global _pool
+    if _pool is None and settings.INGEST_PROCESS_WORKERS > 0:
+        # spawn avoids forking a process that holds DB connections and running threads
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.INGEST_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+        logger.info(f"Started ingest process pool with {settings.INGEST_PROCESS_WORKERS} workers")
+    return _pool
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+async def run_batched(fn: Callable[..., List[Any]], items: List[Any], *args: Any) -> List[Any]:
+    """Apply ``fn(batch, *args)`` to ``items`` in batches and concatenate the results.
+
+    With a process pool the batches run in parallel on other cores and the
+    event loop stays free; without one ``fn`` runs inline on the whole list.
+    ``fn`` must be a module-level function so it can be pickled.
+    """
+    if not items:
+        return []
+
+    pool = get_pool()
+    if pool is None:
+        return fn(items, *args)
+
+    loop = asyncio.get_running_loop()
+    size = settings.INGEST_PROCESS_BATCH_SIZE
+    results = await asyncio.gather(*(
+        loop.run_in_executor(pool, fn, items[i:i + size], *args)
+        for i in range(0, len(items), size)
+    ))
+    return [result for batch in results for result in batch]
+
+def parse_messages(messages: List[Dict], max_body_bytes: int) -> List[Dict]:
+    """Decode a batch of Gmail message resources into email dicts."""
+    return [parse_message(message, max_body_bytes) for message in messages]
+
+def prepare_contents(
+    contents: List[str],
+    chunk_tokens: int,
+    overlap_tokens: int
+) -> List[Tuple[Optional[int], List[str]]]:
+    """Clean a batch of email bodies and return each one's SimHash and chunks."""
+    chunker = TextChunker(chunk_tokens, overlap_tokens)
+    prepared = []
+    for content in contents:
+        cleaned = clean_text(content)
+        prepared.append((simhash(cleaned), chunker.chunk(cleaned)))
+    return prepared
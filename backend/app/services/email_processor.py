@@ -1,163 +1,537 @@
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Set, Tuple
 from datetime import datetime
-import re
+from email.utils import parseaddr
+import asyncio
+import numpy as np
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
-from app.models.document import DocumentChunk, EmailMetadata
+from app.models.document import DocumentChunk, EmailMetadata, EmailFingerprint
+from app.models.sync import MailboxSyncState
 from app.services.vertex import VertexAIService
-from app.services.gmail import GmailService
-import json
+from app.services.answer_cache import AnswerCache
+from app.services.chunk_partitions import ChunkPartitions
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.embedding_cache import EmbeddingCache
+from app.services.near_duplicate import NearDuplicateIndex
+from app.services.cpu_pool import prepare_contents, run_batched
+from app.services.ingest_stats import IngestionStats
+from app.services.rate_limiter import rate_limit_user
+from app.services.vector_cache import VectorCache
+from app.services.vector_search import normalize
+from app.services.gmail import GmailService, HistoryExpiredError
+from config.config import get_settings
 import logging
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
 
+settings = get_settings()
 logger = logging.getLogger(__name__)
 
+# (email, chunk texts, chunk embeddings) ready to be written
+EmbeddedEmail = Tuple[Dict, List[str], List[np.ndarray]]
+
 class EmailProcessor:
     def __init__(self, db: Session, vertex_service: VertexAIService):
         self.db = db
         self.vertex_service = vertex_service
-        self.chunk_size = 500
-        self.chunk_overlap = 50
+        self.embedding_batcher = EmbeddingBatcher(vertex_service)
+        self.embedding_cache = EmbeddingCache(db, vertex_service.embedding_model)
+        self.near_duplicates = NearDuplicateIndex(db)
+        self.vector_cache = VectorCache()
     
     async def process_emails(
         self,
         user_id: int,
         gmail_service: GmailService,
-        max_emails: int = 100
-    ) -> List[Dict]:
-        """Process recent emails for a user."""
+        max_emails: int = 100,
+        on_progress: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
+        """Process new emails for a user.
+
+        The first sync lists the newest ``max_emails`` inbox messages. Later
+        syncs resume from the stored Gmail historyId and only fetch messages
+        added or relabelled since then, falling back to a full resync when the
+        cursor has expired. Messages already in ``email_metadata`` are skipped
+        before their bodies are fetched, and everything new is written in one
+        transaction. The cursor only advances once every new message has been
+        stored. ``on_progress`` is called with the run's stats after each
+        stage.
+        """
+        stats = IngestionStats()
+        report = on_progress or (lambda snapshot: None)
+        rate_limit_user.set(user_id)
+        ChunkPartitions(self.db).ensure(user_id)
         try:
-            # Fetch recent emails
-            emails = await gmail_service.fetch_recent_emails(max_results=max_emails)
-            processed_emails = []
+            with stats.stage('list'):
+                message_ids, history_id = await self._list_new_message_ids(user_id, gmail_service, max_emails)
+                new_ids = self._filter_unknown_ids(message_ids)
+            stats.total = len(message_ids)
+            stats.add(listed=len(message_ids), skipped=len(message_ids) - len(new_ids))
+            report(stats.snapshot())
             
-            for email in emails:
-                try:
-                    # Store email metadata
-                    metadata = await self._store_email_metadata(user_id, email)
-                    
-                    # Process email content
-                    if not metadata.is_processed:
-                        chunks = await self._process_email_content(user_id, email)
-                        processed_emails.extend(chunks)
-                        
-                        # Mark email as processed
-                        metadata.is_processed = True
-                        self.db.commit()
-                
-                except Exception as e:
-                    logger.error(f"Error processing email {email.get('id')}: {str(e)}")
-                    continue
+            with stats.stage('fetch'):
+                emails = await gmail_service.fetch_messages(new_ids)
+            stats.add(fetched=len(emails))
+            report(stats.snapshot())
             
-            return processed_emails
+            chunked = await self._chunk_stage(user_id, emails, stats)
+            report(stats.snapshot())
+            embedded = await self._embed_stage(chunked, stats)
+            report(stats.snapshot())
+            await self._persist_stage(user_id, embedded, stats)
+            
+            # Messages that failed to fetch or embed are only listed again from the old cursor
+            missing = set(new_ids) - {email['id'] for email, _, _ in embedded}
+            if missing:
+                logger.warning(
+                    f"Keeping the sync cursor for user {user_id}: {len(missing)} messages "
+                    f"were not ingested and will be retried"
+                )
+            else:
+                self._save_sync_cursor(user_id, history_id)
+            return stats.snapshot()
         
         except Exception as e:
             logger.error(f"Error in process_emails: {str(e)}")
             raise
     
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-    async def _store_email_metadata(self, user_id: int, email: Dict) -> EmailMetadata:
-        """Store email metadata in the database."""
-        try:
-            metadata = EmailMetadata(
-                user_id=user_id,
-                email_id=email['id'],
-                thread_id=email.get('threadId'),
-                subject=email.get('subject'),
-                sender=email.get('sender'),
-                recipients=email.get('recipients', []),
-                timestamp=datetime.fromtimestamp(int(email['timestamp']) / 1000),
-                labels=email.get('labels', [])
-            )
-            
-            self.db.add(metadata)
+    async def backfill(
+        self,
+        user_id: int,
+        gmail_service: GmailService,
+        page_size: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        on_progress: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
+        """Ingest a user's whole inbox as a streaming pipeline.
+
+        Pages of messages flow through bounded queues between four stages:
+        fetch, clean/chunk, embed and persist. A slow stage blocks the ones
+        upstream of it, so at most ``queue_size`` pages per stage are held in
+        memory regardless of mailbox size. After each page is persisted its
+        successor's page token is saved, and a later call resumes from there;
+        ``on_progress`` is then called with the run's stats. Once a page has
+        messages that failed to fetch or embed, the checkpoint stays before
+        that page for the rest of the run, so the next run retries them.
+        """
+        page_size = page_size or settings.BACKFILL_PAGE_SIZE
+        queue_size = queue_size or settings.BACKFILL_QUEUE_SIZE
+        
+        rate_limit_user.set(user_id)
+        ChunkPartitions(self.db).ensure(user_id)
+        sync_state = self._start_backfill(user_id)
+        if sync_state.history_id is None:
+            # Incremental syncs pick up from the point the backfill started
+            sync_state.history_id = (await gmail_service.get_profile())['historyId']
             self.db.commit()
-            self.db.refresh(metadata)
-            
-            return metadata
-            
+        
+        stats = IngestionStats(await self._count_inbox(gmail_service))
+        chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        embed_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        persist_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        
+        def filter_page(message_ids: List[str]) -> List[str]:
+            new_ids = self._filter_unknown_ids(message_ids)
+            stats.add(listed=len(message_ids), skipped=len(message_ids) - len(new_ids))
+            return new_ids
+        
+        async def fetch_stage():
+            pages = gmail_service.iter_message_pages(
+                page_token=sync_state.backfill_page_token,
+                page_size=page_size,
+                id_filter=filter_page
+            )
+            while True:
+                with stats.stage('fetch'):
+                    page = await anext(pages, None)
+                if page is None:
+                    break
+                emails, message_ids, next_page_token = page
+                stats.add(fetched=len(emails))
+                await chunk_queue.put((emails, message_ids, next_page_token))
+            await chunk_queue.put(None)
+        
+        async def chunk_stage():
+            while (page := await chunk_queue.get()) is not None:
+                emails, message_ids, next_page_token = page
+                chunked = await self._chunk_stage(user_id, emails, stats)
+                await embed_queue.put((chunked, message_ids, next_page_token))
+            await embed_queue.put(None)
+        
+        async def embed_stage():
+            while (page := await embed_queue.get()) is not None:
+                chunked, message_ids, next_page_token = page
+                await persist_queue.put((await self._embed_stage(chunked, stats), message_ids, next_page_token))
+            await persist_queue.put(None)
+        
+        async def persist_stage():
+            held = False
+            while (page := await persist_queue.get()) is not None:
+                embedded, message_ids, next_page_token = page
+                await self._persist_stage(user_id, embedded, stats)
+                stats.add(pages=1)
+                # The history cursor predates the backfill, so only a later run can retry these
+                missing = set(message_ids) - {email['id'] for email, _, _ in embedded}
+                if missing and not held:
+                    logger.warning(
+                        f"Holding the backfill checkpoint for user {user_id}: {len(missing)} messages "
+                        f"were not ingested and will be retried"
+                    )
+                    held = True
+                if not held:
+                    self._checkpoint_backfill(sync_state, next_page_token)
+                if on_progress is not None:
+                    on_progress(stats.snapshot())
+        
+        stages = [
+            asyncio.create_task(stage())
+            for stage in (fetch_stage, chunk_stage, embed_stage, persist_stage)
+        ]
+        try:
+            await asyncio.gather(*stages)
         except Exception as e:
-            logger.error(f"Error storing email metadata: {str(e)}")
+            logger.error(f"Error in backfill for user {user_id}: {str(e)}")
             raise
+        finally:
+            for stage in stages:
+                stage.cancel()
+        
+        snapshot = stats.snapshot()
+        logger.info(
+            f"Backfill for user {user_id} finished: {snapshot['emails']} emails, "
+            f"{snapshot['chunks']} chunks in {snapshot['elapsed_seconds']}s"
+        )
+        return snapshot
     
-    async def _process_email_content(self, user_id: int, email: Dict) -> List[Dict]:
-        """Process email content into chunks and store with embeddings."""
+    async def _count_inbox(self, gmail_service: GmailService) -> Optional[int]:
+        """Inbox size for backfill ETAs, or None if Gmail would not say."""
         try:
-            # Clean and chunk the content
-            content = email.get('content', '')
-            chunks = self._chunk_text(content)
-            
-            # Generate embeddings for all chunks
-            embeddings = await self.vertex_service.generate_embeddings(chunks)
-            
-            stored_chunks = []
-            for idx, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-                chunk_doc = DocumentChunk(
-                    user_id=user_id,
-                    source_type='email',
-                    source_id=email['id'],
-                    chunk_index=idx,
-                    content=chunk,
-                    chunk_metadata={
-                        'subject': email.get('subject'),
-                        'sender': email.get('sender'),
-                        'timestamp': email.get('timestamp'),
-                        'thread_id': email.get('threadId')
-                    },
-                    embedding=embedding.tolist()
+            return await gmail_service.count_messages('INBOX')
+        except Exception as e:
+            logger.warning(f"Could not count inbox messages: {str(e)}")
+            return None
+    
+    async def _chunk_stage(
+        self,
+        user_id: int,
+        emails: List[Dict],
+        stats: IngestionStats
+    ) -> List[Tuple[Dict, List[str]]]:
+        with stats.stage('chunk'):
+            chunked = await self._prepare_batch(user_id, emails)
+        stats.add(chunks_produced=sum(len(chunks) for _, chunks in chunked))
+        return chunked
+    
+    async def _embed_stage(
+        self,
+        chunked: List[Tuple[Dict, List[str]]],
+        stats: IngestionStats
+    ) -> List[EmbeddedEmail]:
+        with stats.stage('embed'):
+            embedded = await self._embed_emails(chunked)
+        stats.add(embeddings=sum(len(embeddings) for _, _, embeddings in embedded))
+        return embedded
+    
+    async def _persist_stage(self, user_id: int, embedded: List[EmbeddedEmail], stats: IngestionStats) -> None:
+        with stats.stage('persist'):
+            written = await self._persist_batch(user_id, embedded)
+        stats.add(
+            persisted=len(embedded),
+            emails=written['emails'],
+            chunks=written['chunks'],
+            rows_written=written['rows']
+        )
+    
+    def _start_backfill(self, user_id: int) -> MailboxSyncState:
+        """Load the sync state, resetting the checkpoint if the last backfill completed."""
+        sync_state = self.db.get(MailboxSyncState, user_id)
+        if sync_state is None:
+            sync_state = MailboxSyncState(user_id=user_id)
+            self.db.add(sync_state)
+        
+        if sync_state.backfill_completed_at is not None:
+            sync_state.backfill_page_token = None
+            sync_state.backfill_completed_at = None
+        if sync_state.backfill_page_token is None:
+            sync_state.backfill_started_at = datetime.utcnow()
+        
+        self.db.commit()
+        return sync_state
+    
+    def _checkpoint_backfill(self, sync_state: MailboxSyncState, next_page_token: Optional[str]) -> None:
+        """Record that every page before ``next_page_token`` has been persisted."""
+        sync_state.backfill_page_token = next_page_token
+        if next_page_token is None:
+            sync_state.backfill_completed_at = datetime.utcnow()
+        self.db.commit()
+    
+    async def _list_new_message_ids(
+        self,
+        user_id: int,
+        gmail_service: GmailService,
+        max_emails: int
+    ) -> Tuple[List[str], str]:
+        """List messages changed since the user's sync cursor, or the newest ones if there is none."""
+        sync_state = self.db.get(MailboxSyncState, user_id)
+        
+        if sync_state and sync_state.history_id:
+            try:
+                added_ids, label_updates, history_id = await gmail_service.fetch_changes(
+                    sync_state.history_id
                 )
-                
-                self.db.add(chunk_doc)
-                stored_chunks.append(chunk_doc)
+                self._apply_label_updates(user_id, label_updates)
+                return added_ids, history_id
+            except HistoryExpiredError:
+                logger.info(f"Sync cursor expired for user {user_id}, running a full resync")
+        
+        # Read the cursor before listing so nothing that arrives mid-sync is skipped
+        profile = await gmail_service.get_profile()
+        message_ids = await gmail_service.list_recent_message_ids(max_results=max_emails)
+        return message_ids, profile['historyId']
+    
+    def _apply_label_updates(self, user_id: int, label_updates: Dict[str, List[str]]) -> None:
+        """Refresh stored labels for messages that were relabelled in Gmail.
+
+        Metadata and the chunks' ``labels`` filter column are updated in the
+        same transaction, with one chunk UPDATE per distinct label set.
+        """
+        if not label_updates:
+            return
+        
+        try:
+            rows = self.db.query(EmailMetadata).filter(
+                EmailMetadata.user_id == user_id,
+                EmailMetadata.email_id.in_(list(label_updates))
+            ).all()
+            for row in rows:
+                row.labels = label_updates[row.email_id]
             
+            by_labels: Dict[Tuple[str, ...], List[str]] = {}
+            for email_id, labels in label_updates.items():
+                by_labels.setdefault(tuple(labels), []).append(email_id)
+            for labels, email_ids in by_labels.items():
+                self.db.execute(
+                    update(DocumentChunk)
+                    .where(DocumentChunk.user_id == user_id, DocumentChunk.source_id.in_(email_ids))
+                    .values(labels=list(labels))
+                    .execution_options(synchronize_session=False)
+                )
+            if rows:
+                # Cached answers to label-filtered queries may have changed
+                AnswerCache.invalidate(self.db, user_id)
             self.db.commit()
-            return stored_chunks
-            
         except Exception as e:
-            logger.error(f"Error processing email content: {str(e)}")
+            self.db.rollback()
+            logger.error(f"Error applying label updates: {str(e)}")
             raise
     
-    def _chunk_text(self, text: str) -> List[str]:
-        """Split text into chunks with overlap."""
-        # Clean text
-        text = self._clean_text(text)
+    def _save_sync_cursor(self, user_id: int, history_id: str) -> None:
+        """Persist the historyId the next incremental sync should start from."""
+        sync_state = self.db.get(MailboxSyncState, user_id)
+        if sync_state is None:
+            sync_state = MailboxSyncState(user_id=user_id)
+            self.db.add(sync_state)
         
-        # Split into sentences
-        sentences = re.split(r'(?<=[.!?])\s+', text)
+        sync_state.history_id = history_id
+        sync_state.last_synced_at = datetime.utcnow()
+        self.db.commit()
+    
+    def _filter_unknown_ids(self, message_ids: List[str]) -> List[str]:
+        """Drop IDs that already have processed metadata, using a single query."""
+        if not message_ids:
+            return []
         
-        chunks = []
-        current_chunk = []
-        current_length = 0
+        known: Set[str] = set(self.db.scalars(
+            select(EmailMetadata.email_id).where(
+                EmailMetadata.email_id.in_(message_ids),
+                EmailMetadata.is_processed.is_(True)
+            )
+        ))
+        return [message_id for message_id in message_ids if message_id not in known]
+    
+    async def _prepare_batch(self, user_id: int, emails: List[Dict]) -> List[Tuple[Dict, List[str]]]:
+        """Clean and chunk a batch of emails, linking near-duplicates instead of chunking them.
+
+        Each email gets a SimHash of its cleaned body. Emails close to one the
+        user already has (or to an earlier email in the batch) are marked with
+        ``canonical_email_id`` and get no chunks of their own; the rest are
+        marked with their ``simhash`` so it can be indexed once stored.
+        Cleaning, hashing and chunking run in the ingest process pool when it
+        is enabled.
+        """
+        prepared = await run_batched(
+            prepare_contents,
+            [email.get('content', '') for email in emails],
+            settings.CHUNK_SIZE_TOKENS,
+            settings.CHUNK_OVERLAP_TOKENS
+        )
+        chunks = {email['id']: email_chunks for email, (_, email_chunks) in zip(emails, prepared)}
+        fingerprints = {
+            email['id']: fingerprint
+            for email, (fingerprint, _) in zip(emails, prepared)
+            if fingerprint is not None
+        }
+        canonicals = self.near_duplicates.find_canonicals(user_id, fingerprints)
         
-        for sentence in sentences:
-            sentence_length = len(sentence)
-            
-            if current_length + sentence_length > self.chunk_size:
-                # Store current chunk
-                chunks.append(' '.join(current_chunk))
-                
-                # Start new chunk with overlap
-                overlap_tokens = current_chunk[-self.chunk_overlap:] if self.chunk_overlap > 0 else []
-                current_chunk = overlap_tokens + [sentence]
-                current_length = sum(len(t) for t in current_chunk)
+        chunked = []
+        for email in emails:
+            canonical_email_id = canonicals.get(email['id'])
+            if canonical_email_id is not None:
+                email['canonical_email_id'] = canonical_email_id
+                chunked.append((email, []))
             else:
-                current_chunk.append(sentence)
-                current_length += sentence_length
-        
-        if current_chunk:
-            chunks.append(' '.join(current_chunk))
+                email['simhash'] = fingerprints.get(email['id'])
+                chunked.append((email, chunks[email['id']]))
         
-        return chunks
+        if canonicals:
+            logger.info(f"Linked {len(canonicals)} near-duplicate emails for user {user_id}")
+        return chunked
     
-    def _clean_text(self, text: str) -> str:
-        """Clean email text content."""
-        # Remove email signatures
-        text = re.sub(r'--\s*\n.*', '', text, flags=re.DOTALL)
+    async def _embed_emails(self, chunked: List[Tuple[Dict, List[str]]]) -> List[EmbeddedEmail]:
+        """Embed the chunks of many emails in packed requests.
+
+        Chunks already in the embedding cache are not sent to Vertex. Emails
+        with any chunk whose request failed are left out of the result, and
+        so are near-duplicates linked to them.
+        """
+        texts = [chunk for _, chunks in chunked for chunk in chunks]
+        embeddings = await self.embedding_cache.embed(
+            texts,
+            lambda missing: self.embedding_batcher.embed(missing, skip_failures=True)
+        )
         
-        # Remove quoted text
-        text = re.sub(r'On.*wrote:.*', '', text, flags=re.DOTALL)
-        text = re.sub(r'>\s*>.*', '', text, flags=re.DOTALL)
+        embedded = []
+        offset = 0
+        for email, chunks in chunked:
+            email_embeddings = embeddings[offset:offset + len(chunks)]
+            offset += len(chunks)
+            if any(embedding is None for embedding in email_embeddings):
+                logger.error(f"Error embedding email {email.get('id')}: embedding request failed")
+                continue
+            embedded.append((email, chunks, email_embeddings))
         
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
+        failed = {email['id'] for email, _ in chunked} - {email['id'] for email, _, _ in embedded}
+        if failed:
+            # Their near-duplicates in the batch would link to emails that are never stored
+            embedded = [item for item in embedded if item[0].get('canonical_email_id') not in failed]
+        return embedded
+    
+    @retry(
+        retry=retry_if_exception_type(OperationalError),
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10)
+    )
+    async def _persist_batch(self, user_id: int, embedded: List[EmbeddedEmail]) -> Dict:
+        """Write metadata and chunks for a batch of emails in one transaction.
+
+        Metadata rows are upserted so that only new or previously unprocessed
+        emails come back from RETURNING, and chunks are only written for those.
+        A message ingested concurrently by another sync is never stored twice.
+        As a coroutine it is retried with tenacity's async retrying, so the
+        backoff does not block the event loop.
+        """
+        # A VALUES list may not touch the same conflicting row twice
+        embedded = list({email['id']: (email, chunks, embeddings) for email, chunks, embeddings in embedded}.values())
+        if not embedded:
+            return {'emails': 0, 'chunks': 0, 'rows': 0}
         
-        return text.strip() 
\ No newline at end of file
+        try:
+            inserted_ids = set(self.db.scalars(
+                insert(EmailMetadata)
+                .values([self._metadata_row(user_id, email) for email, _, _ in embedded])
+                .on_conflict_do_update(
+                    index_elements=['email_id'],
+                    set_={'is_processed': True},
+                    where=EmailMetadata.is_processed.isnot(True)
+                )
+                .returning(EmailMetadata.email_id)
+            ))
+            
+            chunk_rows = [
+                row
+                for email, chunks, embeddings in embedded
+                if email['id'] in inserted_ids
+                for row in self._chunk_rows(user_id, email, chunks, embeddings)
+            ]
+            if chunk_rows:
+                self.db.execute(insert(DocumentChunk), chunk_rows)
+                # Cached answers may no longer reflect what the user has
+                AnswerCache.invalidate(self.db, user_id)
+            
+            fingerprint_rows = [
+                NearDuplicateIndex.fingerprint_row(user_id, email['id'], email['simhash'])
+                for email, _, _ in embedded
+                if email['id'] in inserted_ids and email.get('simhash') is not None
+            ]
+            if fingerprint_rows:
+                self.db.execute(
+                    insert(EmailFingerprint).on_conflict_do_nothing(index_elements=['email_id']),
+                    fingerprint_rows
+                )
+            
+            self.db.commit()
+            if chunk_rows:
+                # Cached vectors of users who query often
+                self.vector_cache.extend(self.db, user_id)
+            return {
+                'emails': len(inserted_ids),
+                'chunks': len(chunk_rows),
+                'rows': len(inserted_ids) + len(chunk_rows) + len(fingerprint_rows)
+            }
+            
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error persisting email batch: {str(e)}")
+            raise
+    
+    def _metadata_row(self, user_id: int, email: Dict) -> Dict:
+        """Build the email_metadata row for an email."""
+        return {
+            'user_id': user_id,
+            'email_id': email['id'],
+            'thread_id': email.get('threadId'),
+            'subject': email.get('subject'),
+            'sender': email.get('sender'),
+            'recipients': email.get('recipients', []),
+            'timestamp': datetime.fromtimestamp(int(email['timestamp']) / 1000),
+            'labels': email.get('labels', []),
+            'is_processed': True,
+            'canonical_email_id': email.get('canonical_email_id'),
+            'created_at': datetime.utcnow()
+        }
+    
+    def _chunk_rows(
+        self,
+        user_id: int,
+        email: Dict,
+        chunks: List[str],
+        embeddings: List[np.ndarray]
+    ) -> List[Dict]:
+        """Build the document_chunks rows for an email's chunks."""
+        sender = email.get('sender')
+        filter_columns = {
+            'email_timestamp': datetime.fromtimestamp(int(email['timestamp']) / 1000),
+            'sender': sender,
+            'sender_address': parseaddr(sender or '')[1].lower() or None,
+            'thread_id': email.get('threadId'),
+            'labels': email.get('labels', [])
+        }
+        return [
+            {
+                'user_id': user_id,
+                'source_type': 'email',
+                'source_id': email['id'],
+                'chunk_index': idx,
+                'content': chunk,
+                'chunk_metadata': {
+                    'subject': email.get('subject'),
+                    'sender': email.get('sender'),
+                    'timestamp': email.get('timestamp'),
+                    'thread_id': email.get('threadId')
+                },
+                'embedding': normalize(embedding).tolist(),
+                **filter_columns
+            }
+            for idx, (chunk, embedding) in enumerate(zip(chunks, embeddings))
+        ]
@@ -0,0 +1,79 @@
+from typing import List, Optional
+import asyncio
+import numpy as np
+from app.services.vertex import VertexAIService
+from app.services.chunking import estimate_tokens
+from config.config import get_settings
+import logging
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+class EmbeddingBatcher:
+    """Packs texts from many emails into as few embedding requests as possible.
+
+    Texts are grouped in order into requests that stay under the model's
+    per-request instance and token limits, the requests run with bounded
+    concurrency, and each vector is returned at its text's original position.
+    """
+
+    def __init__(
+        self,
+        vertex_service: VertexAIService,
+        max_instances: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        concurrency: Optional[int] = None
+    ):
+        self.vertex_service = vertex_service
+        self.max_instances = max_instances or settings.EMBEDDING_MAX_INSTANCES_PER_REQUEST
+        self.max_tokens = max_tokens or settings.EMBEDDING_MAX_TOKENS_PER_REQUEST
+        self.concurrency = concurrency or settings.EMBEDDING_REQUEST_CONCURRENCY
+
+    async def embed(self, texts: List[str], skip_failures: bool = False) -> List[Optional[np.ndarray]]:
+        """Embed ``texts``, returning one vector per text in the same order.
+
+        If ``skip_failures`` is set, texts whose request failed get ``None``
+        instead of the whole call raising.
+        """
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run_request(indices: List[int]) -> None:
+            async with semaphore:
+                try:
+                    embeddings = await self.vertex_service.generate_embeddings(
+                        [texts[i] for i in indices]
+                    )
+                except Exception as e:
+                    if not skip_failures:
+                        raise
+                    logger.error(f"Error embedding request of {len(indices)} texts: {str(e)}")
+                    return
+            for i, embedding in zip(indices, embeddings):
+                results[i] = embedding
+
+        await asyncio.gather(*(run_request(indices) for indices in self._pack(texts)))
+        return results
+
+    def _pack(self, texts: List[str]) -> List[List[int]]:
+        """Group text positions into requests that respect the instance and token limits."""
+        requests: List[List[int]] = []
+        current: List[int] = []
+        current_tokens = 0
+
+        for i, text in enumerate(texts):
+            tokens = estimate_tokens(text)
+            if current and (
+                len(current) >= self.max_instances
+                or current_tokens + tokens > self.max_tokens
+            ):
+                requests.append(current)
+                current = []
+                current_tokens = 0
+            current.append(i)
+            current_tokens += tokens
+
+        if current:
+            requests.append(current)
+
+        return requests
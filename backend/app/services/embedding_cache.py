@@ -0,0 +1,163 @@
+from typing import Awaitable, Callable, Dict, List, Optional
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import hashlib
+import numpy as np
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.models.cache import EmbeddingCacheEntry
+from config.config import get_settings
+import logging
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+EmbedFn = Callable[[List[str]], Awaitable[List[Optional[np.ndarray]]]]
+
+def content_hash(text: str) -> str:
+    """Key a text by the SHA-256 of its UTF-8 bytes."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class EmbeddingCache:
+    """Content-addressed embedding cache backed by Postgres.
+
+    Lookups go to a process-wide LRU first, then to the ``embedding_cache``
+    table, and only the remaining texts are sent to the embedding model.
+    Entries are keyed by content hash and model name, so changing
+    ``VERTEX_EMBEDDING_MODEL`` never serves vectors from another model.
+    """
+
+    _memory: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+    _metrics: Dict[str, int] = {'memory_hits': 0, 'db_hits': 0, 'batch_hits': 0, 'misses': 0}
+
+    def __init__(self, db: Session, model: Optional[str] = None):
+        self.db = db
+        self.model = model or settings.VERTEX_EMBEDDING_MODEL
+        self.memory_entries = settings.EMBEDDING_CACHE_MEMORY_ENTRIES
+
+    async def embed(self, texts: List[str], embed_fn: EmbedFn) -> List[Optional[np.ndarray]]:
+        """Return one embedding per text, calling ``embed_fn`` only for uncached texts.
+
+        ``embed_fn`` receives each uncached text once, even if it repeats in
+        ``texts``. Positions it returns ``None`` for stay ``None`` and are not
+        cached.
+        """
+        hashes = [content_hash(text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+
+        for key in set(hashes):
+            embedding = self._memory_get(key)
+            if embedding is not None:
+                found[key] = embedding
+        from_memory = set(found)
+
+        stored = self._db_get([key for key in set(hashes) if key not in found])
+        found.update(stored)
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(hashes, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+
+        if missing:
+            embeddings = await embed_fn(list(missing.values()))
+            fresh = {
+                key: np.asarray(embedding, dtype=np.float32)
+                for key, embedding in zip(missing, embeddings)
+                if embedding is not None
+            }
+            self._db_put(fresh)
+            found.update(fresh)
+
+        for key, embedding in found.items():
+            self._memory_put(key, embedding)
+
+        self._metrics['memory_hits'] += sum(key in from_memory for key in hashes)
+        self._metrics['db_hits'] += sum(key in stored for key in hashes)
+        self._metrics['misses'] += len(missing)
+        self._metrics['batch_hits'] += sum(key in missing for key in hashes) - len(missing)
+
+        return [found.get(key) for key in hashes]
+
+    def purge_expired(self, retention_days: Optional[int] = None) -> int:
+        """Delete entries not used within the retention window and return how many."""
+        retention_days = retention_days or settings.EMBEDDING_CACHE_RETENTION_DAYS
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        result = self.db.execute(
+            delete(EmbeddingCacheEntry).where(EmbeddingCacheEntry.last_used_at < cutoff)
+        )
+        self.db.commit()
+        logger.info(f"Purged {result.rowcount} embedding cache entries unused since {cutoff}")
+        return result.rowcount
+
+    @classmethod
+    def metrics(cls) -> Dict:
+        """Per-text hit counts and hit rate for this process since startup.
+
+        ``batch_hits`` are repeats of an uncached text within a single call,
+        which are embedded once and shared.
+        """
+        lookups = sum(cls._metrics.values())
+        hits = lookups - cls._metrics['misses']
+        return {
+            **cls._metrics,
+            'memory_entries': len(cls._memory),
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0
+        }
+
+    def _memory_get(self, key: str) -> Optional[np.ndarray]:
+        embedding = self._memory.get((self.model, key))
+        if embedding is not None:
+            self._memory.move_to_end((self.model, key))
+        return embedding
+
+    def _memory_put(self, key: str, embedding: np.ndarray) -> None:
+        self._memory[(self.model, key)] = embedding
+        self._memory.move_to_end((self.model, key))
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _db_get(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Load cached vectors for ``keys`` and mark them as used."""
+        if not keys:
+            return {}
+
+        rows = self.db.execute(
+            select(EmbeddingCacheEntry.content_hash, EmbeddingCacheEntry.embedding).where(
+                EmbeddingCacheEntry.model == self.model,
+                EmbeddingCacheEntry.content_hash.in_(keys)
+            )
+        ).all()
+        if rows:
+            self.db.execute(
+                update(EmbeddingCacheEntry)
+                .where(
+                    EmbeddingCacheEntry.model == self.model,
+                    EmbeddingCacheEntry.content_hash.in_([row.content_hash for row in rows])
+                )
+                .values(last_used_at=datetime.utcnow())
+            )
+            self.db.commit()
+        return {row.content_hash: row.embedding for row in rows}
+
+    def _db_put(self, embeddings: Dict[str, np.ndarray]) -> None:
+        if not embeddings:
+            return
+
+        now = datetime.utcnow()
+        self.db.execute(
+            insert(EmbeddingCacheEntry)
+            .values([
+                {
+                    'content_hash': key,
+                    'model': self.model,
+                    'embedding': embedding,
+                    'created_at': now,
+                    'last_used_at': now
+                }
+                for key, embedding in embeddings.items()
+            ])
+            .on_conflict_do_nothing(index_elements=['content_hash', 'model'])
+        )
+        self.db.commit()
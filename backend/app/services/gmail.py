@@ -1,12 +1,34 @@
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from app.services.mime import MESSAGE_FIELDS
+from app.services.cpu_pool import parse_messages, run_batched
+from app.services.rate_limiter import RateLimiter, retry_after_seconds
+from config.config import get_settings
 from datetime import datetime
-import base64
+import asyncio
+import httplib2
 import logging
 
+settings = get_settings()
 logger = logging.getLogger(__name__)
 
+MAX_LIST_PAGE_SIZE = 500  # Largest page messages.list will return
+
+# Gmail API quota units charged per call
+QUOTA_UNITS = {
+    'messages.list': 5,
+    'messages.get': 5,
+    'history.list': 2,
+    'getProfile': 1,
+    'labels.get': 1,
+}
+
+class HistoryExpiredError(Exception):
+    """Raised when a stored historyId is too old for the Gmail history API."""
+
 class GmailService:
     def __init__(self, credentials: Dict[str, str]):
         """Initialize Gmail service with OAuth2 credentials."""
@@ -18,60 +40,245 @@ class GmailService:
             token_uri="https://oauth2.googleapis.com/token",
         )
         self.service = build('gmail', 'v1', credentials=self.creds)
-    
+        self.batch_size = settings.GMAIL_BATCH_SIZE
+        self.fetch_concurrency = settings.GMAIL_FETCH_CONCURRENCY
+        self.max_body_bytes = settings.GMAIL_MAX_BODY_BYTES
+        self.rate_limiter = RateLimiter('gmail')
+
     async def fetch_recent_emails(self, max_results: int = 100) -> List[Dict]:
         """Fetch recent emails from Gmail."""
         try:
-            results = self.service.users().messages().list(
-                userId='me',
-                maxResults=max_results,
-                labelIds=['INBOX']
-            ).execute()
-            
-            messages = results.get('messages', [])
-            emails = []
-            
-            for message in messages:
-                msg = self.service.users().messages().get(
-                    userId='me',
-                    id=message['id'],
-                    format='full'
-                ).execute()
-                
-                # Extract email data
-                headers = msg['payload']['headers']
-                subject = next((h['value'] for h in headers if h['name'].lower() == 'subject'), '')
-                sender = next((h['value'] for h in headers if h['name'].lower() == 'from'), '')
-                recipients = next((h['value'] for h in headers if h['name'].lower() == 'to'), '').split(',')
-                
-                # Get email body
-                parts = [msg['payload']]
-                content = []
-                
-                while parts:
-                    part = parts.pop()
-                    if part.get('parts'):
-                        parts.extend(part['parts'])
-                    if part.get('mimeType') == 'text/plain':
-                        data = part.get('body', {}).get('data', '')
-                        if data:
-                            content.append(base64.urlsafe_b64decode(data).decode())
-                
-                email_data = {
-                    'id': msg['id'],
-                    'threadId': msg['threadId'],
-                    'subject': subject,
-                    'sender': sender,
-                    'recipients': recipients,
-                    'content': '\n'.join(content),
-                    'timestamp': int(msg['internalDate']),
-                    'labels': msg['labelIds']
-                }
-                
-                emails.append(email_data)
-            
-            return emails
-            
+            message_ids = await self.list_recent_message_ids(max_results)
+            return await self.fetch_messages(message_ids)
+
         except Exception as e:
             logger.error(f"Error fetching emails: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
+
+    async def list_recent_message_ids(self, max_results: int = 100) -> List[str]:
+        """List the IDs of the newest ``max_results`` inbox messages."""
+        message_ids: List[str] = []
+        page_token = None
+
+        while len(message_ids) < max_results:
+            ids, page_token = await self.list_message_ids(
+                page_token=page_token,
+                page_size=max_results - len(message_ids)
+            )
+            message_ids.extend(ids)
+            if not page_token:
+                break
+
+        return message_ids
+
+    async def list_message_ids(
+        self,
+        page_token: Optional[str] = None,
+        page_size: int = 100,
+        label_ids: Optional[List[str]] = None
+    ) -> Tuple[List[str], Optional[str]]:
+        """List one page of message IDs, newest first, and the token for the next page."""
+        results = await self._execute(
+            self.service.users().messages().list(
+                userId='me',
+                maxResults=min(page_size, MAX_LIST_PAGE_SIZE),
+                labelIds=label_ids or ['INBOX'],
+                pageToken=page_token
+            ),
+            QUOTA_UNITS['messages.list']
+        )
+        ids = [message['id'] for message in results.get('messages', [])]
+        return ids, results.get('nextPageToken')
+
+    async def iter_message_pages(
+        self,
+        page_token: Optional[str] = None,
+        page_size: int = 100,
+        label_ids: Optional[List[str]] = None,
+        id_filter: Optional[Callable[[List[str]], List[str]]] = None
+    ) -> AsyncIterator[Tuple[List[Dict], List[str], Optional[str]]]:
+        """Walk the whole mailbox one page at a time.
+
+        Yields each page of decoded emails, the IDs that were fetched for it
+        and the token of the page that follows it, so callers can checkpoint
+        and resume a walk once every message of a page is stored. Only one
+        page is held in memory at a time. ``id_filter`` can drop message IDs
+        (e.g. already-ingested ones) before their bodies are fetched.
+        """
+        while True:
+            ids, next_page_token = await self.list_message_ids(page_token, page_size, label_ids)
+            if id_filter is not None:
+                ids = id_filter(ids)
+            emails = await self.fetch_messages(ids)
+            yield emails, ids, next_page_token
+            if not next_page_token:
+                return
+            page_token = next_page_token
+
+    async def get_profile(self) -> Dict:
+        """Fetch the mailbox profile, including the current historyId."""
+        return await self._execute(
+            self.service.users().getProfile(userId='me'),
+            QUOTA_UNITS['getProfile']
+        )
+
+    async def count_messages(self, label_id: str = 'INBOX') -> int:
+        """Return the number of messages carrying ``label_id``."""
+        label = await self._execute(
+            self.service.users().labels().get(userId='me', id=label_id, fields='messagesTotal'),
+            QUOTA_UNITS['labels.get']
+        )
+        return label.get('messagesTotal', 0)
+
+    async def fetch_changes(self, start_history_id: str) -> Tuple[List[str], Dict[str, List[str]], str]:
+        """Fetch INBOX changes since ``start_history_id``.
+
+        Returns the IDs of messages added to the inbox, the current labels of
+        messages whose labels changed, and the historyId to resume from next
+        time. Raises HistoryExpiredError when Gmail no longer has history for
+        the cursor and a full resync is needed.
+        """
+        added: Dict[str, None] = {}
+        label_updates: Dict[str, List[str]] = {}
+        history_id = start_history_id
+        page_token = None
+
+        try:
+            while True:
+                response = await self._execute(
+                    self.service.users().history().list(
+                        userId='me',
+                        startHistoryId=start_history_id,
+                        labelId='INBOX',
+                        historyTypes=['messageAdded', 'labelAdded', 'labelRemoved'],
+                        maxResults=500,
+                        pageToken=page_token
+                    ),
+                    QUOTA_UNITS['history.list']
+                )
+
+                for record in response.get('history', []):
+                    for item in record.get('messagesAdded', []):
+                        added[item['message']['id']] = None
+                    for item in record.get('labelsAdded', []) + record.get('labelsRemoved', []):
+                        message = item['message']
+                        label_updates[message['id']] = message.get('labelIds', [])
+                        if 'INBOX' in item.get('labelIds', []) and 'INBOX' in message.get('labelIds', []):
+                            added[message['id']] = None
+
+                history_id = response.get('historyId', history_id)
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    break
+
+        except HttpError as e:
+            if e.resp.status == 404:
+                raise HistoryExpiredError(f"History {start_history_id} is no longer available") from e
+            logger.error(f"Error fetching mailbox history: {str(e)}")
+            raise
+
+        # Newly added messages are fetched in full, so their labels come with them
+        for message_id in added:
+            label_updates.pop(message_id, None)
+
+        return list(added), label_updates, history_id
+
+    async def fetch_messages(self, message_ids: List[str]) -> List[Dict]:
+        """Fetch and decode messages by ID using concurrent batch requests.
+
+        IDs are grouped into Gmail batch HTTP requests of ``batch_size``
+        sub-requests each, and at most ``fetch_concurrency`` batches are in
+        flight at once. Each batch is charged to the Gmail quota first, and
+        sub-requests rejected as rate limited are retried after backing off.
+        Bodies are decoded in the ingest process pool when it is enabled.
+        The result keeps the order of ``message_ids``; messages that fail to
+        fetch are logged and left out.
+        """
+        if not message_ids:
+            return []
+
+        semaphore = asyncio.Semaphore(self.fetch_concurrency)
+        groups = [
+            message_ids[i:i + self.batch_size]
+            for i in range(0, len(message_ids), self.batch_size)
+        ]
+
+        async def run_group(ids: List[str]) -> Dict[str, Dict]:
+            fetched: Dict[str, Dict] = {}
+            async with semaphore:
+                for attempt in range(settings.RATE_LIMIT_MAX_RETRIES + 1):
+                    await self.rate_limiter.acquire(len(ids) * QUOTA_UNITS['messages.get'])
+                    responses, rate_limited = await asyncio.to_thread(self._execute_batch, ids)
+                    fetched.update(responses)
+                    if not rate_limited:
+                        break
+                    if attempt == settings.RATE_LIMIT_MAX_RETRIES:
+                        logger.error(f"Giving up on {len(rate_limited)} rate-limited messages")
+                        break
+                    # Only the rate-limited sub-requests are retried
+                    await asyncio.to_thread(self.rate_limiter.penalize, max(rate_limited.values()) or None)
+                    ids = list(rate_limited)
+            return fetched
+
+        fetched: Dict[str, Dict] = {}
+        for result in await asyncio.gather(*(run_group(ids) for ids in groups)):
+            fetched.update(result)
+
+        return await run_batched(
+            parse_messages,
+            [fetched[message_id] for message_id in message_ids if message_id in fetched],
+            self.max_body_bytes
+        )
+
+    def _execute_batch(self, message_ids: List[str]) -> Tuple[Dict[str, Dict], Dict[str, float]]:
+        """Fetch one group of messages with a single batch HTTP round trip.
+
+        Returns the fetched messages and, for sub-requests that were rate
+        limited, how long Gmail asked us to wait (0 when it did not say).
+        """
+        responses: Dict[str, Dict] = {}
+        rate_limited: Dict[str, float] = {}
+
+        def callback(request_id: str, response: Optional[Dict], exception: Optional[Exception]):
+            if exception is not None:
+                retry_after = retry_after_seconds(exception)
+                if retry_after is not None:
+                    rate_limited[request_id] = retry_after
+                    return
+                logger.error(f"Error fetching message {request_id}: {str(exception)}")
+                return
+            responses[request_id] = response
+
+        batch = self.service.new_batch_http_request(callback=callback)
+        for message_id in message_ids:
+            batch.add(
+                self.service.users().messages().get(
+                    userId='me',
+                    id=message_id,
+                    format='full',
+                    fields=MESSAGE_FIELDS
+                ),
+                request_id=message_id
+            )
+
+        # httplib2 is not thread-safe, so every concurrent batch gets its own connection
+        try:
+            batch.execute(http=self._new_http())
+        except HttpError as e:
+            retry_after = retry_after_seconds(e)
+            if retry_after is None:
+                raise
+            rate_limited.update({
+                message_id: retry_after
+                for message_id in message_ids
+                if message_id not in responses
+            })
+        return responses, rate_limited
+
+    async def _execute(self, request, cost: int) -> Dict:
+        """Execute an API request on a worker thread within the Gmail quota."""
+        return await self.rate_limiter.call(lambda: asyncio.to_thread(request.execute), cost)
+
+    def _new_http(self) -> AuthorizedHttp:
+        """Create an authorized HTTP transport for use on a worker thread."""
+        return AuthorizedHttp(self.creds, http=httplib2.Http())
@@ -0,0 +1,78 @@
+from typing import Dict, Iterator, Optional
+from contextlib import contextmanager
+import time
+
+# Counter each pipeline stage's throughput is measured in
+STAGE_UNITS = {
+    'list': 'listed',
+    'fetch': 'fetched',
+    'chunk': 'chunks_produced',
+    'embed': 'embeddings',
+    'persist': 'rows_written',
+}
+
+class IngestionStats:
+    """Counters and per-stage busy time for one ingestion run.
+
+    Stages add to counters as they go and wrap their work in ``stage()`` so
+    time spent waiting on queues is not counted. ``snapshot()`` turns this
+    into a JSON-friendly dict with per-stage throughput, the busiest stage
+    and an ETA against ``total`` when the mailbox size is known.
+    """
+
+    def __init__(self, total: Optional[int] = None):
+        self.total = total
+        self.counts = {
+            'pages': 0,
+            'listed': 0,           # Message IDs listed from Gmail
+            'skipped': 0,          # Listed IDs that were already ingested
+            'fetched': 0,          # Message bodies downloaded
+            'chunks_produced': 0,
+            'embeddings': 0,       # Chunk vectors obtained, from the cache or the model
+            'persisted': 0,        # Fetched messages that reached the database
+            'emails': 0,           # email_metadata rows written
+            'chunks': 0,           # document_chunks rows written
+            'rows_written': 0,
+        }
+        self.stage_seconds = dict.fromkeys(STAGE_UNITS, 0.0)
+        self.started = time.monotonic()
+
+    def add(self, **counts: int) -> None:
+        for name, count in counts.items():
+            self.counts[name] += count
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds[name] += time.perf_counter() - start
+
+    def snapshot(self) -> Dict:
+        elapsed = time.monotonic() - self.started
+        stages = {}
+        for name, unit in STAGE_UNITS.items():
+            seconds = self.stage_seconds[name]
+            stages[name] = {
+                'seconds': round(seconds, 3),
+                'per_second': round(self.counts[unit] / seconds, 2) if seconds else None,
+                'unit': unit,
+            }
+        busiest = max(self.stage_seconds, key=self.stage_seconds.get)
+
+        done = self.counts['skipped'] + self.counts['persisted']
+        eta = None
+        if self.total is not None and done:
+            remaining = max(self.total - done, 0)
+            eta = round(remaining / (done / elapsed), 1)
+
+        return {
+            **self.counts,
+            'total': self.total,
+            'elapsed_seconds': round(elapsed, 3),
+            'messages_per_second': round(done / elapsed, 2) if elapsed else None,
+            'eta_seconds': eta,
+            'stages': stages,
+            'bottleneck': busiest if self.stage_seconds[busiest] else None,
+        }
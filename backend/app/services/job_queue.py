@@ -0,0 +1,273 @@
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+from sqlalchemy import case, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.models.job import IngestionJob, ACTIVE_JOB_STATUSES
+from config.config import get_settings
+import logging
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+class JobQueue:
+    """Postgres-backed queue of ingestion jobs.
+
+    Jobs are claimed with ``FOR UPDATE SKIP LOCKED`` so any number of workers
+    can poll the same table without handing one job to two of them. A user
+    has at most one queued or running job of each kind; enqueueing again
+    returns the existing job. Failed jobs are retried with exponential backoff
+    until ``max_attempts``, and jobs whose worker stopped heartbeating are put
+    back in the queue.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def enqueue(self, user_id: int, kind: str, params: Optional[Dict] = None) -> IngestionJob:
+        """Queue a job, or return the user's active job of the same kind."""
+        try:
+            job_id = self.db.scalar(
+                insert(IngestionJob).values(
+                    user_id=user_id,
+                    kind=kind,
+                    status='queued',
+                    params=params or {},
+                    progress={},
+                    attempts=0,
+                    max_attempts=settings.JOB_MAX_ATTEMPTS,
+                    run_after=datetime.utcnow(),
+                    created_at=datetime.utcnow(),
+                    updated_at=datetime.utcnow()
+                ).on_conflict_do_nothing(
+                    index_elements=['user_id', 'kind'],
+                    index_where=IngestionJob.status.in_(ACTIVE_JOB_STATUSES)
+                ).returning(IngestionJob.id)
+            )
+            self.db.commit()
+
+            if job_id is not None:
+                logger.info(f"Queued {kind} job {job_id} for user {user_id}")
+                return self.db.get(IngestionJob, job_id)
+
+            return self.db.scalars(
+                select(IngestionJob).where(
+                    IngestionJob.user_id == user_id,
+                    IngestionJob.kind == kind,
+                    IngestionJob.status.in_(ACTIVE_JOB_STATUSES)
+                )
+            ).one()
+
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error enqueueing {kind} job for user {user_id}: {str(e)}")
+            raise
+
+    def claim(self, worker_id: str) -> Optional[IngestionJob]:
+        """Lock the oldest runnable job for ``worker_id``, or return None if there is none."""
+        now = datetime.utcnow()
+        candidate = (
+            select(IngestionJob.id)
+            .where(IngestionJob.status == 'queued', IngestionJob.run_after <= now)
+            .order_by(IngestionJob.run_after, IngestionJob.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        try:
+            job_id = self.db.scalar(
+                update(IngestionJob)
+                .where(IngestionJob.id == candidate)
+                .values(
+                    status='running',
+                    locked_by=worker_id,
+                    locked_at=now,
+                    attempts=IngestionJob.attempts + 1,
+                    started_at=now,
+                    updated_at=now
+                )
+                .returning(IngestionJob.id)
+            )
+            self.db.commit()
+            return self.db.get(IngestionJob, job_id) if job_id is not None else None
+
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error claiming job: {str(e)}")
+            raise
+
+    def heartbeat(self, job_id: int, worker_id: str) -> None:
+        """Mark a running job as still owned by ``worker_id``."""
+        self._update_owned(job_id, worker_id, locked_at=datetime.utcnow())
+
+    def save_progress(self, job_id: int, worker_id: str, progress: Dict) -> None:
+        """Checkpoint a running job's progress; this also counts as a heartbeat."""
+        self._update_owned(job_id, worker_id, progress=progress, locked_at=datetime.utcnow())
+
+    def complete(self, job: IngestionJob, worker_id: str, progress: Dict) -> None:
+        now = datetime.utcnow()
+        self._update_owned(
+            job.id,
+            worker_id,
+            status='succeeded',
+            progress=progress,
+            last_error=None,
+            locked_by=None,
+            locked_at=None,
+            finished_at=now
+        )
+
+    def fail(self, job: IngestionJob, worker_id: str, error: str) -> None:
+        """Record a failed attempt, scheduling a retry unless attempts are used up."""
+        now = datetime.utcnow()
+        if job.attempts < job.max_attempts:
+            delay = min(
+                settings.JOB_RETRY_BASE_SECONDS * 2 ** (job.attempts - 1),
+                settings.JOB_RETRY_MAX_SECONDS
+            )
+            logger.warning(f"Job {job.id} failed (attempt {job.attempts}), retrying in {delay}s: {error}")
+            values = {'status': 'queued', 'run_after': now + timedelta(seconds=delay)}
+        else:
+            logger.error(f"Job {job.id} failed after {job.attempts} attempts: {error}")
+            values = {'status': 'failed', 'finished_at': now}
+
+        self._update_owned(job.id, worker_id, last_error=error, locked_by=None, locked_at=None, **values)
+
+    def get_job(self, job_id: int) -> Optional[IngestionJob]:
+        return self.db.get(IngestionJob, job_id)
+
+    def list_jobs(self, user_id: int, limit: int = 20) -> List[IngestionJob]:
+        """The user's most recent jobs, newest first."""
+        return list(self.db.scalars(
+            select(IngestionJob)
+            .where(IngestionJob.user_id == user_id)
+            .order_by(IngestionJob.created_at.desc(), IngestionJob.id.desc())
+            .limit(limit)
+        ))
+
+    def summary(self) -> Dict:
+        """Queue depth, fleet throughput and per-user progress across all users."""
+        now = datetime.utcnow()
+        counts: Dict[str, Dict[str, int]] = {}
+        for kind, status, count in self.db.execute(
+            select(IngestionJob.kind, IngestionJob.status, func.count())
+            .group_by(IngestionJob.kind, IngestionJob.status)
+        ):
+            counts.setdefault(kind, {})[status] = count
+
+        oldest_queued = self.db.scalar(
+            select(func.min(IngestionJob.run_after)).where(
+                IngestionJob.status == 'queued',
+                IngestionJob.run_after <= now
+            )
+        )
+        running = list(self.db.scalars(
+            select(IngestionJob)
+            .where(IngestionJob.status == 'running')
+            .order_by(IngestionJob.started_at)
+        ))
+
+        stage_rates: Dict[str, float] = {}
+        bottlenecks: Dict[str, int] = {}
+        messages_per_second = 0.0
+        for job in running:
+            progress = job.progress or {}
+            messages_per_second += progress.get('messages_per_second') or 0
+            for stage, values in (progress.get('stages') or {}).items():
+                stage_rates[stage] = stage_rates.get(stage, 0) + (values.get('per_second') or 0)
+            if progress.get('bottleneck'):
+                bottlenecks[progress['bottleneck']] = bottlenecks.get(progress['bottleneck'], 0) + 1
+
+        return {
+            'counts': counts,
+            'queue_wait_seconds': (now - oldest_queued).total_seconds() if oldest_queued else 0,
+            'running': len(running),
+            'messages_per_second': round(messages_per_second, 2),
+            'stage_per_second': {stage: round(rate, 2) for stage, rate in stage_rates.items()},
+            'bottlenecks': bottlenecks,
+            'jobs': [self.describe(job) for job in running],
+        }
+
+    @staticmethod
+    def describe(job: IngestionJob) -> Dict:
+        """JSON view of a job, with the ETA brought forward to now."""
+        progress = job.progress or {}
+        eta = progress.get('eta_seconds')
+        if job.status == 'running' and eta is not None and job.updated_at is not None:
+            eta = max(eta - (datetime.utcnow() - job.updated_at).total_seconds(), 0)
+        elif job.status != 'running':
+            eta = None
+
+        return {
+            'id': job.id,
+            'user_id': job.user_id,
+            'kind': job.kind,
+            'status': job.status,
+            'attempts': job.attempts,
+            'max_attempts': job.max_attempts,
+            'last_error': job.last_error,
+            'progress': progress,
+            'eta_seconds': round(eta, 1) if eta is not None else None,
+            'created_at': job.created_at,
+            'started_at': job.started_at,
+            'finished_at': job.finished_at,
+            'updated_at': job.updated_at,
+        }
+
+    def release(self, job: IngestionJob, worker_id: str) -> None:
+        """Put an interrupted job back in the queue without counting the attempt."""
+        self._update_owned(
+            job.id,
+            worker_id,
+            status='queued',
+            attempts=IngestionJob.attempts - 1,
+            run_after=datetime.utcnow(),
+            locked_by=None,
+            locked_at=None
+        )
+
+    def requeue_stale(self, stale_after_seconds: Optional[int] = None) -> int:
+        """Release running jobs whose worker has not heartbeated recently."""
+        stale_after_seconds = stale_after_seconds or settings.JOB_STALE_AFTER_SECONDS
+        now = datetime.utcnow()
+        exhausted = IngestionJob.attempts >= IngestionJob.max_attempts
+        try:
+            result = self.db.execute(
+                update(IngestionJob)
+                .where(
+                    IngestionJob.status == 'running',
+                    IngestionJob.locked_at < now - timedelta(seconds=stale_after_seconds)
+                )
+                .values(
+                    status=case((exhausted, 'failed'), else_='queued'),
+                    finished_at=case((exhausted, now), else_=None),
+                    last_error='Worker stopped responding',
+                    locked_by=None,
+                    locked_at=None,
+                    run_after=now,
+                    updated_at=now
+                )
+            )
+            self.db.commit()
+            if result.rowcount:
+                logger.warning(f"Released {result.rowcount} stale jobs")
+            return result.rowcount
+
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error requeueing stale jobs: {str(e)}")
+            raise
+
+    def _update_owned(self, job_id: int, worker_id: Optional[str], **values) -> None:
+        """Update a job only while ``worker_id`` still holds its lock."""
+        try:
+            self.db.execute(
+                update(IngestionJob)
+                .where(IngestionJob.id == job_id, IngestionJob.locked_by == worker_id)
+                .values(updated_at=datetime.utcnow(), **values)
+            )
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error updating job {job_id}: {str(e)}")
+            raise
@@ -0,0 +1,91 @@
+from typing import Dict, List, Optional
+import base64
+import html
+import re
+
+# Partial-response mask for messages.get: only what parse_message reads
+_PART_FIELDS = "mimeType,filename,body(data,size,attachmentId)"
+
+def _parts_mask(depth: int) -> str:
+    if depth == 0:
+        return _PART_FIELDS
+    return f"{_PART_FIELDS},parts({_parts_mask(depth - 1)})"
+
+MESSAGE_FIELDS = (
+    "id,threadId,labelIds,internalDate,"
+    f"payload(headers(name,value),{_parts_mask(4)})"
+)
+
+SCRIPT_STYLE_PATTERN = re.compile(r'<(script|style|head)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+BLOCK_BREAK_PATTERN = re.compile(r'<\s*(br|/p|/div|/li|/tr|/h[1-6])\b[^>]*>', re.IGNORECASE)
+TAG_PATTERN = re.compile(r'<[^>]+>')
+SPACES_PATTERN = re.compile(r'[ \t\r\f\v]+')
+BLANK_LINES_PATTERN = re.compile(r'\n\s*\n+')
+
+def html_to_text(markup: str) -> str:
+    """Convert an HTML body to plain text with a few regex passes."""
+    text = SCRIPT_STYLE_PATTERN.sub(' ', markup)
+    text = BLOCK_BREAK_PATTERN.sub('\n', text)
+    text = TAG_PATTERN.sub(' ', text)
+    text = html.unescape(text)
+    text = SPACES_PATTERN.sub(' ', text)
+    return BLANK_LINES_PATTERN.sub('\n\n', text).strip()
+
+def decode_body(data: str, max_bytes: int) -> bytes:
+    """Decode base64url body data, keeping at most ``max_bytes`` decoded bytes."""
+    # Every 4 encoded characters hold 3 bytes, so cut on a 4-character boundary
+    data = data[:(max_bytes + 2) // 3 * 4]
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))[:max_bytes]
+
+def _is_attachment(part: Dict) -> bool:
+    return bool(part.get('filename')) or 'attachmentId' in part.get('body', {})
+
+def extract_body(payload: Dict, max_bytes: int) -> str:
+    """Extract the text body of a message payload.
+
+    Plain-text parts are used when present; otherwise HTML parts are
+    converted to text. Attachments are skipped without decoding, and no more
+    than ``max_bytes`` are decoded across the whole message.
+    """
+    bodies: Dict[str, List[str]] = {'text/plain': [], 'text/html': []}
+    parts = [payload]
+
+    while parts:
+        part = parts.pop()
+        if part.get('parts'):
+            parts.extend(part['parts'])
+        data = part.get('body', {}).get('data')
+        if data and part.get('mimeType') in bodies and not _is_attachment(part):
+            bodies[part['mimeType']].append(data)
+
+    is_html = not bodies['text/plain']
+    texts = []
+    budget = max_bytes
+    for data in bodies['text/html' if is_html else 'text/plain']:
+        if budget <= 0:
+            break
+        raw = decode_body(data, budget)
+        budget -= len(raw)
+        texts.append(raw.decode('utf-8', errors='replace'))
+
+    if is_html:
+        return '\n'.join(html_to_text(text) for text in texts)
+    return '\n'.join(texts)
+
+def _header(headers: List[Dict], name: str) -> Optional[str]:
+    return next((h['value'] for h in headers if h['name'].lower() == name), None)
+
+def parse_message(msg: Dict, max_body_bytes: int) -> Dict:
+    """Convert a Gmail API message resource into our email dict."""
+    headers = msg['payload'].get('headers', [])
+
+    return {
+        'id': msg['id'],
+        'threadId': msg['threadId'],
+        'subject': _header(headers, 'subject') or '',
+        'sender': _header(headers, 'from') or '',
+        'recipients': (_header(headers, 'to') or '').split(','),
+        'content': extract_body(msg['payload'], max_body_bytes),
+        'timestamp': int(msg['internalDate']),
+        'labels': msg.get('labelIds', [])
+    }
@@ -0,0 +1,150 @@
+from typing import Dict, List, Optional
+import hashlib
+import re
+import numpy as np
+from sqlalchemy import BigInteger, SmallInteger, String, and_, cast, column, func, or_, select, values
+from sqlalchemy.dialects.postgresql import BIT
+from sqlalchemy.orm import Session
+from app.models.document import EmailFingerprint
+from config.config import get_settings
+import logging
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r'\w+')
+SHINGLE_SIZE = 3
+BAND_COUNT = 8
+BAND_BITS = 64 // BAND_COUNT
+BAND_MASK = (1 << BAND_BITS) - 1
+
+def simhash(text: str) -> Optional[int]:
+    """64-bit SimHash over word 3-shingles, or None if the text is too short to fingerprint."""
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < settings.NEAR_DUPLICATE_MIN_WORDS:
+        return None
+
+    shingles = {
+        ' '.join(words[i:i + SHINGLE_SIZE])
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+    digests = b''.join(
+        hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest()
+        for shingle in shingles
+    )
+    # One row of 64 bits per shingle; each bit votes +1 or -1
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, 8), axis=1)
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(shingles)
+
+    fingerprint = 0
+    for bit in np.flatnonzero(votes > 0):
+        fingerprint |= 1 << (63 - int(bit))
+    return fingerprint
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+def bands(fingerprint: int) -> List[int]:
+    """Split a fingerprint into 8-bit bands.
+
+    Two fingerprints within Hamming distance 7 must agree on at least one of
+    the eight bands, so band equality finds every candidate pair.
+    """
+    return [(fingerprint >> (BAND_BITS * i)) & BAND_MASK for i in range(BAND_COUNT)]
+
+def to_signed(fingerprint: int) -> int:
+    """Map an unsigned 64-bit fingerprint into Postgres BIGINT range."""
+    return fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint
+
+class NearDuplicateIndex:
+    """Per-user SimHash index of canonical emails.
+
+    Only canonical emails are indexed, so every near-duplicate links straight
+    to the email whose chunks were stored rather than to another duplicate.
+    """
+
+    def __init__(self, db: Session, max_distance: Optional[int] = None):
+        self.db = db
+        self.max_distance = settings.NEAR_DUPLICATE_MAX_DISTANCE if max_distance is None else max_distance
+        if not 0 <= self.max_distance < BAND_COUNT:
+            # Band matching only finds every pair within BAND_COUNT - 1 bits
+            raise ValueError(f"Near-duplicate distance must be between 0 and {BAND_COUNT - 1}, got {self.max_distance}")
+
+    def find_canonicals(self, user_id: int, fingerprints: Dict[str, int]) -> Dict[str, str]:
+        """Map each email ID whose fingerprint is near an existing canonical email to that email.
+
+        Candidates come from the user's stored fingerprints and from earlier
+        emails in ``fingerprints`` itself, so a batch of near-identical
+        messages keeps only its first one.
+        """
+        if not fingerprints:
+            return {}
+
+        canonicals = self._find_stored_canonicals(user_id, fingerprints)
+
+        batch_canonicals: Dict[str, int] = {}
+        for email_id, fingerprint in fingerprints.items():
+            if email_id in canonicals:
+                continue
+            match = next(
+                (
+                    candidate_id
+                    for candidate_id, candidate in batch_canonicals.items()
+                    if hamming_distance(fingerprint, candidate) <= self.max_distance
+                ),
+                None
+            )
+            if match is not None:
+                canonicals[email_id] = match
+            else:
+                batch_canonicals[email_id] = fingerprint
+
+        return canonicals
+
+    def _find_stored_canonicals(self, user_id: int, fingerprints: Dict[str, int]) -> Dict[str, str]:
+        """Match fingerprints against the user's index in a single query.
+
+        Each fingerprint is joined to stored rows sharing any band, and the
+        Hamming distance is checked in Postgres, so only real matches come
+        back. The closest match wins.
+        """
+        band_columns = [column(f'band_{i}', SmallInteger) for i in range(BAND_COUNT)]
+        probes = values(
+            column('email_id', String),
+            column('simhash', BigInteger),
+            *band_columns,
+            name='probes'
+        ).data([
+            (email_id, to_signed(fingerprint), *bands(fingerprint))
+            for email_id, fingerprint in fingerprints.items()
+        ])
+
+        distance = func.bit_count(cast(EmailFingerprint.simhash.op('#')(probes.c.simhash), BIT(64)))
+        rows = self.db.execute(
+            select(probes.c.email_id, EmailFingerprint.email_id.label('canonical_email_id'))
+            .join(
+                EmailFingerprint,
+                and_(
+                    EmailFingerprint.user_id == user_id,
+                    or_(*(
+                        getattr(EmailFingerprint, f'band_{i}') == probes.c[f'band_{i}']
+                        for i in range(BAND_COUNT)
+                    ))
+                )
+            )
+            .where(distance <= self.max_distance)
+            .order_by(probes.c.email_id, distance)
+            .distinct(probes.c.email_id)
+        ).all()
+
+        return {row.email_id: row.canonical_email_id for row in rows}
+
+    @staticmethod
+    def fingerprint_row(user_id: int, email_id: str, fingerprint: int) -> Dict:
+        """Build the email_fingerprints row for a canonical email."""
+        return {
+            'email_id': email_id,
+            'user_id': user_id,
+            'simhash': to_signed(fingerprint),
+            **{f'band_{i}': band for i, band in enumerate(bands(fingerprint))}
+        }
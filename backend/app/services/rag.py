@@ -1,18 +1,39 @@
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import Float, bindparam, case, select, type_coerce
+from sqlalchemy.engine import Row
 from app.models.document import DocumentChunk
 from app.services.vertex import VertexAIService
+from app.services.answer_cache import AnswerCache
+from app.services.context_packer import ContextPacker
+from app.services.embedding_cache import EmbeddingCache
+from app.services.rate_limiter import rate_limit_user
+from app.services.vector_cache import VectorCache
+from app.services.vector_search import ChunkFilters, SearchOptions, normalize, similarity_to_distance
 import numpy as np
-from datetime import datetime, timedelta
+from config.config import get_settings
 import logging
 
+settings = get_settings()
 logger = logging.getLogger(__name__)
 
+# Columns of the chunks retrieval returns, besides their distance
+CHUNK_COLUMNS = (
+    DocumentChunk.id,
+    DocumentChunk.content,
+    DocumentChunk.chunk_metadata,
+    DocumentChunk.source_type,
+    DocumentChunk.source_id,
+    DocumentChunk.chunk_index,
+)
+
 class RAGService:
     def __init__(self, db: Session, vertex_service: VertexAIService):
         self.db = db
         self.vertex_service = vertex_service
+        self.embedding_cache = EmbeddingCache(db, vertex_service.embedding_model)
+        self.context_packer = ContextPacker()
+        self.vector_cache = VectorCache() if settings.VECTOR_CACHE_ENABLED else None
         self.default_k = 5  # Number of relevant chunks to retrieve
     
     async def query(
@@ -21,31 +42,48 @@ class RAGService:
         query: str,
         k: int = None,
         time_window_days: Optional[int] = None,
-        source_type: Optional[str] = None
+        source_type: Optional[str] = None,
+        search: Optional[SearchOptions] = None,
+        filters: Optional[ChunkFilters] = None
     ) -> str:
         """
         Process a query using RAG:
-        1. Generate query embedding
-        2. Retrieve relevant chunks
-        3. Generate response using context
+        1. Serve a cached answer to the same question
+        2. Generate query embedding
+        3. Retrieve relevant chunks
+        4. Serve a cached answer to a near-duplicate question over the same chunks
+        5. Generate response using context
         """
         try:
+            rate_limit_user.set(user_id)
             k = k or self.default_k
+            search = (search or SearchOptions()).resolved()
+            answer_cache = self._answer_cache(k, time_window_days, source_type, search, filters)
             
-            # Generate query embedding
-            query_embedding = (await self.vertex_service.generate_embeddings([query]))[0]
+            if answer_cache:
+                cached = answer_cache.get(user_id, query)
+                if cached is not None:
+                    return cached
             
-            # Retrieve relevant chunks
+            query_embedding = await self._embed_query(query)
             relevant_chunks = await self._retrieve_relevant_chunks(
                 user_id,
                 query_embedding,
                 k,
                 time_window_days,
-                source_type
+                source_type,
+                search,
+                filters
             )
+            chunk_ids = [chunk.id for chunk in relevant_chunks]
+            
+            if answer_cache:
+                cached = answer_cache.get_similar(user_id, query_embedding, chunk_ids)
+                if cached is not None:
+                    return cached
             
-            # Extract context from chunks
-            context = [chunk.content for chunk in relevant_chunks]
+            # Merge, deduplicate and trim chunks into prompt context
+            context = self.context_packer.pack(relevant_chunks)
             
             # Generate response
             response = await self.vertex_service.generate_response(
@@ -53,93 +91,143 @@ class RAGService:
                 context=context
             )
             
+            if answer_cache:
+                answer_cache.put(user_id, query, query_embedding, chunk_ids, response)
+            
             return response
             
         except Exception as e:
             logger.error(f"Error in RAG query: {str(e)}")
             raise
     
+    async def retrieve(
+        self,
+        user_id: int,
+        query: str,
+        k: int = None,
+        time_window_days: Optional[int] = None,
+        source_type: Optional[str] = None,
+        search: Optional[SearchOptions] = None,
+        filters: Optional[ChunkFilters] = None
+    ) -> List[Row]:
+        """Embed the query and return the most relevant chunks, closest first."""
+        rate_limit_user.set(user_id)
+        return await self._retrieve_relevant_chunks(
+            user_id,
+            await self._embed_query(query),
+            k or self.default_k,
+            time_window_days,
+            source_type,
+            search,
+            filters
+        )
+    
+    def stream_answer(self, query: str, chunks: List[Row]) -> AsyncIterator[str]:
+        """Stream the answer to ``query`` grounded in already retrieved ``chunks``."""
+        return self.vertex_service.stream_response(
+            prompt=query,
+            context=self.context_packer.pack(chunks)
+        )
+    
+    @staticmethod
+    def describe_sources(chunks: List[Row]) -> List[Dict]:
+        """Metadata for the chunks an answer is based on, without their content."""
+        return [
+            {
+                "id": chunk.id,
+                "source_type": chunk.source_type,
+                "source_id": chunk.source_id,
+                "metadata": chunk.chunk_metadata or {}
+            }
+            for chunk in chunks
+        ]
+    
+    async def _embed_query(self, query: str) -> np.ndarray:
+        return normalize((await self.embedding_cache.embed(
+            [query],
+            self.vertex_service.generate_embeddings
+        ))[0])
+    
+    def _answer_cache(
+        self,
+        k: int,
+        time_window_days: Optional[int],
+        source_type: Optional[str],
+        search: SearchOptions,
+        filters: Optional[ChunkFilters]
+    ) -> Optional[AnswerCache]:
+        """Answer cache for queries with these filters, or None when caching is disabled."""
+        if not settings.ANSWER_CACHE_ENABLED:
+            return None
+        return AnswerCache(self.db, {
+            'k': k,
+            'time_window_days': time_window_days,
+            'source_type': source_type,
+            'search': search.model_dump(),
+            'filters': filters.model_dump(mode='json', exclude_none=True) if filters else None,
+            'context_tokens': self.context_packer.max_tokens,
+            'embedding_model': self.vertex_service.embedding_model,
+            'llm_model': self.vertex_service.llm_model
+        })
+    
     async def _retrieve_relevant_chunks(
         self,
         user_id: int,
         query_embedding: np.ndarray,
         k: int,
         time_window_days: Optional[int] = None,
-        source_type: Optional[str] = None
-    ) -> List[DocumentChunk]:
-        """Retrieve the most relevant document chunks using vector similarity."""
+        source_type: Optional[str] = None,
+        search: Optional[SearchOptions] = None,
+        filters: Optional[ChunkFilters] = None
+    ) -> List[Row]:
+        """Retrieve the most relevant chunks using vector similarity, closest first.
+
+        Returns plain rows with just the columns answering needs. Postgres
+        ranks them in one statement, applying selective filters before
+        ranking and the rest while scanning the vector index. Unfiltered
+        searches of users in the vector cache are ranked in process
+        instead, and the winning rows are then read by primary key.
+        """
         try:
-            # Construct the base query
-            base_query = """
-            SELECT id, content, metadata, source_type, source_id,
-                   embedding <-> :query_embedding AS distance
-            FROM document_chunks
-            WHERE user_id = :user_id
-            """
-            
-            # Add optional filters
-            if time_window_days:
-                cutoff_date = datetime.utcnow() - timedelta(days=time_window_days)
-                base_query += " AND created_at >= :cutoff_date"
+            search = search or SearchOptions()
+            filters = (filters or ChunkFilters()).within_days(time_window_days)
+            if self.vector_cache and not source_type and not filters.conditions():
+                ranked = self.vector_cache.search(user_id, query_embedding, k)
+                if ranked is not None:
+                    return self._load_ranked(user_id, ranked, search)
+            
+            if filters.selective:
+                search = search.model_copy(update={'exact': True})
+            search.apply(self.db)
+            
+            distance = DocumentChunk.embedding.op(search.operator, return_type=Float)(
+                bindparam('query_embedding', query_embedding, type_=DocumentChunk.embedding.type)
+            ).label('distance')
+            statement = (
+                select(*CHUNK_COLUMNS, distance)
+                .where(DocumentChunk.user_id == user_id, *filters.conditions())
+                .order_by(distance)
+                .limit(k)
+            )
             
             if source_type:
-                base_query += " AND source_type = :source_type"
-            
-            # Add ordering and limit
-            base_query += """
-            ORDER BY distance
-            LIMIT :k
-            """
-            
-            # Execute the query
-            params = {
-                "user_id": user_id,
-                "query_embedding": query_embedding.tolist(),
-                "k": k,
-                "cutoff_date": cutoff_date if time_window_days else None,
-                "source_type": source_type
-            }
-            
-            result = self.db.execute(text(base_query), params)
-            chunk_ids = [row.id for row in result]
-            
-            # Fetch the actual DocumentChunk objects
-            chunks = self.db.query(DocumentChunk).filter(
-                DocumentChunk.id.in_(chunk_ids)
-            ).all()
+                statement = statement.where(DocumentChunk.source_type == source_type)
             
-            # Sort chunks to maintain the order from the similarity search
-            id_to_chunk = {chunk.id: chunk for chunk in chunks}
-            sorted_chunks = [id_to_chunk[id_] for id_ in chunk_ids]
-            
-            return sorted_chunks
+            return self.db.execute(statement).all()
             
         except Exception as e:
             logger.error(f"Error retrieving relevant chunks: {str(e)}")
             raise
     
-    async def analyze_user_style(self, user_id: int) -> Dict:
-        """Analyze the user's writing style from their emails."""
-        try:
-            # Fetch recent email chunks
-            chunks = self.db.query(DocumentChunk).filter(
-                DocumentChunk.user_id == user_id,
-                DocumentChunk.source_type == 'email'
-            ).order_by(
-                DocumentChunk.created_at.desc()
-            ).limit(50).all()
-            
-            if not chunks:
-                return {"error": "No email data available for analysis"}
-            
-            # Extract content from chunks
-            texts = [chunk.content for chunk in chunks]
-            
-            # Analyze writing style
-            style_analysis = await self.vertex_service.analyze_writing_style(texts)
-            
-            return style_analysis
-            
-        except Exception as e:
-            logger.error(f"Error analyzing user style: {str(e)}")
-            raise 
\ No newline at end of file
+    def _load_ranked(self, user_id: int, ranked: List[Tuple[int, float]], search: SearchOptions) -> List[Row]:
+        """Read the chunks the vector cache ranked by primary key, closest first."""
+        if not ranked:
+            return []
+        metric = search.resolved().metric
+        distances = {chunk_id: similarity_to_distance(similarity, metric) for chunk_id, similarity in ranked}
+        distance = type_coerce(case(distances, value=DocumentChunk.id), Float).label('distance')
+        return self.db.execute(
+            select(*CHUNK_COLUMNS, distance)
+            .where(DocumentChunk.user_id == user_id, DocumentChunk.id.in_(list(distances)))
+            .order_by(distance)
+        ).all()
@@ -0,0 +1,268 @@
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+import asyncio
+import threading
+import time
+import weakref
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from googleapiclient.errors import HttpError
+from app.db.database import SessionLocal
+from app.models.rate_limit import RateLimitBucket
+from config.config import get_settings
+import logging
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# User whose budget upstream calls in the current task are charged to
+rate_limit_user: ContextVar[Optional[int]] = ContextVar('rate_limit_user', default=None)
+
+def _budgets() -> Dict[str, Tuple[float, float, str]]:
+    """(global rate, per-user rate, scope a 429 is charged to) per API, in cost units per second."""
+    return {
+        'gmail': (
+            settings.GMAIL_QUOTA_UNITS_PER_SECOND,
+            settings.GMAIL_USER_QUOTA_UNITS_PER_SECOND,
+            'user'  # Gmail's binding limit is the per-mailbox one
+        ),
+        'vertex': (
+            settings.VERTEX_REQUESTS_PER_SECOND,
+            settings.VERTEX_USER_REQUESTS_PER_SECOND,
+            'global'  # Vertex quotas are per project
+        ),
+    }
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Return how long to back off for a rate-limit error, or None for other errors.
+
+    The result is 0 when the response is a 429 without a usable Retry-After.
+    """
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        reason = str(error.content).lower()
+        if status != 429 and not (status == 403 and 'ratelimitexceeded' in reason):
+            return None
+        header = error.resp.get('retry-after')
+        if not header:
+            return 0.0
+        try:
+            return max(float(header), 0.0)
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(header)
+                return max((retry_at - datetime.now(retry_at.tzinfo)).total_seconds(), 0.0)
+            except (TypeError, ValueError):
+                return 0.0
+
+    # google.api_core errors (TooManyRequests, ResourceExhausted) carry the HTTP code
+    if getattr(error, 'code', None) == 429:
+        return 0.0
+    return None
+
+class _Lease:
+    """Tokens this process took from a shared bucket, usable until ``expires``."""
+
+    def __init__(self, tokens: float, expires: float):
+        self.tokens = tokens
+        self.expires = expires
+
+class RateLimiter:
+    """Token buckets for one upstream API, stored in Postgres.
+
+    Each call draws from a global bucket and, when ``rate_limit_user`` is set,
+    from that user's bucket, so every API and worker process shares the same
+    budget. Processes lease tokens from the buckets in blocks of
+    ``RATE_LIMIT_LEASE_SECONDS`` of budget and spend them locally, so most
+    calls never touch the database, and a process makes one trip to the
+    buckets at a time. Leased tokens left unused lapse, which can only make
+    processes slower than the budget, never faster. A request costing more
+    than a bucket holds is let through once the bucket is full and leaves
+    it in debt, which keeps the average rate at the budget. A 429 blocks
+    the bucket for the Retry-After time, or for an exponential backoff when
+    the response gives none.
+    """
+
+    _leases: Dict[str, _Lease] = {}
+    _leases_lock = threading.Lock()
+    _trip_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+    def __init__(self, api: str):
+        self.api = api
+        self.global_rate, self.user_rate, self.penalty_scope = _budgets()[api]
+        self.burst_seconds = settings.RATE_LIMIT_BURST_SECONDS
+
+    async def call(self, fn: Callable[[], Awaitable[T]], cost: float = 1) -> T:
+        """Run ``fn`` within the budget, retrying it after rate-limit errors."""
+        for attempt in range(settings.RATE_LIMIT_MAX_RETRIES + 1):
+            await self.acquire(cost)
+            try:
+                return await fn()
+            except Exception as e:
+                retry_after = retry_after_seconds(e)
+                if retry_after is None or attempt == settings.RATE_LIMIT_MAX_RETRIES:
+                    raise
+                delay = await asyncio.to_thread(self.penalize, retry_after or None)
+                logger.warning(f"{self.api} rate limited, backing off {delay:.1f}s")
+
+    async def acquire(self, cost: float = 1) -> None:
+        """Wait until the buckets hold ``cost`` tokens, then take them."""
+        while True:
+            if self._take_leased(cost):
+                return
+            async with self._trip_lock():
+                # Another task may have leased while this one waited
+                if self._take_leased(cost):
+                    return
+                wait = await asyncio.to_thread(self._lease, cost)
+                if wait > 0:
+                    # Other tasks queue on the lock rather than polling the buckets
+                    await asyncio.sleep(wait)
+
+    def penalize(self, retry_after: Optional[float] = None) -> float:
+        """Block the bucket a 429 is charged to and return the delay applied."""
+        keys = self._keys()
+        key = keys[-1] if self.penalty_scope == 'user' else keys[0]
+        db = SessionLocal()
+        try:
+            buckets, now = self._lock_buckets(db, [key])
+            bucket = buckets[key]
+            recent = (
+                bucket.blocked_until is not None
+                and bucket.blocked_until > now - timedelta(seconds=settings.RATE_LIMIT_BACKOFF_MAX_SECONDS)
+            )
+            bucket.strikes = bucket.strikes + 1 if recent else 1
+            delay = retry_after if retry_after is not None else min(
+                settings.RATE_LIMIT_BACKOFF_BASE_SECONDS * 2 ** (bucket.strikes - 1),
+                settings.RATE_LIMIT_BACKOFF_MAX_SECONDS
+            )
+            blocked_until = now + timedelta(seconds=delay)
+            if bucket.blocked_until is None or bucket.blocked_until < blocked_until:
+                bucket.blocked_until = blocked_until
+            db.commit()
+            with self._leases_lock:
+                # Go back to the bucket, which now reports the block
+                self._leases.pop(key, None)
+            return delay
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error recording rate limit for {key}: {str(e)}")
+            raise
+        finally:
+            db.close()
+
+    def _keys(self) -> List[str]:
+        keys = [f"{self.api}:global"]
+        user_id = rate_limit_user.get()
+        if user_id is not None:
+            keys.append(f"{self.api}:user:{user_id}")
+        return keys
+
+    def _rate(self, key: str) -> float:
+        return self.global_rate if key.endswith(':global') else self.user_rate
+
+    def _lock_buckets(self, db, keys: List[str]) -> Tuple[Dict[str, RateLimitBucket], datetime]:
+        """Lock the buckets for ``keys`` in key order, creating missing ones full.
+
+        Also returns the database clock in UTC, so every host measures refill
+        against the same time source.
+        """
+        now_utc = func.timezone('UTC', func.clock_timestamp())
+        query = (
+            select(RateLimitBucket, now_utc)
+            .where(RateLimitBucket.key.in_(keys))
+            .order_by(RateLimitBucket.key)
+            .with_for_update(of=RateLimitBucket)
+            .execution_options(populate_existing=True)
+        )
+        rows = db.execute(query).all()
+        if len(rows) < len(keys):
+            db.execute(
+                insert(RateLimitBucket)
+                .values([
+                    {'key': key, 'tokens': self._rate(key) * self.burst_seconds, 'updated_at': now_utc, 'strikes': 0}
+                    for key in keys
+                ])
+                .on_conflict_do_nothing(index_elements=['key'])
+            )
+            rows = db.execute(query).all()
+        return {bucket.key: bucket for bucket, _ in rows}, rows[0][1]
+
+    def _trip_lock(self) -> asyncio.Lock:
+        """Lock serializing this event loop's trips to the shared buckets."""
+        loop = asyncio.get_running_loop()
+        lock = self._trip_locks.get(loop)
+        if lock is None:
+            lock = self._trip_locks[loop] = asyncio.Lock()
+        return lock
+
+    def _leased(self, key: str, cost: float, now: float) -> bool:
+        lease = self._leases.get(key)
+        return lease is not None and lease.expires > now and lease.tokens >= cost
+
+    def _take_leased(self, cost: float) -> bool:
+        """Take ``cost`` tokens from this process's leases, if they all hold enough."""
+        keys = self._keys()
+        now = time.monotonic()
+        with self._leases_lock:
+            if not all(self._leased(key, cost, now) for key in keys):
+                return False
+            for key in keys:
+                self._leases[key].tokens -= cost
+            return True
+
+    def _lease(self, cost: float) -> float:
+        """Lease a block of tokens from every bucket this process lacks, or return how long to wait first."""
+        now_local = time.monotonic()
+        with self._leases_lock:
+            for key in [key for key, lease in self._leases.items() if lease.expires <= now_local]:
+                del self._leases[key]
+            keys = [key for key in self._keys() if not self._leased(key, cost, now_local)]
+        if not keys:
+            return 0.0
+
+        db = SessionLocal()
+        try:
+            buckets, now = self._lock_buckets(db, keys)
+            wait = 0.0
+            available: Dict[str, float] = {}
+            blocks: Dict[str, float] = {}
+            for key, bucket in buckets.items():
+                rate = self._rate(key)
+                capacity = rate * self.burst_seconds
+                elapsed = max((now - bucket.updated_at).total_seconds(), 0.0)
+                available[key] = min(capacity, bucket.tokens + elapsed * rate)
+                blocks[key] = max(cost, rate * settings.RATE_LIMIT_LEASE_SECONDS)
+
+                needed = min(blocks[key], capacity)
+                if available[key] < needed:
+                    wait = max(wait, (needed - available[key]) / rate)
+                if bucket.blocked_until is not None and bucket.blocked_until > now:
+                    wait = max(wait, (bucket.blocked_until - now).total_seconds())
+
+            leased: Dict[str, float] = {}
+            if wait <= 0:
+                for key, bucket in buckets.items():
+                    leased[key] = blocks[key]
+                    bucket.tokens = available[key] - leased[key]
+                    bucket.updated_at = now
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error acquiring {self.api} rate limit: {str(e)}")
+            raise
+        finally:
+            db.close()
+
+        expires = time.monotonic() + settings.RATE_LIMIT_LEASE_SECONDS
+        with self._leases_lock:
+            for key, tokens in leased.items():
+                lease = self._leases.get(key)
+                if lease is not None and lease.expires > now_local:
+                    tokens += lease.tokens
+                self._leases[key] = _Lease(tokens, expires)
+        return wait
@@ -0,0 +1,61 @@
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one upstream call.
+
+    The first caller for a key starts the call; callers arriving while it is
+    in flight wait for the same result (or exception) instead of starting
+    their own. Results are not kept once the call finishes. The call runs as
+    its own task, so one caller giving up does not cancel it for the others;
+    it is cancelled only when every caller waiting on it has been cancelled.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self._metrics: Dict[str, int] = {'calls': 0, 'saved': 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Return the result of ``fn()``, sharing it with concurrent callers using ``key``."""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._calls[key] = task
+            self._waiters[task] = 0
+            task.add_done_callback(lambda _: self._forget(key, task))
+            self._metrics['calls'] += 1
+        else:
+            self._metrics['saved'] += 1
+            logger.debug(f"{self.name}: joined in-flight call")
+
+        self._waiters[task] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._waiters[task] == 1:
+                task.cancel()
+            raise
+        finally:
+            if task in self._waiters:
+                self._waiters[task] -= 1
+
+    def metrics(self) -> Dict:
+        """Upstream calls made and calls saved by coalescing since startup."""
+        requests = self._metrics['calls'] + self._metrics['saved']
+        return {
+            **self._metrics,
+            'in_flight': len(self._calls),
+            'saved_rate': round(self._metrics['saved'] / requests, 4) if requests else 0.0
+        }
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        self._waiters.pop(task, None)
@@ -0,0 +1,297 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from collections import Counter
+from datetime import datetime
+import re
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.models.document import DocumentChunk
+from app.models.user import User
+from app.services.chunking import SENTENCE_BOUNDARY_PATTERN
+from app.services.rate_limiter import rate_limit_user
+from app.services.vertex import VertexAIService
+from config.config import get_settings
+import logging
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+MAX_SENTENCE_WORDS = 60  # Longer sentences share the last histogram bin
+
+GREETING_PATTERN = re.compile(
+    r'^(hi|hello|hey|dear|good morning|good afternoon|good evening|greetings|morning)\b',
+    re.IGNORECASE
+)
+SIGN_OFF_PATTERN = re.compile(
+    r'\b(many thanks|thanks so much|thank you|thanks|thx|best regards|kind regards|warm regards|'
+    r'regards|all the best|best|cheers|sincerely|talk soon|take care)\b[,.!]?(\s+\S+){0,3}\s*$',
+    re.IGNORECASE
+)
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i if in is it its me my of on or our so "
+    "that the their this to was we were will with you your".split()
+)
+
+def empty_stats() -> Dict:
+    return {
+        'emails': 0,
+        'sentences': 0,
+        'words': 0,
+        'word_chars': 0,
+        'exclamations': 0,
+        'questions': 0,
+        'contractions': 0,
+        'sentence_length_hist': [0] * (MAX_SENTENCE_WORDS + 1),
+        'greetings': {},
+        'sign_offs': {},
+        'ngrams': {},
+    }
+
+def compute_stats(rows: Iterable[Sequence]) -> Dict:
+    """Stylometric counts for ``(source_id, content, is_first, is_last)`` chunk rows.
+
+    Sentences repeated within an email (chunk overlap) are counted once.
+    Counts are additive, so stats for new chunks can be merged into a stored
+    profile with ``merge_stats``.
+    """
+    stats = empty_stats()
+    seen: Dict[str, set] = {}
+    hist = stats['sentence_length_hist']
+    ngrams: Counter = Counter()
+    greetings: Counter = Counter()
+    sign_offs: Counter = Counter()
+
+    for source_id, content, is_first, is_last in rows:
+        source_seen = seen.setdefault(source_id, set())
+        if is_first:
+            stats['emails'] += 1
+            match = GREETING_PATTERN.match(content)
+            if match:
+                greetings[match.group(1).lower()] += 1
+        if is_last:
+            match = SIGN_OFF_PATTERN.search(content[-80:])
+            if match:
+                sign_offs[match.group(1).lower()] += 1
+
+        for sentence in SENTENCE_BOUNDARY_PATTERN.split(content):
+            if not sentence or sentence in source_seen:
+                continue
+            source_seen.add(sentence)
+            words = WORD_PATTERN.findall(sentence.lower())
+            if not words:
+                continue
+
+            stats['sentences'] += 1
+            stats['words'] += len(words)
+            hist[min(len(words), MAX_SENTENCE_WORDS)] += 1
+            stats['word_chars'] += sum(map(len, words))
+            stats['contractions'] += sum("'" in word for word in words)
+            stats['exclamations'] += sentence.endswith('!')
+            stats['questions'] += sentence.endswith('?')
+            for n in (2, 3):
+                for start in range(len(words) - n + 1):
+                    gram = words[start:start + n]
+                    if not STOPWORDS.issuperset(gram):
+                        ngrams[' '.join(gram)] += 1
+
+    stats['ngrams'] = dict(ngrams)
+    stats['greetings'] = dict(greetings)
+    stats['sign_offs'] = dict(sign_offs)
+    return stats
+
+def merge_stats(a: Dict, b: Dict) -> Dict:
+    """Add two sets of counts."""
+    merged = {
+        key: a[key] + b[key]
+        for key in ('emails', 'sentences', 'words', 'word_chars', 'exclamations', 'questions', 'contractions')
+    }
+    merged['sentence_length_hist'] = [x + y for x, y in zip(a['sentence_length_hist'], b['sentence_length_hist'])]
+    for key in ('greetings', 'sign_offs', 'ngrams'):
+        merged[key] = dict(Counter(a[key]) + Counter(b[key]))
+    return merged
+
+def truncate_stats(stats: Dict, max_ngrams: Optional[int] = None) -> Dict:
+    """Stats keeping only the ``max_ngrams`` most frequent phrases, for storing."""
+    max_ngrams = max_ngrams or settings.STYLE_PROFILE_MAX_NGRAMS
+    return {**stats, 'ngrams': dict(Counter(stats['ngrams']).most_common(max_ngrams))}
+
+def summarize_stats(stats: Dict) -> Dict:
+    """Turn raw counts into the style features shown to users."""
+    sentences = stats['sentences']
+    words = stats['words']
+    hist = np.array(stats['sentence_length_hist'])
+    bins = np.arange(hist.size)
+
+    def percentile(q: float) -> Optional[int]:
+        if not sentences:
+            return None
+        return int(np.searchsorted(np.cumsum(hist), q * sentences))
+
+    def shares(counts: Dict[str, int], total: int, top: int = 5) -> Dict[str, float]:
+        return {
+            name: round(count / total, 3)
+            for name, count in Counter(counts).most_common(top)
+        } if total else {}
+
+    mean = float((hist * bins).sum() / sentences) if sentences else None
+    return {
+        'emails': stats['emails'],
+        'sentences': sentences,
+        'avg_sentence_words': round(mean, 1) if mean is not None else None,
+        'sentence_words_std': (
+            round(float(np.sqrt((hist * (bins - mean) ** 2).sum() / sentences)), 1)
+            if sentences else None
+        ),
+        'sentence_words_p50': percentile(0.5),
+        'sentence_words_p90': percentile(0.9),
+        'avg_word_chars': round(stats['word_chars'] / words, 2) if words else None,
+        'exclamation_rate': round(stats['exclamations'] / sentences, 3) if sentences else None,
+        'question_rate': round(stats['questions'] / sentences, 3) if sentences else None,
+        'contraction_rate': round(stats['contractions'] / words, 3) if words else None,
+        'greetings': shares(stats['greetings'], stats['emails']),
+        'sign_offs': shares(stats['sign_offs'], stats['emails']),
+        'common_phrases': [gram for gram, _ in Counter(stats['ngrams']).most_common(10)],
+    }
+
+class StyleProfileService:
+    """Writing-style profile kept in ``User.preferences['style_profile']``.
+
+    The profile combines stylometric features computed locally from the
+    user's email chunks with a Gemini analysis of their most recent ones.
+    Refreshes only read chunks added since the last one and merge their
+    counts into the stored ones; they run as background ``style`` jobs once
+    ``STYLE_PROFILE_REFRESH_MIN_CHUNKS`` new chunks have arrived. Counts
+    cannot be subtracted, so the profile is rebuilt from every chunk when
+    the chunks up to the last one no longer number those analyzed, as after
+    a chunk committed later than one with a higher id, or a deletion.
+    """
+
+    def __init__(self, db: Session, vertex_service: Optional[VertexAIService] = None):
+        self.db = db
+        self.vertex_service = vertex_service
+
+    def get_profile(self, user: User) -> Optional[Dict]:
+        """The stored profile without its raw counts, or None if none was built yet."""
+        profile = (user.preferences or {}).get('style_profile')
+        if profile is None:
+            return None
+        return {key: value for key, value in profile.items() if key != 'stats'}
+
+    def needs_refresh(self, user: User) -> bool:
+        """Whether enough email chunks arrived since the profile was built, or it missed some."""
+        profile = (user.preferences or {}).get('style_profile') or {}
+        last_chunk_id = profile.get('last_chunk_id', 0)
+        new_chunks, old_chunks = self.db.execute(
+            select(
+                func.count().filter(DocumentChunk.id > last_chunk_id),
+                func.count().filter(DocumentChunk.id <= last_chunk_id)
+            )
+            .where(DocumentChunk.user_id == user.id, DocumentChunk.source_type == 'email')
+        ).one()
+        if not profile:
+            return new_chunks > 0
+        return (
+            new_chunks >= settings.STYLE_PROFILE_REFRESH_MIN_CHUNKS
+            or old_chunks != profile.get('chunks_analyzed', 0)
+        )
+
+    async def refresh(self, user_id: int) -> Dict:
+        """Fold chunks added since the last refresh into the user's profile and store it."""
+        try:
+            rate_limit_user.set(user_id)
+            user = self.db.get(User, user_id)
+            if user is None:
+                raise ValueError(f"User {user_id} not found")
+
+            profile = (user.preferences or {}).get('style_profile') or {}
+            stats, last_chunk_id, new_chunks = self._fold_chunks(
+                user_id,
+                profile.get('stats') or empty_stats(),
+                profile.get('last_chunk_id', 0)
+            )
+            chunks_analyzed = profile.get('chunks_analyzed', 0) + new_chunks
+
+            stored_chunks = self.db.scalar(
+                select(func.count())
+                .select_from(DocumentChunk)
+                .where(
+                    DocumentChunk.user_id == user_id,
+                    DocumentChunk.source_type == 'email',
+                    DocumentChunk.id <= last_chunk_id
+                )
+            )
+            if stored_chunks != chunks_analyzed:
+                logger.info(
+                    f"Rebuilding style profile for user {user_id}: "
+                    f"{chunks_analyzed} chunks analyzed, {stored_chunks} stored"
+                )
+                stats, last_chunk_id, new_chunks = self._fold_chunks(user_id, empty_stats(), 0)
+                chunks_analyzed = new_chunks
+
+            analysis = profile.get('analysis')
+            if self.vertex_service is not None and (new_chunks or analysis is None):
+                analysis = await self._analyze_recent(user_id) or analysis
+
+            stats = truncate_stats(stats)
+            user.preferences = {
+                **(user.preferences or {}),
+                'style_profile': {
+                    'features': summarize_stats(stats),
+                    'analysis': analysis,
+                    'stats': stats,
+                    'last_chunk_id': last_chunk_id,
+                    'chunks_analyzed': chunks_analyzed,
+                    'updated_at': datetime.utcnow().isoformat()
+                }
+            }
+            self.db.commit()
+            logger.info(f"Refreshed style profile for user {user_id} with {new_chunks} new chunks")
+            return {'new_chunks': new_chunks, 'last_chunk_id': last_chunk_id}
+
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error refreshing style profile: {str(e)}")
+            raise
+
+    def _fold_chunks(self, user_id: int, stats: Dict, last_chunk_id: int) -> Tuple[Dict, int, int]:
+        """Merge counts for email chunks after ``last_chunk_id``; returns stats, the new last id and chunks read."""
+        new_chunks = 0
+        last_index = func.max(DocumentChunk.chunk_index).over(partition_by=DocumentChunk.source_id)
+        result = self.db.execute(
+            select(
+                DocumentChunk.id,
+                DocumentChunk.source_id,
+                DocumentChunk.content,
+                DocumentChunk.chunk_index == 0,
+                DocumentChunk.chunk_index == last_index
+            )
+            .where(
+                DocumentChunk.user_id == user_id,
+                DocumentChunk.source_type == 'email',
+                DocumentChunk.id > last_chunk_id
+            )
+            .order_by(DocumentChunk.id)
+            .execution_options(yield_per=settings.STYLE_PROFILE_BATCH_SIZE)
+        )
+        for rows in result.partitions():
+            stats = merge_stats(stats, compute_stats(row[1:] for row in rows))
+            last_chunk_id = rows[-1][0]
+            new_chunks += len(rows)
+        return stats, last_chunk_id, new_chunks
+
+    async def _analyze_recent(self, user_id: int) -> Optional[Dict]:
+        """Gemini's reading of the user's most recent email chunks, or None if it fails."""
+        texts = list(self.db.scalars(
+            select(DocumentChunk.content)
+            .where(DocumentChunk.user_id == user_id, DocumentChunk.source_type == 'email')
+            .order_by(DocumentChunk.created_at.desc())
+            .limit(settings.STYLE_PROFILE_ANALYSIS_CHUNKS)
+        ))
+        if not texts:
+            return None
+        try:
+            return await self.vertex_service.analyze_writing_style(texts)
+        except Exception as e:
+            logger.warning(f"Keeping previous style analysis for user {user_id}: {str(e)}")
+            return None
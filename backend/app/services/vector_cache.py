@@ -0,0 +1,332 @@
+from typing import Dict, List, Optional, Set, Tuple
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+import asyncio
+import fcntl
+import json
+import os
+import shutil
+import time
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.db.database import SessionLocal
+from app.models.document import DocumentChunk
+from config.config import get_settings
+import logging
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = 1536
+BLOCK_ROWS = 1024  # float16 rows converted to float32 at a time while scoring
+
+class _MappedUser:
+    """One user's embedding matrix mapped into this process."""
+
+    def __init__(self, meta: Dict, ids: np.ndarray, vectors: np.ndarray, meta_stat: Tuple[int, int, int]):
+        self.meta = meta
+        self.ids = ids
+        self.vectors = vectors
+        self.meta_stat = meta_stat  # meta.json's (mtime_ns, inode, size) when last read
+
+    @property
+    def nbytes(self) -> int:
+        return self.ids.nbytes + self.vectors.nbytes
+
+class VectorCache:
+    """Exact in-process search over the embeddings of frequently querying users.
+
+    Once a user has made ``VECTOR_CACHE_HOT_QUERIES`` queries, their chunk
+    embeddings are copied from Postgres into flat files under
+    ``VECTOR_CACHE_DIR``: ids and an (n, 1536) float32 or float16 matrix,
+    appended to as chunks arrive and described by ``meta.json``. Processes
+    memory-map the files read-only, so uvicorn workers share one copy
+    through the page cache, and score a query against every chunk with one
+    matrix product. Mapped users are evicted least recently used once
+    ``VECTOR_CACHE_MAX_MB`` is exceeded.
+
+    Postgres stays the source of truth: ``EmailProcessor`` appends new
+    chunks after each batch, files that no longer match Postgres's row
+    count are rebuilt, and a user without usable files is searched in
+    Postgres.
+    """
+
+    _mapped: "OrderedDict[int, _MappedUser]" = OrderedDict()
+    _queries: Counter = Counter()
+    _building: Set[int] = set()
+    _metrics: Dict[str, int] = {'hits': 0, 'misses': 0, 'builds': 0}
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or settings.VECTOR_CACHE_DIR
+        self.dtype = np.dtype(settings.VECTOR_CACHE_DTYPE)
+
+    def search(self, user_id: int, query_embedding: np.ndarray, k: int) -> Optional[List[Tuple[int, float]]]:
+        """Ids and cosine similarities of the user's ``k`` closest chunks, best first.
+
+        Returns None if the user is not cached yet; the cache is then built
+        in the background once the user has queried often enough.
+        """
+        mapped = self._map(user_id)
+        if mapped is None:
+            self._metrics['misses'] += 1
+            self._queries[user_id] += 1
+            if self._queries[user_id] >= settings.VECTOR_CACHE_HOT_QUERIES:
+                self._schedule_build(user_id)
+            return None
+
+        self._metrics['hits'] += 1
+        rows = mapped.ids.shape[0]
+        if not rows:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if mapped.vectors.dtype == np.float32:
+            scores = mapped.vectors @ query
+        else:
+            scores = np.concatenate([
+                mapped.vectors[start:start + BLOCK_ROWS].astype(np.float32) @ query
+                for start in range(0, rows, BLOCK_ROWS)
+            ])
+        k = min(k, rows)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(mapped.ids[i]), float(scores[i])) for i in top]
+
+    def build(self, user_id: int) -> int:
+        """Copy the user's embeddings to disk, unless too many for the budget; returns rows cached."""
+        db = SessionLocal()
+        try:
+            rows = db.scalar(
+                select(func.count()).select_from(DocumentChunk).where(DocumentChunk.user_id == user_id)
+            )
+            if rows * self._row_bytes() > settings.VECTOR_CACHE_MAX_MB * 1024 * 1024:
+                logger.info(f"Not caching vectors for user {user_id}: {rows} chunks exceed the memory budget")
+                return 0
+            self._metrics['builds'] += 1
+            return self.extend(db, user_id, create=True)
+        finally:
+            db.close()
+
+    def extend(self, db: Session, user_id: int, create: bool = False) -> int:
+        """Append chunks added since the user's files were written; returns rows appended.
+
+        Chunks are appended in id order past the last one cached, so a chunk
+        committed after one with a higher id, or a deleted chunk, leaves the
+        files short of or ahead of Postgres. Row counts are compared after
+        each append and the files are rebuilt when they differ. Does
+        nothing for users without files unless ``create`` is set. Errors
+        are logged rather than raised, as searches fall back to Postgres.
+        """
+        if not settings.VECTOR_CACHE_ENABLED or not (create or os.path.exists(self._meta_path(user_id))):
+            return 0
+        try:
+            stale = False
+            with self._locked(user_id):
+                meta = self._read_meta(user_id)
+                if meta is None:
+                    if not create:
+                        return 0
+                    meta = self._create_version(user_id)
+                version_dir = os.path.join(self._user_dir(user_id), meta['version'])
+                row_bytes = self._row_bytes(meta['dtype'])
+
+                appended = 0
+                with open(os.path.join(version_dir, 'ids.bin'), 'r+b') as ids_file, \
+                        open(os.path.join(version_dir, 'vectors.bin'), 'r+b') as vectors_file:
+                    # Drop rows written by an append that never updated meta.json
+                    ids_file.truncate(meta['rows'] * 8)
+                    vectors_file.truncate(meta['rows'] * row_bytes)
+                    ids_file.seek(0, os.SEEK_END)
+                    vectors_file.seek(0, os.SEEK_END)
+
+                    result = db.execute(
+                        select(DocumentChunk.id, DocumentChunk.embedding)
+                        .where(
+                            DocumentChunk.user_id == user_id,
+                            DocumentChunk.id > meta['last_id'],
+                            DocumentChunk.embedding.isnot(None)
+                        )
+                        .order_by(DocumentChunk.id)
+                        .execution_options(yield_per=settings.VECTOR_CACHE_BATCH_SIZE)
+                    )
+                    for batch in result.partitions():
+                        ids = np.array([row[0] for row in batch], dtype=np.int64)
+                        vectors = np.stack([row[1] for row in batch]).astype(np.float32)
+                        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+                        vectors = vectors / np.where(norms == 0, 1, norms)
+                        ids_file.write(ids.tobytes())
+                        vectors_file.write(vectors.astype(meta['dtype']).tobytes())
+                        meta['rows'] += len(ids)
+                        meta['last_id'] = int(ids[-1])
+                        appended += len(ids)
+
+                if appended or create:
+                    self._write_meta(user_id, meta)
+
+                # Chunks committed later than the append above may only have higher ids
+                stored = db.scalar(
+                    select(func.count())
+                    .select_from(DocumentChunk)
+                    .where(
+                        DocumentChunk.user_id == user_id,
+                        DocumentChunk.id <= meta['last_id'],
+                        DocumentChunk.embedding.isnot(None)
+                    )
+                )
+                stale = stored != meta['rows'] and not create
+            
+            if stale:
+                logger.info(f"Rebuilding vector cache for user {user_id}: {meta['rows']} rows cached, {stored} stored")
+                self.invalidate(user_id)
+                self.build(user_id)
+            return appended
+
+        except Exception as e:
+            logger.error(f"Error extending vector cache for user {user_id}: {str(e)}")
+            return 0
+
+    def reconcile(self, db: Session) -> None:
+        """Bring every cached user's files in line with Postgres, e.g. after chunks were deleted."""
+        for user_id in self.cached_users():
+            self.extend(db, user_id)
+
+    def invalidate(self, user_id: int) -> None:
+        """Delete the user's files; processes unmap them on their next search."""
+        user_dir = self._user_dir(user_id)
+        if not os.path.isdir(user_dir):
+            return
+        with self._locked(user_id):
+            meta_path = self._meta_path(user_id)
+            if os.path.exists(meta_path):
+                os.remove(meta_path)
+            for name in os.listdir(user_dir):
+                if name.startswith('v'):
+                    shutil.rmtree(os.path.join(user_dir, name), ignore_errors=True)
+
+    def cached_users(self) -> List[int]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            int(name[1:]) for name in os.listdir(self.directory)
+            if name.startswith('u') and name[1:].isdigit()
+            and os.path.exists(self._meta_path(int(name[1:])))
+        )
+
+    @classmethod
+    def metrics(cls) -> Dict:
+        """Searches served from the cache and this process's mapped users since startup."""
+        searches = cls._metrics['hits'] + cls._metrics['misses']
+        return {
+            **cls._metrics,
+            'hit_rate': round(cls._metrics['hits'] / searches, 4) if searches else 0.0,
+            'mapped_users': len(cls._mapped),
+            'mapped_mb': round(sum(mapped.nbytes for mapped in cls._mapped.values()) / 1024 / 1024, 1)
+        }
+
+    def _map(self, user_id: int) -> Optional[_MappedUser]:
+        """The user's current matrix, remapped if meta.json changed since it was mapped.
+
+        meta.json is only parsed again when its stat changes. It is always
+        replaced by a new file, and the inode and size are compared along
+        with the mtime since a coarse mtime can miss a quick rewrite.
+        """
+        try:
+            st = os.stat(self._meta_path(user_id))
+        except (FileNotFoundError, NotADirectoryError):
+            self._mapped.pop(user_id, None)
+            return None
+        meta_stat = (st.st_mtime_ns, st.st_ino, st.st_size)
+
+        mapped = self._mapped.get(user_id)
+        if mapped is not None and mapped.meta_stat == meta_stat:
+            self._mapped.move_to_end(user_id)
+            return mapped
+
+        meta = self._read_meta(user_id)
+        if meta is None:
+            self._mapped.pop(user_id, None)
+            return None
+        if mapped is not None and mapped.meta == meta:
+            mapped.meta_stat = meta_stat
+        else:
+            try:
+                version_dir = os.path.join(self._user_dir(user_id), meta['version'])
+                rows = meta['rows']
+                if rows:
+                    ids = np.memmap(os.path.join(version_dir, 'ids.bin'), dtype=np.int64, mode='r', shape=(rows,))
+                    vectors = np.memmap(
+                        os.path.join(version_dir, 'vectors.bin'),
+                        dtype=meta['dtype'],
+                        mode='r',
+                        shape=(rows, meta['dim'])
+                    )
+                else:
+                    ids = np.empty(0, dtype=np.int64)
+                    vectors = np.empty((0, meta['dim']), dtype=meta['dtype'])
+            except (OSError, ValueError) as e:
+                # Removed by a rebuild between reading meta.json and mapping
+                logger.debug(f"Vector cache for user {user_id} changed while mapping: {str(e)}")
+                return None
+            mapped = _MappedUser(meta, ids, vectors, meta_stat)
+            self._mapped[user_id] = mapped
+            self._evict()
+        self._mapped.move_to_end(user_id)
+        return mapped
+
+    def _evict(self) -> None:
+        budget = settings.VECTOR_CACHE_MAX_MB * 1024 * 1024
+        used = sum(mapped.nbytes for mapped in self._mapped.values())
+        while used > budget and len(self._mapped) > 1:
+            user_id, mapped = self._mapped.popitem(last=False)
+            used -= mapped.nbytes
+            self._queries.pop(user_id, None)
+            logger.debug(f"Unmapped vector cache for user {user_id}")
+
+    def _schedule_build(self, user_id: int) -> None:
+        if user_id in self._building:
+            return
+        self._building.add(user_id)
+        future = asyncio.get_running_loop().run_in_executor(None, self.build, user_id)
+        future.add_done_callback(lambda _: self._building.discard(user_id))
+
+    def _create_version(self, user_id: int) -> Dict:
+        version = f"v{time.time_ns()}"
+        version_dir = os.path.join(self._user_dir(user_id), version)
+        os.makedirs(version_dir)
+        for name in ('ids.bin', 'vectors.bin'):
+            open(os.path.join(version_dir, name), 'wb').close()
+        return {'version': version, 'dtype': self.dtype.name, 'dim': DIMENSIONS, 'rows': 0, 'last_id': 0}
+
+    def _read_meta(self, user_id: int) -> Optional[Dict]:
+        try:
+            with open(self._meta_path(user_id)) as f:
+                return json.load(f)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+
+    def _write_meta(self, user_id: int, meta: Dict) -> None:
+        """Replace meta.json atomically, so readers see either the old or the new row count."""
+        path = self._meta_path(user_id)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(meta, f)
+        os.replace(f"{path}.tmp", path)
+
+    @contextmanager
+    def _locked(self, user_id: int):
+        """Serialize writers to the user's files across processes."""
+        os.makedirs(self._user_dir(user_id), exist_ok=True)
+        with open(os.path.join(self._user_dir(user_id), 'lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _row_bytes(self, dtype: Optional[str] = None) -> int:
+        return DIMENSIONS * np.dtype(dtype or self.dtype).itemsize
+
+    def _user_dir(self, user_id: int) -> str:
+        return os.path.join(self.directory, f"u{int(user_id)}")
+
+    def _meta_path(self, user_id: int) -> str:
+        return os.path.join(self._user_dir(user_id), 'meta.json')
@@ -0,0 +1,170 @@
+from typing import List, Literal, Optional
+from datetime import datetime, timedelta
+import numpy as np
+from pydantic import BaseModel, Field
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
+from app.models.document import DocumentChunk
+from config.config import get_settings
+
+settings = get_settings()
+
+# Distance operator and index operator class for each metric. Embeddings are
+# normalized on ingest (and those stored earlier by migration 012), so all
+# three rank the same way; they differ in speed and in which index they can
+# use. Partitions indexed for another metric need
+# scripts/partition_document_chunks.py --reindex.
+METRICS = {
+    'l2': ('<->', 'vector_l2_ops'),
+    'cosine': ('<=>', 'vector_cosine_ops'),
+    'inner_product': ('<#>', 'vector_ip_ops'),
+}
+INDEX_TYPES = ('hnsw', 'ivfflat')
+
+APPLIED_KEY = 'vector_search_applied'  # Session.info key: transaction with options applied
+
+Metric = Literal['l2', 'cosine', 'inner_product']
+
+def normalize(embedding: np.ndarray) -> np.ndarray:
+    """Scale an embedding to unit length (zero vectors are returned as is)."""
+    embedding = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(embedding)
+    return embedding / norm if norm else embedding
+
+def similarity_to_distance(similarity: float, metric: str) -> float:
+    """The distance ``metric`` reports for unit vectors with this cosine similarity."""
+    if metric == 'l2':
+        return float(np.sqrt(max(2 - 2 * similarity, 0.0)))
+    if metric == 'inner_product':
+        return -similarity
+    return 1 - similarity
+
+class SearchOptions(BaseModel):
+    """Vector search settings for one query; unset fields use the deployment's.
+
+    ``ef_search`` applies to HNSW indexes and ``probes`` to ivfflat ones;
+    higher values trade latency for recall. ``exact`` skips the vector
+    index and scans every chunk in the user's partition.
+    """
+
+    metric: Optional[Metric] = None
+    ef_search: Optional[int] = Field(default=None, ge=1, le=1000)
+    probes: Optional[int] = Field(default=None, ge=1, le=10000)
+    exact: bool = False
+
+    def resolved(self) -> "SearchOptions":
+        """A copy with every unset field filled from settings."""
+        return SearchOptions(
+            metric=self.metric or settings.VECTOR_SIMILARITY_METRIC,
+            ef_search=self.ef_search or settings.HNSW_EF_SEARCH,
+            probes=self.probes or settings.IVFFLAT_PROBES,
+            exact=self.exact
+        )
+
+    @property
+    def operator(self) -> str:
+        return METRICS[self.metric or settings.VECTOR_SIMILARITY_METRIC][0]
+
+    def apply(self, db: Session) -> None:
+        """Set the index scan parameters for the rest of the current transaction.
+
+        Connections start with the deployment's settings, so this sends
+        nothing for default options unless others were applied earlier in
+        the same transaction.
+        """
+        options = self.resolved()
+        transaction = db.get_transaction()
+        if options == SearchOptions().resolved() and (transaction is None or db.info.get(APPLIED_KEY) is not transaction):
+            return
+        db.execute(
+            text("""
+            SELECT set_config('hnsw.ef_search', :ef_search, true),
+                   set_config('ivfflat.probes', :probes, true),
+                   set_config('enable_indexscan', :indexscan, true)
+            """),
+            {
+                "ef_search": str(options.ef_search),
+                "probes": str(options.probes),
+                "indexscan": 'off' if options.exact else 'on'
+            }
+        )
+        db.info[APPLIED_KEY] = db.get_transaction()
+
+class ChunkFilters(BaseModel):
+    """Restrictions on which email chunks a search considers.
+
+    ``sender`` matches the sender's address exactly when it contains an
+    ``@``, and any part of the From header otherwise. ``labels`` must all
+    be present on the email.
+    """
+
+    after: Optional[datetime] = None
+    before: Optional[datetime] = None
+    sender: Optional[str] = Field(default=None, min_length=1)
+    thread_id: Optional[str] = None
+    labels: Optional[List[str]] = None
+
+    def within_days(self, days: Optional[int]) -> "ChunkFilters":
+        """A copy also limited to emails sent in the last ``days`` days."""
+        if not days:
+            return self
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        return self.model_copy(update={'after': max(self.after or cutoff, cutoff)})
+
+    @property
+    def selective(self) -> bool:
+        """Whether few enough chunks match to rank them all exactly.
+
+        Vector indexes apply filters after collecting their candidates, so
+        a narrow filter can leave fewer than k results; such searches scan
+        the matching rows through the filter indexes instead.
+        """
+        if self.sender or self.thread_id:
+            return True
+        # System labels (INBOX, SENT, CATEGORY_*) are upper case and cover
+        # much of a mailbox; user labels have IDs like Label_12
+        if self.labels and not all(label.isupper() for label in self.labels):
+            return True
+        if self.after is None:
+            return False
+        return (self.before or datetime.utcnow()) - self.after <= timedelta(days=settings.VECTOR_PREFILTER_MAX_DAYS)
+
+    def conditions(self) -> List[ColumnElement]:
+        conditions = []
+        if self.after:
+            conditions.append(DocumentChunk.email_timestamp >= self.after)
+        if self.before:
+            conditions.append(DocumentChunk.email_timestamp < self.before)
+        if self.sender and '@' in self.sender:
+            conditions.append(DocumentChunk.sender_address == self.sender.strip().lower())
+        elif self.sender:
+            conditions.append(DocumentChunk.sender.icontains(self.sender, autoescape=True))
+        if self.thread_id:
+            conditions.append(DocumentChunk.thread_id == self.thread_id)
+        if self.labels:
+            conditions.append(DocumentChunk.labels.contains(self.labels))
+        return conditions
+
+def index_definition(table: str, index_type: Optional[str] = None, metric: Optional[str] = None, rows: int = 0) -> str:
+    """``USING ...`` clause for an embedding index on ``table``.
+
+    ivfflat lists default to one per thousand rows, as pgvector recommends,
+    so ivfflat indexes should be rebuilt once a partition has filled up.
+    """
+    index_type = index_type or settings.VECTOR_INDEX_TYPE
+    opclass = METRICS[metric or settings.VECTOR_SIMILARITY_METRIC][1]
+    if index_type == 'hnsw':
+        return (
+            f"USING hnsw (embedding {opclass}) "
+            f"WITH (m = {int(settings.HNSW_M)}, ef_construction = {int(settings.HNSW_EF_CONSTRUCTION)})"
+        )
+    if index_type == 'ivfflat':
+        lists = settings.IVFFLAT_LISTS or max(rows // 1000, 1)
+        return f"USING ivfflat (embedding {opclass}) WITH (lists = {int(lists)})"
+    raise ValueError(f"Unknown vector index type: {index_type}")
+
+def index_name(table: str, index_type: Optional[str] = None, metric: Optional[str] = None) -> str:
+    index_type = index_type or settings.VECTOR_INDEX_TYPE
+    metric = metric or settings.VECTOR_SIMILARITY_METRIC
+    return f"{table}_{index_type}_{metric}_idx"
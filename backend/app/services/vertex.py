@@ -1,7 +1,12 @@
-from google.cloud import aiplatform
-from google.cloud.aiplatform.gapic.schema import predict
-from typing import List, Dict, Optional
+import vertexai
+from vertexai.generative_models import GenerativeModel
+from vertexai.language_models import TextEmbeddingModel
+from fastapi import HTTPException, Request
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Optional, TypeVar
+import asyncio
 import numpy as np
+from app.services.rate_limiter import RateLimiter
+from app.services.single_flight import SingleFlight
 from config.config import get_settings
 import json
 import logging
@@ -9,20 +14,45 @@ import logging
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+T = TypeVar('T')
+
 class VertexAIService:
+    """Vertex AI client holding one embedding and one generative model handle.
+
+    Create it once per process (the API builds it in the app lifespan, each
+    worker at startup) and share it: the SDK is initialised and the model
+    handles are loaded here, and both handles are safe to call from
+    concurrent requests. Calls use the SDK's async methods, so they never
+    block the event loop; at most VERTEX_MAX_CONCURRENT_REQUESTS run at
+    once per process and each one is bounded by a timeout. Identical calls
+    made while one is already in flight share its result instead of being
+    sent (and billed) again.
+    """
+
     def __init__(self):
-        aiplatform.init(
+        vertexai.init(
             project=settings.GOOGLE_CLOUD_PROJECT,
             location=settings.GOOGLE_CLOUD_LOCATION
         )
-        self.embedding_model = "textembedding-gecko@latest"
-        self.llm_model = "gemini-pro"
-        
+        self.embedding_model = settings.VERTEX_EMBEDDING_MODEL
+        self.llm_model = settings.VERTEX_LLM_MODEL
+        self.rate_limiter = RateLimiter('vertex')
+        self._embedding_client = TextEmbeddingModel.from_pretrained(self.embedding_model)
+        self._generative_client = GenerativeModel(self.llm_model)
+        self._semaphore = asyncio.Semaphore(settings.VERTEX_MAX_CONCURRENT_REQUESTS)
+        self.single_flight = SingleFlight('vertex')
+        logger.info(f"Loaded Vertex AI models {self.embedding_model} and {self.llm_model}")
+    
     async def generate_embeddings(self, texts: List[str]) -> List[np.ndarray]:
         """Generate embeddings for a list of texts using Vertex AI."""
         try:
-            model = aiplatform.TextEmbeddingModel.from_pretrained(self.embedding_model)
-            embeddings = model.get_embeddings(texts)
+            embeddings = await self.single_flight.do(
+                ('embed', tuple(texts)),
+                lambda: self._call(
+                    lambda: self._embedding_client.get_embeddings_async(texts),
+                    settings.VERTEX_EMBEDDING_TIMEOUT_SECONDS
+                )
+            )
             return [np.array(embedding.values) for embedding in embeddings]
         except Exception as e:
             logger.error(f"Error generating embeddings: {str(e)}")
@@ -36,28 +66,16 @@ class VertexAIService:
     ) -> str:
         """Generate a response using Vertex AI's Gemini model."""
         try:
-            model = aiplatform.GenerativeModel.from_pretrained(self.llm_model)
-            
-            # Construct the prompt with context if provided
-            if context:
-                context_str = "\n".join(context)
-                full_prompt = f"""Context:
-                {context_str}
-                
-                Based on the above context, please respond to:
-                {prompt}
-                """
-            else:
-                full_prompt = prompt
-            
-            response = model.generate_content(
-                full_prompt,
-                generation_config={
-                    "temperature": temperature,
-                    "top_p": 0.8,
-                    "top_k": 40,
-                    "max_output_tokens": 1024,
-                }
+            full_prompt = self._build_prompt(prompt, context)
+            response = await self.single_flight.do(
+                ('generate', full_prompt, temperature),
+                lambda: self._call(
+                    lambda: self._generative_client.generate_content_async(
+                        full_prompt,
+                        generation_config=self._generation_config(temperature)
+                    ),
+                    settings.VERTEX_GENERATION_TIMEOUT_SECONDS
+                )
             )
             
             return response.text
@@ -66,11 +84,73 @@ class VertexAIService:
             logger.error(f"Error generating response: {str(e)}")
             raise
     
+    async def stream_response(
+        self,
+        prompt: str,
+        context: Optional[List[str]] = None,
+        temperature: float = 0.7
+    ) -> AsyncIterator[str]:
+        """Yield response text as Gemini generates it.
+
+        Each wait for the next piece is bounded by the generation timeout.
+        Closing the iterator early (e.g. when the client disconnects) closes
+        the upstream stream and stops generation.
+        """
+        await self.rate_limiter.acquire()
+        async with self._semaphore:
+            stream = None
+            try:
+                stream = await asyncio.wait_for(
+                    self._generative_client.generate_content_async(
+                        self._build_prompt(prompt, context),
+                        generation_config=self._generation_config(temperature),
+                        stream=True
+                    ),
+                    settings.VERTEX_GENERATION_TIMEOUT_SECONDS
+                )
+                pieces = stream.__aiter__()
+                while True:
+                    try:
+                        piece = await asyncio.wait_for(
+                            pieces.__anext__(),
+                            settings.VERTEX_GENERATION_TIMEOUT_SECONDS
+                        )
+                    except StopAsyncIteration:
+                        break
+                    if piece.text:
+                        yield piece.text
+            
+            except Exception as e:
+                logger.error(f"Error streaming response: {str(e)}")
+                raise
+            finally:
+                if stream is not None and hasattr(stream, 'aclose'):
+                    await stream.aclose()
+    
+    @staticmethod
+    def _build_prompt(prompt: str, context: Optional[List[str]]) -> str:
+        """Construct the prompt with context if provided."""
+        if not context:
+            return prompt
+        
+        context_str = "\n\n".join(context)
+        return (
+            f"Context:\n{context_str}\n\n"
+            f"Based on the above context, please respond to:\n{prompt}"
+        )
+    
+    @staticmethod
+    def _generation_config(temperature: float) -> Dict:
+        return {
+            "temperature": temperature,
+            "top_p": 0.8,
+            "top_k": 40,
+            "max_output_tokens": 1024,
+        }
+    
     async def analyze_writing_style(self, texts: List[str]) -> Dict:
         """Analyze writing style using Vertex AI."""
         try:
-            model = aiplatform.GenerativeModel.from_pretrained(self.llm_model)
-            
             analysis_prompt = f"""Analyze the writing style in the following texts and extract key characteristics:
             
             Texts:
@@ -85,7 +165,13 @@ class VertexAIService:
             
             Return the analysis in JSON format."""
             
-            response = model.generate_content(analysis_prompt)
+            response = await self.single_flight.do(
+                ('generate', analysis_prompt, None),
+                lambda: self._call(
+                    lambda: self._generative_client.generate_content_async(analysis_prompt),
+                    settings.VERTEX_GENERATION_TIMEOUT_SECONDS
+                )
+            )
             
             # Parse the JSON response
             try:
@@ -98,4 +184,23 @@ class VertexAIService:
             
         except Exception as e:
             logger.error(f"Error analyzing writing style: {str(e)}")
-            raise 
\ No newline at end of file
+            raise 
+    
+    async def _call(self, request: Callable[[], Awaitable[T]], timeout: float) -> T:
+        """Run one Vertex request within the rate limit, the concurrency limit and ``timeout``."""
+        async def bounded() -> T:
+            async with self._semaphore:
+                try:
+                    return await asyncio.wait_for(request(), timeout)
+                except asyncio.TimeoutError:
+                    logger.warning(f"Vertex AI request timed out after {timeout}s")
+                    raise
+        
+        return await self.rate_limiter.call(bounded)
+
+def get_vertex_service(request: Request) -> VertexAIService:
+    """Dependency returning the process-wide service created at startup."""
+    vertex_service = getattr(request.app.state, 'vertex_service', None)
+    if vertex_service is None:
+        raise HTTPException(status_code=503, detail="Vertex AI is not available")
+    return vertex_service
@@ -0,0 +1,214 @@
+"""Ingestion worker.
+
+Claims email ingestion jobs from the ingestion_jobs table and runs them in
+separate processes, so syncs and backfills never share the API's event
+loop or database pool.
+
+Usage:
+    python -m app.worker [--processes 2]
+"""
+from typing import Dict, Optional
+from datetime import datetime, timedelta
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from app.db.database import SessionLocal
+from app.models.job import IngestionJob
+from app.models.user import User
+from app.services.answer_cache import AnswerCache
+from app.services.cpu_pool import shutdown_pool
+from app.services.email_processor import EmailProcessor
+from app.services.embedding_cache import EmbeddingCache
+from app.services.gmail import GmailService
+from app.services.job_queue import JobQueue
+from app.services.style_profile import StyleProfileService
+from app.services.vector_cache import VectorCache
+from app.services.vertex import VertexAIService
+from config.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+class Worker:
+    """Polls the job queue and runs one job at a time."""
+
+    def __init__(self, index: int = 0):
+        self.index = index
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = asyncio.Event()
+        self.next_stale_check = datetime.utcnow()
+        self.next_purge = datetime.utcnow()
+        self.vertex_service: Optional[VertexAIService] = None
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self.stopping.set)
+
+        # Shared by every job this worker runs
+        self.vertex_service = VertexAIService()
+        queue_db = SessionLocal()
+        queue = JobQueue(queue_db)
+        logger.info(f"Worker {self.worker_id} started")
+        try:
+            while not self.stopping.is_set():
+                self._housekeeping(queue)
+                job = queue.claim(self.worker_id)
+                if job is None:
+                    try:
+                        await asyncio.wait_for(self.stopping.wait(), settings.JOB_POLL_INTERVAL_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._run_claimed(queue, job)
+        finally:
+            queue_db.close()
+            shutdown_pool()
+            logger.info(f"Worker {self.worker_id} stopped")
+
+    async def _run_claimed(self, queue: JobQueue, job: IngestionJob) -> None:
+        """Run a claimed job, heartbeating until it finishes or the worker stops."""
+        logger.info(f"Worker {self.worker_id} running {job.kind} job {job.id} for user {job.user_id}")
+        task = asyncio.create_task(self._execute(queue, job))
+        stop = asyncio.create_task(self.stopping.wait())
+        try:
+            while not task.done():
+                await asyncio.wait(
+                    {task, stop},
+                    timeout=settings.JOB_HEARTBEAT_SECONDS,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if stop.done() and not task.done():
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+                    queue.release(job, self.worker_id)
+                    logger.info(f"Released job {job.id} on shutdown")
+                    return
+                if not task.done():
+                    queue.heartbeat(job.id, self.worker_id)
+
+            queue.complete(job, self.worker_id, task.result())
+            logger.info(f"Job {job.id} succeeded")
+        except Exception as e:
+            queue.fail(job, self.worker_id, str(e))
+        finally:
+            stop.cancel()
+
+    async def _execute(self, queue: JobQueue, job: IngestionJob) -> Dict:
+        db = SessionLocal()
+        try:
+            user = db.get(User, job.user_id)
+            if user is None:
+                raise ValueError(f"User {job.user_id} not found")
+
+            if job.kind == 'style':
+                return await StyleProfileService(db, self.vertex_service).refresh(user.id)
+
+            gmail_service = GmailService({
+                'access_token': user.access_token,
+                'refresh_token': user.refresh_token
+            })
+            email_processor = EmailProcessor(db, self.vertex_service)
+
+            save_progress = lambda stats: queue.save_progress(job.id, self.worker_id, stats)
+
+            if job.kind == 'backfill':
+                result = await email_processor.backfill(
+                    user.id,
+                    gmail_service,
+                    on_progress=save_progress
+                )
+            elif job.kind == 'sync':
+                result = await email_processor.process_emails(
+                    user.id,
+                    gmail_service,
+                    (job.params or {}).get('max_emails', settings.MAX_EMAILS_PER_BATCH),
+                    on_progress=save_progress
+                )
+            else:
+                raise ValueError(f"Unknown job kind: {job.kind}")
+
+            self._queue_style_refresh(queue, StyleProfileService(db), user)
+            return result
+        finally:
+            db.close()
+
+    def _queue_style_refresh(self, queue: JobQueue, style_profiles: StyleProfileService, user: User) -> None:
+        """Queue a style profile refresh if the job brought in enough new email."""
+        try:
+            if style_profiles.needs_refresh(user):
+                queue.enqueue(user.id, 'style')
+        except Exception as e:
+            logger.error(f"Error queueing style refresh for user {user.id}: {str(e)}")
+
+    def _housekeeping(self, queue: JobQueue) -> None:
+        """Requeue jobs from dead workers and, on the first worker, purge or reconcile the caches."""
+        now = datetime.utcnow()
+        if now >= self.next_stale_check:
+            queue.requeue_stale()
+            self.next_stale_check = now + timedelta(seconds=settings.JOB_HEARTBEAT_SECONDS)
+
+        if self.index == 0 and now >= self.next_purge:
+            try:
+                EmbeddingCache(queue.db).purge_expired()
+                AnswerCache.purge_expired(queue.db)
+                if settings.VECTOR_CACHE_ENABLED:
+                    VectorCache().reconcile(queue.db)
+            except Exception as e:
+                queue.db.rollback()
+                logger.error(f"Error purging caches: {str(e)}")
+            self.next_purge = now + timedelta(hours=settings.EMBEDDING_CACHE_PURGE_INTERVAL_HOURS)
+
+def run_worker(index: int = 0) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(name)s: %(message)s")
+    asyncio.run(Worker(index).run())
+
+def main(processes: Optional[int] = None) -> None:
+    processes = processes or settings.INGEST_WORKER_PROCESSES
+    if processes <= 1:
+        run_worker()
+        return
+
+    # spawn so no child inherits the parent's database connections
+    context = multiprocessing.get_context('spawn')
+    children = [
+        context.Process(target=run_worker, args=(index,), name=f"worker-{index}")
+        for index in range(processes)
+    ]
+    for child in children:
+        child.start()
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for child in children:
+            if child.is_alive():
+                child.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # Replace children that exit unexpectedly until asked to stop
+    while not stopping:
+        for index, child in enumerate(children):
+            if not child.is_alive() and not stopping:
+                logger.warning(f"{child.name} exited with code {child.exitcode}, restarting")
+                children[index] = context.Process(target=run_worker, args=(index,), name=child.name)
+                children[index].start()
+        time.sleep(1)
+
+    for child in children:
+        child.join()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run ingestion job workers")
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+    main(args.processes)
@@ -1,3 +1,4 @@
+from pydantic import Field
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 import os
@@ -39,14 +40,62 @@ class Settings(BaseSettings):
     GOOGLE_CLOUD_LOCATION: str = os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1")
     GOOGLE_APPLICATION_CREDENTIALS: str = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
     
+    # Gmail
+    GMAIL_BATCH_SIZE: int = 50  # Sub-requests per batch HTTP call (Gmail allows up to 100)
+    GMAIL_FETCH_CONCURRENCY: int = 4  # Batch calls in flight per sync
+    GMAIL_MAX_BODY_BYTES: int = 1_000_000  # Decoded body bytes kept per message
+    
     # Email Processing
     MAX_EMAILS_PER_BATCH: int = 100
-    CHUNK_SIZE: int = 500
-    CHUNK_OVERLAP: int = 50
+    BACKFILL_PAGE_SIZE: int = 100  # Messages listed and fetched per backfill page
+    BACKFILL_QUEUE_SIZE: int = 2  # Pages buffered between backfill pipeline stages
+    NEAR_DUPLICATE_MAX_DISTANCE: int = Field(6, ge=0, le=7)  # SimHash bits that may differ; 8 bands find pairs up to 7
+    NEAR_DUPLICATE_MIN_WORDS: int = 30  # Shorter bodies are never treated as near-duplicates
+    INGEST_PROCESS_WORKERS: int = 0  # Processes for MIME decoding, cleaning and chunking; 0 runs them inline
+    INGEST_PROCESS_BATCH_SIZE: int = 25  # Emails sent to a worker process per task
+    CHUNK_SIZE_TOKENS: int = 128  # Estimated model tokens per chunk
+    CHUNK_OVERLAP_TOKENS: int = 16  # Tokens repeated from the end of the previous chunk
+    
+    # Ingestion Jobs
+    INGEST_WORKER_PROCESSES: int = 2  # Worker processes started by app.worker
+    JOB_POLL_INTERVAL_SECONDS: float = 5.0  # Idle wait between claim attempts
+    JOB_HEARTBEAT_SECONDS: int = 60  # How often a worker refreshes its lock
+    JOB_STALE_AFTER_SECONDS: int = 600  # Running jobs without a heartbeat this long are requeued
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_BASE_SECONDS: int = 30  # First retry delay, doubled on each attempt
+    JOB_RETRY_MAX_SECONDS: int = 3600
+    EMBEDDING_CACHE_PURGE_INTERVAL_HOURS: int = 24  # How often workers purge the embedding and answer caches and reconcile the vector cache
     
     # Vector Search
-    VECTOR_SIMILARITY_METRIC: str = "cosine"
+    VECTOR_SIMILARITY_METRIC: str = "cosine"  # 'cosine', 'l2' or 'inner_product'
+    VECTOR_INDEX_TYPE: str = "hnsw"  # Index built on each user's partition: 'hnsw' or 'ivfflat'
     DEFAULT_SEARCH_K: int = 5
+    HNSW_M: int = 16  # Graph links per node in each user's HNSW index
+    HNSW_EF_CONSTRUCTION: int = 64  # Candidate list size while building HNSW indexes
+    HNSW_EF_SEARCH: int = 40  # Candidate list size while searching; higher is slower with better recall
+    IVFFLAT_LISTS: int = 0  # Clusters per ivfflat index; 0 picks one per thousand rows
+    IVFFLAT_PROBES: int = 10  # Clusters searched per ivfflat query
+    VECTOR_PREFILTER_MAX_DAYS: int = 14  # Time windows up to this long are searched exactly through the timestamp index
+    RAG_CONTEXT_MAX_TOKENS: int = 2000  # Estimated tokens of retrieved context per prompt
+    
+    # Style Profile
+    STYLE_PROFILE_REFRESH_MIN_CHUNKS: int = 50  # New email chunks that trigger a background refresh
+    STYLE_PROFILE_ANALYSIS_CHUNKS: int = 50  # Most recent chunks sent to Gemini for the style analysis
+    STYLE_PROFILE_BATCH_SIZE: int = 1000  # Chunks read per batch when computing features
+    STYLE_PROFILE_MAX_NGRAMS: int = 200  # Phrase counts kept in the stored profile
+    
+    # Answer Cache
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_TTL_SECONDS: int = 900  # Cached answers older than this are not served
+    ANSWER_CACHE_MAX_DISTANCE: float = 0.05  # Cosine distance under which two queries count as the same
+    
+    # Vector Cache
+    VECTOR_CACHE_ENABLED: bool = False  # Search frequently querying users' embeddings in process
+    VECTOR_CACHE_DIR: str = "/tmp/adam-vector-cache"  # Local disk shared by the API and worker processes
+    VECTOR_CACHE_DTYPE: str = "float32"  # 'float16' halves memory and disk but scores several times slower
+    VECTOR_CACHE_MAX_MB: int = 512  # Embeddings mapped per process before least recently used users are unmapped
+    VECTOR_CACHE_HOT_QUERIES: int = 3  # Queries after which a user's embeddings are cached
+    VECTOR_CACHE_BATCH_SIZE: int = 2000  # Rows read from Postgres per batch when filling a cache
     
     # CORS
     BACKEND_CORS_ORIGINS: List[str] = [
@@ -57,6 +106,25 @@ class Settings(BaseSettings):
     # Vertex AI Models
     VERTEX_EMBEDDING_MODEL: str = "textembedding-gecko@latest"
     VERTEX_LLM_MODEL: str = "gemini-pro"
+    VERTEX_MAX_CONCURRENT_REQUESTS: int = 32  # In-flight Vertex calls per process
+    VERTEX_EMBEDDING_TIMEOUT_SECONDS: float = 30.0
+    VERTEX_GENERATION_TIMEOUT_SECONDS: float = 60.0
+    EMBEDDING_MAX_INSTANCES_PER_REQUEST: int = 250  # Texts per embedding request
+    EMBEDDING_MAX_TOKENS_PER_REQUEST: int = 20000  # Estimated input tokens per embedding request
+    EMBEDDING_REQUEST_CONCURRENCY: int = 4  # Embedding requests in flight per batch
+    EMBEDDING_CACHE_MEMORY_ENTRIES: int = 5000  # Vectors kept in each process's LRU
+    EMBEDDING_CACHE_RETENTION_DAYS: int = 90  # Cached vectors unused this long are purged
+    
+    # Upstream Rate Limits (shared across processes through Postgres)
+    GMAIL_QUOTA_UNITS_PER_SECOND: float = 15000.0  # Project-wide Gmail quota units
+    GMAIL_USER_QUOTA_UNITS_PER_SECOND: float = 200.0  # Per mailbox; Gmail allows 250
+    VERTEX_REQUESTS_PER_SECOND: float = 10.0  # Project-wide Vertex AI requests
+    VERTEX_USER_REQUESTS_PER_SECOND: float = 3.0
+    RATE_LIMIT_BURST_SECONDS: float = 1.0  # Bucket capacity, in seconds of budget
+    RATE_LIMIT_LEASE_SECONDS: float = 0.25  # Budget a process takes from a bucket at once; unused tokens lapse after this long
+    RATE_LIMIT_MAX_RETRIES: int = 5  # Retries of a call after 429 responses
+    RATE_LIMIT_BACKOFF_BASE_SECONDS: float = 1.0  # Backoff after a 429 without Retry-After, doubled per strike
+    RATE_LIMIT_BACKOFF_MAX_SECONDS: float = 60.0
     
     class Config:
         case_sensitive = True
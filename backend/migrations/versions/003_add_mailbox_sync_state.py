@@ -0,0 +1,31 @@
+"""add mailbox sync state
+
+Revision ID: 003_add_mailbox_sync_state
+Revises: 002_add_vector_support
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003_add_mailbox_sync_state'
+down_revision = '002_add_vector_support'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Per-user Gmail history cursor for incremental syncs
+    op.create_table(
+        'mailbox_sync_state',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('history_id', sa.String(), nullable=True),
+        sa.Column('last_synced_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+def downgrade() -> None:
+    op.drop_table('mailbox_sync_state')
@@ -0,0 +1,25 @@
+"""add backfill checkpoint to mailbox sync state
+
+Revision ID: 004_add_backfill_checkpoint
+Revises: 003_add_mailbox_sync_state
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004_add_backfill_checkpoint'
+down_revision = '003_add_mailbox_sync_state'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('mailbox_sync_state', sa.Column('backfill_page_token', sa.String(), nullable=True))
+    op.add_column('mailbox_sync_state', sa.Column('backfill_started_at', sa.DateTime(), nullable=True))
+    op.add_column('mailbox_sync_state', sa.Column('backfill_completed_at', sa.DateTime(), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('mailbox_sync_state', 'backfill_completed_at')
+    op.drop_column('mailbox_sync_state', 'backfill_started_at')
+    op.drop_column('mailbox_sync_state', 'backfill_page_token')
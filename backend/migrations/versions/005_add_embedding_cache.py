@@ -0,0 +1,35 @@
+"""add content-addressed embedding cache
+
+Revision ID: 005_add_embedding_cache
+Revises: 004_add_backfill_checkpoint
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005_add_embedding_cache'
+down_revision = '004_add_backfill_checkpoint'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        'embedding_cache',
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('model', sa.String(), nullable=False),
+        # Use raw SQL for vector column
+        sa.Column('embedding', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('last_used_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('content_hash', 'model')
+    )
+    op.execute('ALTER TABLE embedding_cache ALTER COLUMN embedding TYPE vector(1536) USING embedding::vector(1536)')
+    
+    # Retention sweeps delete by last use
+    op.create_index(op.f('ix_embedding_cache_last_used_at'), 'embedding_cache', ['last_used_at'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_embedding_cache_last_used_at'), table_name='embedding_cache')
+    op.drop_table('embedding_cache')
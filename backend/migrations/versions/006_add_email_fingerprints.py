@@ -0,0 +1,41 @@
+"""add email fingerprints for near-duplicate detection
+
+Revision ID: 006_add_email_fingerprints
+Revises: 005_add_embedding_cache
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006_add_email_fingerprints'
+down_revision = '005_add_embedding_cache'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('email_metadata', sa.Column('canonical_email_id', sa.String(), nullable=True))
+    
+    op.create_table(
+        'email_fingerprints',
+        sa.Column('email_id', sa.String(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('simhash', sa.BigInteger(), nullable=False),
+        *[sa.Column(f'band_{band}', sa.SmallInteger(), nullable=False) for band in range(8)],
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('email_id')
+    )
+    for band in range(8):
+        op.create_index(
+            f'ix_email_fingerprints_user_band_{band}',
+            'email_fingerprints',
+            ['user_id', f'band_{band}'],
+            unique=False
+        )
+
+def downgrade() -> None:
+    for band in range(8):
+        op.drop_index(f'ix_email_fingerprints_user_band_{band}', table_name='email_fingerprints')
+    op.drop_table('email_fingerprints')
+    op.drop_column('email_metadata', 'canonical_email_id')
@@ -0,0 +1,55 @@
+"""add ingestion jobs
+
+Revision ID: 007_add_ingestion_jobs
+Revises: 006_add_email_fingerprints
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '007_add_ingestion_jobs'
+down_revision = '006_add_email_fingerprints'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Durable queue of email ingestion work, claimed by worker processes
+    op.create_table(
+        'ingestion_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=32), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('params', postgresql.JSON(astext_type=sa.Text()), nullable=True),
+        sa.Column('progress', postgresql.JSON(astext_type=sa.Text()), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('run_after', sa.DateTime(), nullable=False),
+        sa.Column('locked_by', sa.String(), nullable=True),
+        sa.Column('locked_at', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_ingestion_jobs_user_id', 'ingestion_jobs', ['user_id'])
+    op.create_index('ix_ingestion_jobs_claim', 'ingestion_jobs', ['status', 'run_after'])
+    op.create_index(
+        'uq_ingestion_jobs_active',
+        'ingestion_jobs',
+        ['user_id', 'kind'],
+        unique=True,
+        postgresql_where=sa.text("status IN ('queued', 'running')")
+    )
+
+def downgrade() -> None:
+    op.drop_index('uq_ingestion_jobs_active', table_name='ingestion_jobs')
+    op.drop_index('ix_ingestion_jobs_claim', table_name='ingestion_jobs')
+    op.drop_index('ix_ingestion_jobs_user_id', table_name='ingestion_jobs')
+    op.drop_table('ingestion_jobs')
@@ -0,0 +1,30 @@
+"""add rate limit buckets
+
+Revision ID: 008_add_rate_limit_buckets
+Revises: 007_add_ingestion_jobs
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '008_add_rate_limit_buckets'
+down_revision = '007_add_ingestion_jobs'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Token buckets for upstream API quotas, shared by all processes
+    op.create_table(
+        'rate_limit_buckets',
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('tokens', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('blocked_until', sa.DateTime(), nullable=True),
+        sa.Column('strikes', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('key')
+    )
+
+def downgrade() -> None:
+    op.drop_table('rate_limit_buckets')
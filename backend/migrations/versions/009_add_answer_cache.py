@@ -0,0 +1,44 @@
+"""add answer cache
+
+Revision ID: 009_add_answer_cache
+Revises: 008_add_rate_limit_buckets
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '009_add_answer_cache'
+down_revision = '008_add_rate_limit_buckets'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        'answer_cache',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('scope_hash', sa.String(length=64), nullable=False),
+        sa.Column('query_hash', sa.String(length=64), nullable=False),
+        sa.Column('chunk_ids_hash', sa.String(length=64), nullable=False),
+        # Use raw SQL for vector column
+        sa.Column('query_embedding', sa.String(), nullable=False),
+        sa.Column('response', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.execute('ALTER TABLE answer_cache ALTER COLUMN query_embedding TYPE vector(1536) USING query_embedding::vector(1536)')
+    
+    # Exact lookups by normalized query, near-duplicate lookups by retrieved chunk set
+    op.create_index('ix_answer_cache_query', 'answer_cache', ['user_id', 'scope_hash', 'query_hash'], unique=False)
+    op.create_index('ix_answer_cache_chunks', 'answer_cache', ['user_id', 'scope_hash', 'chunk_ids_hash'], unique=False)
+    op.create_index(op.f('ix_answer_cache_expires_at'), 'answer_cache', ['expires_at'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_answer_cache_expires_at'), table_name='answer_cache')
+    op.drop_index('ix_answer_cache_chunks', table_name='answer_cache')
+    op.drop_index('ix_answer_cache_query', table_name='answer_cache')
+    op.drop_table('answer_cache')
@@ -0,0 +1,58 @@
+"""partition document chunks by user
+
+Revision ID: 010_partition_document_chunks
+Revises: 009_add_answer_cache
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '010_partition_document_chunks'
+down_revision = '009_add_answer_cache'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Partitioned tables need the partition key in the primary key. Build the
+    # new key's index without blocking writes, then swap it in.
+    with op.get_context().autocommit_block():
+        op.execute('CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS document_chunks_user_id_id_key ON document_chunks (user_id, id)')
+    op.execute('ALTER TABLE document_chunks DROP CONSTRAINT document_chunks_pkey')
+    op.execute('ALTER TABLE document_chunks ADD CONSTRAINT document_chunks_default_pkey PRIMARY KEY USING INDEX document_chunks_user_id_id_key')
+    op.execute('ALTER TABLE document_chunks RENAME CONSTRAINT document_chunks_user_id_fkey TO document_chunks_default_user_id_fkey')
+    
+    # The existing table becomes the default partition, keeping its rows and
+    # its ivfflat index until scripts/partition_document_chunks.py moves each
+    # user into their own partition
+    op.execute('ALTER TABLE document_chunks RENAME TO document_chunks_default')
+    op.execute('''
+        CREATE TABLE document_chunks (
+            id integer NOT NULL DEFAULT nextval('document_chunks_id_seq'),
+            user_id integer NOT NULL,
+            source_type varchar NOT NULL,
+            source_id varchar NOT NULL,
+            chunk_index integer NOT NULL,
+            content text NOT NULL,
+            chunk_metadata json,
+            embedding vector(1536),
+            created_at timestamp,
+            CONSTRAINT document_chunks_pkey PRIMARY KEY (user_id, id),
+            CONSTRAINT document_chunks_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        ) PARTITION BY LIST (user_id)
+    ''')
+    op.execute('ALTER SEQUENCE document_chunks_id_seq OWNED BY document_chunks.id')
+    op.execute('ALTER TABLE document_chunks ATTACH PARTITION document_chunks_default DEFAULT')
+
+def downgrade() -> None:
+    op.execute('CREATE TABLE document_chunks_unpartitioned (LIKE document_chunks INCLUDING DEFAULTS)')
+    op.execute('INSERT INTO document_chunks_unpartitioned SELECT * FROM document_chunks')
+    op.execute('ALTER SEQUENCE document_chunks_id_seq OWNED BY document_chunks_unpartitioned.id')
+    op.execute('DROP TABLE document_chunks')
+    op.execute('ALTER TABLE document_chunks_unpartitioned RENAME TO document_chunks')
+    op.execute('ALTER TABLE document_chunks ADD PRIMARY KEY (id)')
+    op.execute('ALTER TABLE document_chunks ADD CONSTRAINT document_chunks_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE')
+    op.create_index(op.f('ix_document_chunks_id'), 'document_chunks', ['id'], unique=False)
+    op.execute(
+        'CREATE INDEX document_chunks_embedding_idx ON document_chunks USING ivfflat (embedding vector_l2_ops) WITH (lists = 100)'
+    )
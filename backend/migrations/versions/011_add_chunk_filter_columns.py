@@ -0,0 +1,93 @@
+"""add typed filter columns to document chunks
+
+Revision ID: 011_add_chunk_filter_columns
+Revises: 010_partition_document_chunks
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '011_add_chunk_filter_columns'
+down_revision = '010_partition_document_chunks'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 10000
+
+INDEXES = {
+    'ix_document_chunks_user_timestamp': 'USING btree (user_id, email_timestamp)',
+    'ix_document_chunks_user_sender': 'USING btree (user_id, sender_address, email_timestamp)',
+    'ix_document_chunks_user_thread': 'USING btree (user_id, thread_id)',
+    'ix_document_chunks_labels': 'USING gin (labels)',
+}
+
+def upgrade() -> None:
+    op.add_column('document_chunks', sa.Column('email_timestamp', sa.DateTime(), nullable=True))
+    op.add_column('document_chunks', sa.Column('sender', sa.String(), nullable=True))
+    op.add_column('document_chunks', sa.Column('sender_address', sa.String(), nullable=True))
+    op.add_column('document_chunks', sa.Column('thread_id', sa.String(), nullable=True))
+    op.add_column('document_chunks', sa.Column('labels', sa.ARRAY(sa.String()), nullable=True))
+    
+    conn = op.get_bind()
+    with op.get_context().autocommit_block():
+        partitions = conn.scalars(sa.text('''
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'document_chunks'::regclass
+        ''')).all()
+        
+        # Copy the email's metadata onto its chunks in short transactions,
+        # walking each partition's primary key so a batch reads one partition
+        for partition in partitions:
+            last_id = 0
+            while True:
+                end_id = conn.scalar(
+                    sa.text(f'''
+                    SELECT max(id) FROM (
+                        SELECT id FROM {partition} WHERE id > :after_id ORDER BY id LIMIT :batch_size
+                    ) batch
+                    '''),
+                    {"after_id": last_id, "batch_size": BACKFILL_BATCH_SIZE}
+                )
+                if end_id is None:
+                    break
+                conn.execute(
+                    sa.text(f'''
+                    UPDATE {partition} c
+                    SET email_timestamp = m.timestamp,
+                        sender = m.sender,
+                        sender_address = lower(coalesce(
+                            substring(m.sender from '<([^<>@[:space:]]+@[^<>[:space:]]+)>'),
+                            substring(m.sender from '^[[:space:]]*([^<>@[:space:]]+@[^<>[:space:]]+)[[:space:]]*$')
+                        )),
+                        thread_id = m.thread_id,
+                        labels = ARRAY(SELECT json_array_elements_text(coalesce(m.labels, '[]'::json)))
+                    FROM email_metadata m
+                    WHERE c.id > :after_id AND c.id <= :end_id
+                      AND c.source_type = 'email'
+                      AND m.user_id = c.user_id
+                      AND m.email_id = c.source_id
+                    '''),
+                    {"after_id": last_id, "end_id": end_id}
+                )
+                last_id = end_id
+        
+        # Index each partition without blocking writes, then attach the
+        # indexes to parent indexes created on the partitioned table only
+        for index, definition in INDEXES.items():
+            conn.execute(sa.text(f'CREATE INDEX IF NOT EXISTS {index} ON ONLY document_chunks {definition}'))
+            for partition in partitions:
+                partition_index = f'{partition}_{index[len("ix_document_chunks_"):]}_idx'
+                conn.execute(sa.text(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition_index} ON {partition} {definition}'))
+                conn.execute(sa.text(f'ALTER INDEX {index} ATTACH PARTITION {partition_index}'))
+
+def downgrade() -> None:
+    for index in INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {index}')
+    op.drop_column('document_chunks', 'labels')
+    op.drop_column('document_chunks', 'thread_id')
+    op.drop_column('document_chunks', 'sender_address')
+    op.drop_column('document_chunks', 'sender')
+    op.drop_column('document_chunks', 'email_timestamp')
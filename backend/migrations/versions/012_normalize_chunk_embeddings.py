@@ -0,0 +1,78 @@
+"""normalize chunk embeddings and reindex the default partition
+
+Revision ID: 012_normalize_chunk_embeddings
+Revises: 011_add_chunk_filter_columns
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from app.services.chunk_partitions import DEFAULT_PARTITION
+from app.services.vector_search import index_definition, index_name
+
+# revision identifiers, used by Alembic.
+revision = '012_normalize_chunk_embeddings'
+down_revision = '011_add_chunk_filter_columns'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 10000
+
+LEGACY_INDEX = 'document_chunks_embedding_idx'
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    with op.get_context().autocommit_block():
+        # Chunks written before embeddings were normalized on ingest, so the
+        # metrics rank them the same way as newer ones. Batches walk each
+        # partition's primary key so each one reads a single partition.
+        partitions = conn.scalars(sa.text('''
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'document_chunks'::regclass
+        ''')).all()
+        for partition in partitions:
+            last_id = 0
+            while True:
+                end_id = conn.scalar(
+                    sa.text(f'''
+                    SELECT max(id) FROM (
+                        SELECT id FROM {partition} WHERE id > :after_id ORDER BY id LIMIT :batch_size
+                    ) batch
+                    '''),
+                    {"after_id": last_id, "batch_size": BATCH_SIZE}
+                )
+                if end_id is None:
+                    break
+                conn.execute(
+                    sa.text(f'''
+                    UPDATE {partition}
+                    SET embedding = (
+                        SELECT array_agg(x / vector_norm(embedding) ORDER BY i)
+                        FROM unnest(embedding::real[]) WITH ORDINALITY AS e(x, i)
+                    )::vector
+                    WHERE id > :after_id AND id <= :end_id
+                      AND embedding IS NOT NULL
+                      AND vector_norm(embedding) > 0
+                      AND abs(vector_norm(embedding) - 1) > 1e-4
+                    '''),
+                    {"after_id": last_id, "end_id": end_id}
+                )
+                last_id = end_id
+        
+        # The default partition still has the original l2 ivfflat index, which
+        # cannot serve other metrics; give it the configured one
+        rows = conn.scalar(sa.text(f'SELECT count(*) FROM {DEFAULT_PARTITION}'))
+        wanted = index_name(DEFAULT_PARTITION)
+        conn.execute(sa.text(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {wanted} ON {DEFAULT_PARTITION} '
+            f'{index_definition(DEFAULT_PARTITION, rows=rows)}'
+        ))
+        conn.execute(sa.text(f'DROP INDEX CONCURRENTLY IF EXISTS {LEGACY_INDEX}'))
+
+def downgrade() -> None:
+    # Normalized embeddings are left as they are
+    op.execute(
+        f'CREATE INDEX IF NOT EXISTS {LEGACY_INDEX} ON {DEFAULT_PARTITION} USING ivfflat (embedding vector_l2_ops) WITH (lists = 100)'
+    )
+    op.execute(f'DROP INDEX IF EXISTS {index_name(DEFAULT_PARTITION)}')
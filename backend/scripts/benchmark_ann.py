@@ -0,0 +1,185 @@
+"""Benchmark vector index recall and latency against exact search.
+
+Loads a set of normalized embeddings into a temporary table, builds each
+requested index type for the configured metric, and sweeps hnsw.ef_search
+(HNSW) or ivfflat.probes (ivfflat). For every setting it reports recall@k
+against exact nearest neighbours computed with numpy, and p50/p99 query
+latency next to an exact (sequential scan) baseline, which is what
+VECTOR_INDEX_TYPE, HNSW_EF_SEARCH and IVFFLAT_PROBES should be tuned on.
+
+Embeddings are synthetic clusters by default, or a copy of one user's
+chunk embeddings with --from-user. Nothing is written outside the
+temporary table.
+
+Usage:
+    python scripts/benchmark_ann.py [--rows 20000] [--queries 100] [--k 10] [--output results.json]
+    python scripts/benchmark_ann.py --from-user 42 --index-type hnsw --ef-search 20 40 80 160
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import bindparam, text
+
+from app.db.database import SessionLocal, Vector
+from app.services.vector_search import INDEX_TYPES, METRICS, SearchOptions, index_definition
+from config.config import get_settings
+
+settings = get_settings()
+
+TABLE = 'ann_benchmark'
+
+
+def normalize_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.where(norms == 0, 1, norms)).astype(np.float32)
+
+
+def synthetic_corpus(rows, dim, clusters, rng):
+    """Gaussian clusters on the unit sphere, roughly like topic-clustered mail."""
+    centers = normalize_rows(rng.standard_normal((clusters, dim)))
+    labels = rng.integers(0, clusters, rows)
+    noise = rng.standard_normal((rows, dim)) * 0.8 / np.sqrt(dim)  # About 0.8 of a center's length
+    return normalize_rows(centers[labels] + noise)
+
+
+def user_corpus(db, user_id):
+    rows = db.scalars(
+        text("SELECT embedding FROM document_chunks WHERE user_id = :user_id AND embedding IS NOT NULL")
+        .columns(embedding=Vector(1536)),
+        {"user_id": user_id}
+    ).all()
+    if not rows:
+        sys.exit(f"user {user_id} has no chunk embeddings")
+    return normalize_rows(np.stack(rows))
+
+
+def load(db, corpus):
+    db.execute(text(f"CREATE TEMP TABLE {TABLE} (id integer PRIMARY KEY, embedding vector({corpus.shape[1]}))"))
+    buffer = io.StringIO()
+    for i, vector in enumerate(corpus):
+        buffer.write(f"{i}\t[{','.join(map(repr, vector.tolist()))}]\n")
+    buffer.seek(0)
+    cursor = db.connection().connection.cursor()
+    cursor.copy_expert(f"COPY {TABLE} (id, embedding) FROM STDIN", buffer)
+    db.execute(text(f"ANALYZE {TABLE}"))
+
+
+def run_queries(db, queries, k, operator, options):
+    """Top-k ids and latency in ms for each query."""
+    statement = text(
+        f"SELECT id FROM {TABLE} ORDER BY embedding {operator} :query LIMIT :k"
+    ).bindparams(bindparam('query', type_=Vector(queries.shape[1])))
+    options.apply(db)
+    for query in queries[:5]:  # Warm up caches
+        db.execute(statement, {"query": query, "k": k}).all()
+
+    ids, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        rows = db.execute(statement, {"query": query, "k": k}).scalars().all()
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids.append(rows)
+    return ids, np.array(latencies)
+
+
+def summarize(label, ids, latencies, truth, k):
+    recall = np.mean([len(set(found) & set(expected)) / k for found, expected in zip(ids, truth)])
+    result = {
+        'setting': label,
+        'recall': round(float(recall), 4),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 2),
+    }
+    print(f"  {label:20s} recall@{k} {result['recall']:.4f}   p50 {result['p50_ms']:8.2f} ms   p99 {result['p99_ms']:8.2f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000, help="Synthetic corpus size")
+    parser.add_argument('--dim', type=int, default=1536)
+    parser.add_argument('--clusters', type=int, default=50)
+    parser.add_argument('--from-user', type=int, help="Use this user's chunk embeddings instead")
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--k', type=int, default=settings.DEFAULT_SEARCH_K)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--metric', choices=list(METRICS), default=settings.VECTOR_SIMILARITY_METRIC)
+    parser.add_argument('--index-type', choices=INDEX_TYPES, nargs='+', default=list(INDEX_TYPES))
+    parser.add_argument('--ef-search', type=int, nargs='+', default=[10, 20, 40, 80, 160])
+    parser.add_argument('--probes', type=int, nargs='+', default=[1, 5, 10, 20, 40])
+    parser.add_argument('--output', help='Write results as JSON')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    operator = METRICS[args.metric][0]
+    db = SessionLocal()
+    try:
+        if args.from_user:
+            corpus = user_corpus(db, args.from_user)
+        else:
+            corpus = synthetic_corpus(args.rows, args.dim, args.clusters, rng)
+        # Queries near stored vectors, as real questions land near the mail they are about
+        picks = corpus[rng.integers(0, len(corpus), args.queries)]
+        queries = normalize_rows(picks + 0.5 * rng.standard_normal(picks.shape).astype(np.float32) / np.sqrt(corpus.shape[1]))
+        # Vectors are unit length, so every metric ranks by inner product
+        truth = np.argsort(-(queries @ corpus.T), axis=1)[:, :args.k].tolist()
+
+        start = time.perf_counter()
+        load(db, corpus)
+        print(f"loaded {len(corpus)} x {corpus.shape[1]} vectors in {time.perf_counter() - start:.1f}s, "
+              f"{len(queries)} queries, k={args.k}, metric={args.metric}")
+
+        results = {
+            'rows': len(corpus),
+            'dim': corpus.shape[1],
+            'queries': len(queries),
+            'k': args.k,
+            'metric': args.metric,
+            'exact': None,
+            'indexes': {},
+        }
+
+        print("exact")
+        ids, latencies = run_queries(db, queries, args.k, operator, SearchOptions(metric=args.metric, exact=True))
+        results['exact'] = summarize('seq scan', ids, latencies, truth, args.k)
+
+        for index_type in args.index_type:
+            start = time.perf_counter()
+            db.execute(text(
+                f"CREATE INDEX {TABLE}_idx ON {TABLE} "
+                f"{index_definition(TABLE, index_type, args.metric, rows=len(corpus))}"
+            ))
+            build_seconds = time.perf_counter() - start
+            print(f"{index_type} (built in {build_seconds:.1f}s)")
+
+            sweep = []
+            if index_type == 'hnsw':
+                settings_to_try = [('ef_search', value) for value in args.ef_search]
+            else:
+                settings_to_try = [('probes', value) for value in args.probes]
+            for name, value in settings_to_try:
+                options = SearchOptions(metric=args.metric, **{name: value})
+                ids, latencies = run_queries(db, queries, args.k, operator, options)
+                sweep.append(summarize(f"{name}={value}", ids, latencies, truth, args.k))
+
+            results['indexes'][index_type] = {'build_seconds': round(build_seconds, 2), 'sweep': sweep}
+            db.execute(text(f"DROP INDEX {TABLE}_idx"))
+    finally:
+        db.rollback()  # Drops the temporary table
+        db.close()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Benchmark email cleaning and chunking on a synthetic corpus.
+
+Generates a deterministic corpus of email bodies (short notes, threads with
+quoted replies and signatures, and a few multi-megabyte bodies), runs
+clean_text and TextChunker over it, and reports throughput and chunk
+statistics. The chunk-count digest changes whenever chunk boundaries
+change, so it can be compared between runs to catch drift.
+
+Usage:
+    python scripts/benchmark_chunking.py [--emails 2000] [--seed 7] [--output results.json]
+    python scripts/benchmark_chunking.py --baseline results.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.chunking import TextChunker, clean_text, estimate_tokens
+
+WORDS = (
+    "meeting budget review quarter launch customer contract proposal deadline "
+    "team update schedule invoice travel agenda forecast hiring roadmap board "
+    "please thanks regarding attached follow call tomorrow friday next week"
+).split()
+
+
+def sentence(rng):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(4, 24))]
+    return ' '.join(words).capitalize() + rng.choice('...!?')
+
+
+def body(rng, sentences):
+    paragraphs = []
+    while sentences > 0:
+        count = min(sentences, rng.randint(1, 6))
+        paragraphs.append(' '.join(sentence(rng) for _ in range(count)))
+        sentences -= count
+    return '\n\n'.join(paragraphs)
+
+
+def make_corpus(emails, seed):
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(emails):
+        kind = rng.random()
+        if kind < 0.5:
+            text = body(rng, rng.randint(1, 8))
+        elif kind < 0.95:
+            text = (
+                body(rng, rng.randint(5, 40))
+                + "\n\n--\nJane Doe\nChief of Staff\n"
+                + "\nOn Mon, Jan 1, 2024 at 9:00 AM Bob <bob@example.com> wrote:\n> "
+                + body(rng, 20).replace('\n', '\n> ')
+            )
+        else:
+            text = body(rng, rng.randint(200, 2000))
+        corpus.append(text)
+
+    # A few very large bodies, one without any sentence punctuation
+    corpus.append(body(rng, 40000))
+    corpus.append(' '.join(rng.choice(WORDS) for _ in range(300000)))
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--emails', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--chunk-tokens', type=int, default=128)
+    parser.add_argument('--overlap-tokens', type=int, default=16)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='Write results as JSON')
+    parser.add_argument('--baseline', help='Compare against a previous --output file')
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.emails, args.seed)
+    total_bytes = sum(len(text.encode('utf-8')) for text in corpus)
+    chunker = TextChunker(args.chunk_tokens, args.overlap_tokens)
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        chunked = [chunker.chunk(clean_text(text)) for text in corpus]
+        timings.append(time.perf_counter() - start)
+
+    counts = [len(chunks) for chunks in chunked]
+    sizes = [estimate_tokens(chunk) for chunks in chunked for chunk in chunks]
+    best = min(timings)
+    results = {
+        'emails': len(corpus),
+        'megabytes': round(total_bytes / 1e6, 2),
+        'seconds': round(best, 4),
+        'mb_per_second': round(total_bytes / 1e6 / best, 2),
+        'chunks': sum(counts),
+        'mean_chunk_tokens': round(statistics.mean(sizes), 1),
+        'max_chunk_tokens': max(sizes),
+        'chunk_count_digest': hashlib.sha256(json.dumps(counts).encode()).hexdigest()[:16],
+    }
+
+    for key, value in results.items():
+        print(f"{key + ':':22s}{value}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print()
+        print(f"throughput vs baseline: {results['mb_per_second'] / baseline['mb_per_second']:.2f}x")
+        if results['chunk_count_digest'] != baseline['chunk_count_digest']:
+            print(f"chunk counts changed: {baseline['chunks']} -> {results['chunks']}")
+            sys.exit(1)
+        print("chunk counts unchanged")
+
+
+if __name__ == '__main__':
+    main()
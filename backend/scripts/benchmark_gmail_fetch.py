@@ -0,0 +1,185 @@
+"""Benchmark Gmail message fetching against a stubbed transport.
+
+Compares the old one-request-per-message loop with the batched, concurrent
+fetch in GmailService. Every HTTP round trip sleeps for a fixed latency so
+the numbers reflect network-bound behaviour without touching Gmail.
+
+Usage:
+    python scripts/benchmark_gmail_fetch.py --messages 100 --latency-ms 80
+"""
+import argparse
+import asyncio
+import base64
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.gmail import GmailService
+from app.services.mime import parse_message
+
+
+def make_message(message_id):
+    body = base64.urlsafe_b64encode(f"Body of message {message_id}.".encode()).decode()
+    return {
+        'id': message_id,
+        'threadId': f"thread-{message_id}",
+        'internalDate': '1700000000000',
+        'labelIds': ['INBOX'],
+        'payload': {
+            'mimeType': 'text/plain',
+            'headers': [
+                {'name': 'Subject', 'value': f"Subject {message_id}"},
+                {'name': 'From', 'value': 'alice@example.com'},
+                {'name': 'To', 'value': 'bob@example.com'},
+            ],
+            'body': {'data': body},
+        },
+    }
+
+
+class StubTransport:
+    """Counts round trips and simulates network latency."""
+
+    def __init__(self, latency, per_item_latency):
+        self.latency = latency
+        self.per_item_latency = per_item_latency
+        self.round_trips = 0
+
+    def round_trip(self, items=1):
+        self.round_trips += 1
+        time.sleep(self.latency + self.per_item_latency * items)
+
+
+class StubRequest:
+    def __init__(self, transport, response):
+        self.transport = transport
+        self.response = response
+
+    def execute(self, http=None):
+        self.transport.round_trip()
+        return self.response
+
+
+class StubBatch:
+    def __init__(self, transport, callback):
+        self.transport = transport
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id=None):
+        self.requests.append((request_id, request))
+
+    def execute(self, http=None):
+        self.transport.round_trip(len(self.requests))
+        for request_id, request in self.requests:
+            self.callback(request_id, request.response, None)
+
+
+class StubMessages:
+    def __init__(self, transport, message_ids):
+        self.transport = transport
+        self.message_ids = message_ids
+
+    def list(self, userId, maxResults, labelIds, pageToken=None):
+        start = int(pageToken or 0)
+        ids = self.message_ids[start:start + maxResults]
+        response = {'messages': [{'id': i} for i in ids]}
+        if start + maxResults < len(self.message_ids):
+            response['nextPageToken'] = str(start + maxResults)
+        return StubRequest(self.transport, response)
+
+    def get(self, userId, id, format, fields=None):
+        return StubRequest(self.transport, make_message(id))
+
+
+class StubService:
+    def __init__(self, transport, message_ids):
+        self.transport = transport
+        self._messages = StubMessages(transport, message_ids)
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self._messages
+
+    def new_batch_http_request(self, callback):
+        return StubBatch(self.transport, callback)
+
+
+class NoRateLimit:
+    """Skips the shared quota buckets so only Gmail round trips are measured."""
+
+    async def acquire(self, cost=1):
+        pass
+
+    async def call(self, fn, cost=1):
+        return await fn()
+
+    def penalize(self, retry_after=None):
+        return 0.0
+
+
+def make_gmail_service(transport, message_ids, batch_size, concurrency):
+    gmail = GmailService.__new__(GmailService)
+    gmail.creds = None
+    gmail.service = StubService(transport, message_ids)
+    gmail.batch_size = batch_size
+    gmail.fetch_concurrency = concurrency
+    gmail.max_body_bytes = 1_000_000
+    gmail.rate_limiter = NoRateLimit()
+    gmail._new_http = lambda: None
+    return gmail
+
+
+def fetch_serial(gmail, max_results):
+    """The pre-batching behaviour: one blocking get() per listed message."""
+    results = gmail.service.users().messages().list(
+        userId='me', maxResults=max_results, labelIds=['INBOX']
+    ).execute()
+    return [
+        parse_message(
+            gmail.service.users().messages().get(userId='me', id=m['id'], format='full').execute(),
+            gmail.max_body_bytes
+        )
+        for m in results.get('messages', [])
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=100)
+    parser.add_argument('--latency-ms', type=float, default=80.0)
+    parser.add_argument('--per-item-ms', type=float, default=1.0)
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    message_ids = [f"msg-{i:06d}" for i in range(args.messages)]
+    latency = args.latency_ms / 1000
+    per_item = args.per_item_ms / 1000
+
+    serial_transport = StubTransport(latency, per_item)
+    gmail = make_gmail_service(serial_transport, message_ids, args.batch_size, args.concurrency)
+    start = time.perf_counter()
+    serial = fetch_serial(gmail, args.messages)
+    serial_time = time.perf_counter() - start
+
+    batched_transport = StubTransport(latency, per_item)
+    gmail = make_gmail_service(batched_transport, message_ids, args.batch_size, args.concurrency)
+    start = time.perf_counter()
+    batched = asyncio.run(gmail.fetch_recent_emails(max_results=args.messages))
+    batched_time = time.perf_counter() - start
+
+    assert serial == batched, "batched fetch changed the output"
+
+    print(f"messages:          {args.messages}")
+    print(f"serial:            {serial_transport.round_trips:5d} round trips  {serial_time * 1000:9.1f} ms")
+    print(f"batched:           {batched_transport.round_trips:5d} round trips  {batched_time * 1000:9.1f} ms")
+    print(f"speedup:           {serial_time / batched_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
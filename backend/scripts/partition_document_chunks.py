@@ -0,0 +1,59 @@
+"""Move users' chunks out of the default partition into per-user partitions.
+
+Run after migration 010. Searches keep working while users are moved;
+each user is copied and indexed first, then swapped in with one short
+transaction. Safe to interrupt and rerun.
+
+With --reindex, rebuilds the vector index of every user partition and of
+the default partition instead, e.g. after changing VECTOR_SIMILARITY_METRIC
+or VECTOR_INDEX_TYPE.
+
+Usage:
+    python scripts/partition_document_chunks.py [--user-id 42] [--batch-size 5000]
+    python scripts/partition_document_chunks.py --reindex [--user-id 42]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.database import SessionLocal
+from app.services.chunk_partitions import ChunkPartitions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--user-id', type=int, action='append', help="Only move these users")
+    parser.add_argument('--batch-size', type=int, default=5000, help="Rows copied per transaction")
+    parser.add_argument('--reindex', action='store_true', help="Rebuild vector indexes instead of moving users")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        partitions = ChunkPartitions(db)
+        if args.reindex:
+            user_ids = args.user_id or partitions.partitioned_users()
+            for user_id in user_ids:
+                start = time.perf_counter()
+                built = partitions.rebuild_indexes(user_id)
+                print(f"user {user_id}: {'rebuilt' if built else 'up to date'} in {time.perf_counter() - start:.1f}s")
+            if not args.user_id:
+                start = time.perf_counter()
+                built = partitions.rebuild_default_indexes()
+                print(f"default partition: {'rebuilt' if built else 'up to date'} in {time.perf_counter() - start:.1f}s")
+            return
+
+        user_ids = args.user_id or partitions.users_in_default()
+        print(f"moving {len(user_ids)} users")
+        for user_id in user_ids:
+            start = time.perf_counter()
+            moved = partitions.move_user(user_id, args.batch_size)
+            print(f"user {user_id}: moved {moved} chunks in {time.perf_counter() - start:.1f}s")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
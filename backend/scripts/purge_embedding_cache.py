@@ -0,0 +1,30 @@
+"""Delete embedding cache entries unused for longer than the retention window.
+
+Usage:
+    python scripts/purge_embedding_cache.py [--retention-days 90]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.database import SessionLocal
+from app.services.embedding_cache import EmbeddingCache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--retention-days', type=int, default=None)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        purged = EmbeddingCache(db).purge_expired(args.retention_days)
+        print(f"purged {purged} entries")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import asyncio
+import uuid
+
+import numpy as np
+
+from app.db.database import SessionLocal
+from app.services.answer_cache import AnswerCache, normalize_query
+from app.services.email_processor import EmailProcessor
+
+SCOPE = {'filters': None, 'llm_model': 'test-llm'}
+
+
+class FakeVertex:
+    embedding_model = 'test-embedding'
+    llm_model = 'test-llm'
+
+
+def unit(vector):
+    return vector / np.linalg.norm(vector)
+
+
+def cache_answer(db, user_id, query='What changed this week?', chunk_ids=(1, 2)):
+    embedding = unit(np.ones(1536))
+    AnswerCache(db, SCOPE).put(user_id, query, embedding, list(chunk_ids), 'Numbers are up.')
+    return embedding
+
+
+def test_queries_are_normalized():
+    assert normalize_query('  What   changed this WEEK?! ') == 'what changed this week'
+
+
+def test_same_query_is_answered_from_the_cache(db, user_id):
+    cache_answer(db, user_id)
+    assert AnswerCache(db, SCOPE).get(user_id, 'what changed  this week') == 'Numbers are up.'
+    assert AnswerCache(db, {**SCOPE, 'llm_model': 'other'}).get(user_id, 'What changed this week?') is None
+
+
+def test_near_duplicate_queries_need_the_same_chunks(db, user_id):
+    embedding = cache_answer(db, user_id)
+    nearby = unit(embedding + 0.01 * unit(np.random.default_rng(0).standard_normal(1536)))
+    cache = AnswerCache(db, SCOPE)
+    assert cache.get_similar(user_id, nearby, [2, 1]) == 'Numbers are up.'
+    assert cache.get_similar(user_id, nearby, [1, 3]) is None
+    assert cache.get_similar(user_id, unit(np.arange(1536) - 768.0), [1, 2]) is None
+
+
+def test_invalidation_commits_with_the_callers_transaction(db, user_id):
+    cache_answer(db, user_id)
+    writer = SessionLocal()
+    try:
+        AnswerCache.invalidate(writer, user_id)
+        # Readers keep getting the answer until the new chunks are committed
+        assert AnswerCache(db, SCOPE).get(user_id, 'What changed this week?') == 'Numbers are up.'
+        db.commit()
+        writer.commit()
+    finally:
+        writer.close()
+    assert AnswerCache(db, SCOPE).get(user_id, 'What changed this week?') is None
+
+
+def test_storing_new_chunks_drops_cached_answers(db, user_id):
+    cache_answer(db, user_id)
+    email = {
+        'id': uuid.uuid4().hex,
+        'threadId': 'thread-1',
+        'subject': 'Quarterly numbers',
+        'sender': 'Jo <jo@example.com>',
+        'timestamp': '1700000000000',
+        'labels': ['INBOX'],
+    }
+    processor = EmailProcessor(db, FakeVertex())
+    asyncio.run(processor._persist_batch(user_id, [(email, ['Numbers are down.'], [np.ones(1536)])]))
+    assert AnswerCache(db, SCOPE).get(user_id, 'What changed this week?') is None
@@ -0,0 +1,76 @@
+import numpy as np
+from sqlalchemy import insert, select, text
+
+from app.db.database import SessionLocal
+from app.models.document import DocumentChunk
+from app.services.chunk_partitions import DEFAULT_PARTITION, ChunkPartitions
+
+
+def store_chunks(db, user_id, count, start=0):
+    db.execute(insert(DocumentChunk), [
+        {
+            'user_id': user_id,
+            'source_type': 'email',
+            'source_id': f"message-{i}",
+            'chunk_index': 0,
+            'content': f"Chunk {i}",
+            'embedding': np.ones(1536),
+        }
+        for i in range(start, start + count)
+    ])
+    db.commit()
+
+
+def rows_in(db, table, user_id):
+    return set(db.scalars(text(f"SELECT source_id FROM {table} WHERE user_id = :user_id"), {"user_id": user_id}))
+
+
+def test_new_users_get_their_own_partition(db, user_id):
+    partitions = ChunkPartitions(db)
+    assert partitions.ensure(user_id)
+    assert user_id in partitions.partitioned_users()
+
+    store_chunks(db, user_id, 3)
+    assert len(rows_in(db, ChunkPartitions.partition_name(user_id), user_id)) == 3
+    assert rows_in(db, DEFAULT_PARTITION, user_id) == set()
+
+
+def test_users_with_chunks_in_the_default_partition_wait_for_a_move(db, user_id):
+    store_chunks(db, user_id, 3)
+    partitions = ChunkPartitions(db)
+    assert not partitions.ensure(user_id)
+    assert user_id in partitions.users_in_default()
+
+
+def test_move_takes_every_chunk_out_of_the_default_partition(db, user_id):
+    store_chunks(db, user_id, 7)
+    ids = set(db.scalars(select(DocumentChunk.id).where(DocumentChunk.user_id == user_id)))
+
+    partitions = ChunkPartitions(db)
+    assert partitions.move_user(user_id, batch_size=3) == 7
+    assert partitions.has_partition(user_id)
+    assert rows_in(db, DEFAULT_PARTITION, user_id) == set()
+    assert set(db.scalars(
+        text(f"SELECT id FROM {ChunkPartitions.partition_name(user_id)}")
+    )) == ids
+    assert partitions.move_user(user_id) == 0
+
+
+def test_chunks_written_during_a_move_are_kept(db, user_id, monkeypatch):
+    store_chunks(db, user_id, 5)
+    partitions = ChunkPartitions(db)
+    create_indexes = partitions._create_indexes
+
+    def ingest_then_index(name, rows=0):
+        # Another process stores chunks after the batches were copied
+        writer = SessionLocal()
+        try:
+            store_chunks(writer, user_id, 2, start=5)
+        finally:
+            writer.close()
+        create_indexes(name, rows)
+
+    monkeypatch.setattr(partitions, '_create_indexes', ingest_then_index)
+    assert partitions.move_user(user_id, batch_size=2) == 7
+    assert rows_in(db, ChunkPartitions.partition_name(user_id), user_id) == {f"message-{i}" for i in range(7)}
+    assert rows_in(db, DEFAULT_PARTITION, user_id) == set()
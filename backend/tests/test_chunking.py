@@ -0,0 +1,78 @@
+import pytest
+
+from app.services.chunking import TextChunker, clean_text, estimate_tokens, iter_sentences
+
+TEXT = " ".join(
+    f"Sentence number {i} talks about the quarterly report and the next steps{'!' if i % 5 == 0 else '.'}"
+    for i in range(60)
+)
+
+
+def test_estimate_tokens_rounds_up():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+
+
+def test_clean_text_strips_signature_and_collapses_whitespace():
+    assert clean_text("Hello   there,\n\nsee you soon.\n-- \nJane Doe\nCEO") == "Hello there, see you soon."
+
+
+def test_clean_text_strips_quoted_reply():
+    text = "Sounds good to me.\n\nOn Mon, Jan 1, 2024 at 9:00 AM Bob wrote:\n> Shall we meet?"
+    assert clean_text(text) == "Sounds good to me."
+
+
+def test_clean_text_strips_nested_quotes():
+    assert clean_text("Agreed.\n> > earlier message") == "Agreed."
+
+
+def test_iter_sentences_splits_on_terminal_punctuation():
+    assert list(iter_sentences(["One. Two! Three? Four"])) == ["One.", "Two!", "Three?", "Four"]
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 50])
+def test_iter_sentences_does_not_depend_on_piece_boundaries(size):
+    pieces = [TEXT[i:i + size] for i in range(0, len(TEXT), size)]
+    assert list(iter_sentences(pieces)) == list(iter_sentences([TEXT]))
+
+
+def test_iter_sentences_waits_for_whitespace_split_across_pieces():
+    assert list(iter_sentences(["First.", "  ", "Second."])) == ["First.", "Second."]
+
+
+def test_overlap_must_be_smaller_than_chunk():
+    with pytest.raises(ValueError):
+        TextChunker(chunk_tokens=16, overlap_tokens=16)
+
+
+def test_chunks_stay_within_the_token_cap():
+    chunks = TextChunker(chunk_tokens=64, overlap_tokens=16).chunk(TEXT)
+    assert len(chunks) > 1
+    assert max(estimate_tokens(chunk) for chunk in chunks) <= 64
+
+
+def test_joining_spaces_count_towards_the_cap():
+    # Eight characters is exactly two tokens, so only the spaces can overflow
+    chunks = TextChunker(chunk_tokens=8, overlap_tokens=2).chunk("Abcdefg. " * 20)
+    assert max(estimate_tokens(chunk) for chunk in chunks) <= 8
+
+
+def test_chunks_start_with_the_previous_chunks_tail():
+    chunks = TextChunker(chunk_tokens=64, overlap_tokens=24).chunk(TEXT)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        first_sentence = next(iter_sentences([chunk]))
+        assert previous.endswith(first_sentence)
+
+
+def test_chunks_cover_every_sentence():
+    chunks = TextChunker(chunk_tokens=64, overlap_tokens=16).chunk(TEXT)
+    chunked = {sentence for chunk in chunks for sentence in iter_sentences([chunk])}
+    assert chunked == set(iter_sentences([TEXT]))
+
+
+def test_long_sentences_are_split_on_whitespace():
+    sentence = " ".join(["lengthy"] * 200)
+    chunks = TextChunker(chunk_tokens=32, overlap_tokens=0).chunk(sentence)
+    assert all(estimate_tokens(chunk) <= 32 for chunk in chunks)
+    assert " ".join(chunks).split() == sentence.split()
@@ -0,0 +1,69 @@
+from types import SimpleNamespace
+
+from app.services.chunking import estimate_tokens
+from app.services.context_packer import ContextPacker
+
+
+def chunk(source_id, chunk_index, content, source_type='email'):
+    return SimpleNamespace(source_type=source_type, source_id=source_id, chunk_index=chunk_index, content=content)
+
+
+def test_chunks_are_grouped_by_source_in_rank_order():
+    chunks = [
+        chunk('b', 0, "Budget is approved."),
+        chunk('a', 3, "Launch moved to May."),
+        chunk('b', 1, "Hiring starts next week."),
+    ]
+    assert ContextPacker(1000).pack(chunks) == [
+        "Budget is approved. Hiring starts next week.",
+        "Launch moved to May.",
+    ]
+
+
+def test_chunks_are_put_back_in_document_order():
+    chunks = [chunk('a', 1, "Second part."), chunk('a', 0, "First part.")]
+    assert ContextPacker(1000).pack(chunks) == ["First part. Second part."]
+
+
+def test_sources_of_different_types_are_kept_apart():
+    chunks = [chunk('1', 0, "From an email."), chunk('1', 0, "From a document.", source_type='document')]
+    assert ContextPacker(1000).pack(chunks) == ["From an email.", "From a document."]
+
+
+def test_overlap_between_consecutive_chunks_appears_once():
+    chunks = [
+        chunk('a', 0, "The demo is on Friday. Bring the slides."),
+        chunk('a', 1, "Bring the slides. Lunch is provided."),
+    ]
+    assert ContextPacker(1000).pack(chunks) == ["The demo is on Friday. Bring the slides. Lunch is provided."]
+
+
+def test_sentences_repeated_across_sources_are_dropped():
+    chunks = [
+        chunk('a', 0, "Please review the contract."),
+        chunk('b', 0, "please  review the contract. Signed copy attached."),
+    ]
+    assert ContextPacker(1000).pack(chunks) == ["Please review the contract.", "Signed copy attached."]
+
+
+def test_gaps_between_chunks_are_marked():
+    chunks = [chunk('a', 0, "Opening remarks."), chunk('a', 4, "Closing remarks.")]
+    assert ContextPacker(1000).pack(chunks) == ["Opening remarks. ... Closing remarks."]
+
+
+def test_fully_duplicated_sources_are_left_out():
+    chunks = [chunk('a', 0, "Same text."), chunk('b', 0, "Same text.")]
+    assert ContextPacker(1000).pack(chunks) == ["Same text."]
+
+
+def test_packing_stops_at_the_token_budget():
+    sentences = [f"Sentence {i} has some words in it." for i in range(10)]
+    chunks = [chunk(str(i), 0, sentence) for i, sentence in enumerate(sentences)]
+    per_sentence = estimate_tokens(sentences[0]) + 1
+    passages = ContextPacker(per_sentence * 3).pack(chunks)
+    assert passages == sentences[:3]
+    assert ContextPacker(per_sentence * 3 - 1).pack(chunks) == sentences[:2]
+
+
+def test_empty_input():
+    assert ContextPacker(1000).pack([]) == []
@@ -0,0 +1,133 @@
+import asyncio
+import uuid
+
+import numpy as np
+import pytest
+from sqlalchemy import delete, insert, select
+
+from app.models.cache import EmbeddingCacheEntry
+from app.models.document import DocumentChunk, EmailMetadata
+from app.models.sync import MailboxSyncState
+from app.services.chunk_partitions import ChunkPartitions
+from app.services.email_processor import EmailProcessor
+from app.services.rag import RAGService
+from app.services.vector_search import ChunkFilters
+
+
+class FakeVertex:
+    embedding_model = 'test-embedding'
+    llm_model = 'test-llm'
+
+    async def generate_embeddings(self, texts):
+        return [np.random.rand(1536) for _ in texts]
+
+
+class FakeGmail:
+    """A mailbox whose messages in ``unavailable`` fail to fetch."""
+
+    def __init__(self, message_ids, unavailable=()):
+        self.message_ids = message_ids
+        self.unavailable = set(unavailable)
+
+    async def get_profile(self):
+        return {'historyId': '100'}
+
+    async def count_messages(self, label_id='INBOX'):
+        return len(self.message_ids)
+
+    async def iter_message_pages(self, page_token=None, page_size=100, label_ids=None, id_filter=None):
+        start = int(page_token or 0)
+        while True:
+            end = start + page_size
+            ids = self.message_ids[start:end]
+            next_page_token = str(end) if end < len(self.message_ids) else None
+            if id_filter is not None:
+                ids = id_filter(ids)
+            emails = [
+                {
+                    'id': message_id,
+                    'threadId': message_id,
+                    'subject': 'Update',
+                    'sender': 'Jo <jo@example.com>',
+                    'recipients': [],
+                    'content': f"Message {message_id} has its own news.",
+                    'timestamp': 1700000000000,
+                    'labels': ['INBOX'],
+                }
+                for message_id in ids
+                if message_id not in self.unavailable
+            ]
+            yield emails, ids, next_page_token
+            if next_page_token is None:
+                return
+            start = end
+
+
+@pytest.fixture
+def cached_embeddings(db):
+    """Removes the embeddings the test's fake model cached."""
+    yield
+    db.execute(delete(EmbeddingCacheEntry).where(EmbeddingCacheEntry.model == FakeVertex.embedding_model))
+    db.commit()
+
+
+def store_email(db, user_id, processor, labels):
+    email = {
+        'id': uuid.uuid4().hex,
+        'threadId': 'thread-1',
+        'subject': 'Quarterly numbers',
+        'sender': 'Jo <jo@example.com>',
+        'timestamp': '1700000000000',
+        'labels': labels,
+    }
+    db.execute(insert(EmailMetadata).values(processor._metadata_row(user_id, email)))
+    db.execute(insert(DocumentChunk), processor._chunk_rows(user_id, email, ["Numbers are up."], [np.ones(1536)]))
+    db.commit()
+    return email['id']
+
+
+def test_relabelled_messages_match_label_filters(db, user_id):
+    ChunkPartitions(db).ensure(user_id)
+    processor = EmailProcessor(db, FakeVertex())
+    email_id = store_email(db, user_id, processor, ['INBOX'])
+    rag = RAGService(db, FakeVertex())
+
+    def labelled(label):
+        chunks = asyncio.run(rag._retrieve_relevant_chunks(
+            user_id, np.ones(1536) / np.sqrt(1536), 5, filters=ChunkFilters(labels=[label])
+        ))
+        db.commit()
+        return [chunk.source_id for chunk in chunks]
+
+    assert labelled('Label_7') == []
+
+    processor._apply_label_updates(user_id, {email_id: ['INBOX', 'Label_7'], 'unknown': ['Label_7']})
+    assert labelled('Label_7') == [email_id]
+    metadata = db.query(EmailMetadata).filter(EmailMetadata.email_id == email_id).one()
+    assert metadata.labels == ['INBOX', 'Label_7']
+
+    processor._apply_label_updates(user_id, {email_id: ['INBOX']})
+    assert labelled('Label_7') == []
+    assert labelled('INBOX') == [email_id]
+
+
+def test_backfill_holds_its_checkpoint_until_every_message_is_stored(db, user_id, cached_embeddings):
+    message_ids = [f"{uuid.uuid4().hex}-{i}" for i in range(6)]
+    gmail = FakeGmail(message_ids, unavailable=[message_ids[3]])
+    processor = EmailProcessor(db, FakeVertex())
+
+    def stored():
+        return set(db.scalars(select(EmailMetadata.email_id).where(EmailMetadata.user_id == user_id)))
+
+    asyncio.run(processor.backfill(user_id, gmail, page_size=2))
+    state = db.get(MailboxSyncState, user_id)
+    assert stored() == set(message_ids) - {message_ids[3]}
+    # The page after the first one is where the missing message was listed
+    assert state.backfill_page_token == '2'
+    assert state.backfill_completed_at is None
+
+    gmail.unavailable.clear()
+    asyncio.run(processor.backfill(user_id, gmail, page_size=2))
+    db.refresh(state)
+    assert stored() == set(message_ids)
+    assert state.backfill_completed_at is not None
@@ -0,0 +1,87 @@
+import asyncio
+import uuid
+
+import numpy as np
+import pytest
+from sqlalchemy import delete, func, select
+
+from app.db.database import SessionLocal
+from app.models.cache import EmbeddingCacheEntry
+from app.services.embedding_cache import EmbeddingCache
+
+
+class FakeModel:
+    """Embeds texts by their length, recording every text it is sent."""
+
+    def __init__(self, fail=()):
+        self.sent = []
+        self.fail = set(fail)
+
+    async def embed(self, texts):
+        self.sent.extend(texts)
+        await asyncio.sleep(0.01)
+        return [None if text in self.fail else np.full(1536, len(text), dtype=np.float32) for text in texts]
+
+
+@pytest.fixture
+def model(db):
+    """A model name of the test's own, whose entries are deleted afterwards."""
+    name = f"test-{uuid.uuid4().hex}"
+    yield name
+    db.execute(delete(EmbeddingCacheEntry).where(EmbeddingCacheEntry.model == name))
+    db.commit()
+
+
+def test_repeated_texts_are_embedded_once(db, model):
+    fake = FakeModel()
+    embeddings = asyncio.run(EmbeddingCache(db, model).embed(["one", "three", "one"], fake.embed))
+    assert sorted(fake.sent) == ["one", "three"]
+    assert [embedding[0] for embedding in embeddings] == [3, 5, 3]
+
+
+def test_stored_embeddings_are_reused_by_other_processes(db, model):
+    asyncio.run(EmbeddingCache(db, model).embed(["hello"], FakeModel().embed))
+    # Another process starts with an empty LRU
+    EmbeddingCache._memory.clear()
+    fake = FakeModel()
+    embeddings = asyncio.run(EmbeddingCache(db, model).embed(["hello"], fake.embed))
+    assert fake.sent == []
+    assert embeddings[0][0] == 5
+
+
+def test_models_do_not_share_entries(db, model):
+    asyncio.run(EmbeddingCache(db, model).embed(["hello"], FakeModel().embed))
+    fake = FakeModel()
+    other_model = f"{model}-other"
+    try:
+        asyncio.run(EmbeddingCache(db, other_model).embed(["hello"], fake.embed))
+    finally:
+        db.execute(delete(EmbeddingCacheEntry).where(EmbeddingCacheEntry.model == other_model))
+        db.commit()
+    assert fake.sent == ["hello"]
+
+
+def test_failed_embeddings_are_not_cached(db, model):
+    embeddings = asyncio.run(EmbeddingCache(db, model).embed(["good", "bad"], FakeModel(fail=["bad"]).embed))
+    assert embeddings[1] is None
+    fake = FakeModel()
+    asyncio.run(EmbeddingCache(db, model).embed(["good", "bad"], fake.embed))
+    assert fake.sent == ["bad"]
+
+
+def test_concurrent_misses_store_one_entry(db, model):
+    sessions = [SessionLocal(), SessionLocal()]
+
+    async def embed_concurrently():
+        caches = [EmbeddingCache(session, model) for session in sessions]
+        return await asyncio.gather(*(cache.embed(["shared text"], FakeModel().embed) for cache in caches))
+
+    try:
+        results = asyncio.run(embed_concurrently())
+    finally:
+        for session in sessions:
+            session.close()
+    assert [result[0][0] for result in results] == [11, 11]
+    assert db.scalar(
+        select(func.count()).select_from(EmbeddingCacheEntry).where(EmbeddingCacheEntry.model == model)
+    ) == 1
@@ -0,0 +1,64 @@
+import time
+
+from app.services.ingest_stats import STAGE_UNITS, IngestionStats
+
+
+def test_counts_add_up():
+    stats = IngestionStats()
+    stats.add(listed=10, skipped=4)
+    stats.add(listed=5, fetched=11)
+    snapshot = stats.snapshot()
+    assert (snapshot['listed'], snapshot['skipped'], snapshot['fetched']) == (15, 4, 11)
+
+
+def test_fresh_run_has_no_bottleneck_or_eta():
+    snapshot = IngestionStats(total=100).snapshot()
+    assert snapshot['bottleneck'] is None
+    assert snapshot['eta_seconds'] is None
+    assert set(snapshot['stages']) == set(STAGE_UNITS)
+    assert all(stage['per_second'] is None for stage in snapshot['stages'].values())
+
+
+def test_stage_time_is_accumulated_even_on_errors():
+    stats = IngestionStats()
+    with stats.stage('embed'):
+        time.sleep(0.01)
+    try:
+        with stats.stage('embed'):
+            time.sleep(0.01)
+            raise RuntimeError('request failed')
+    except RuntimeError:
+        pass
+    assert stats.stage_seconds['embed'] >= 0.02
+
+
+def test_throughput_is_reported_in_each_stages_unit():
+    stats = IngestionStats()
+    stats.stage_seconds['persist'] = 2.0
+    stats.add(rows_written=100)
+    stage = stats.snapshot()['stages']['persist']
+    assert stage['unit'] == 'rows_written'
+    assert stage['per_second'] == 50.0
+
+
+def test_busiest_stage_is_the_bottleneck():
+    stats = IngestionStats()
+    stats.stage_seconds.update(fetch=1.0, embed=3.0, persist=0.5)
+    assert stats.snapshot()['bottleneck'] == 'embed'
+
+
+def test_eta_counts_skipped_and_persisted_messages():
+    stats = IngestionStats(total=100)
+    stats.started -= 10
+    stats.add(skipped=10, persisted=40)
+    snapshot = stats.snapshot()
+    # 50 messages in about 10s leaves about 10s for the other 50
+    assert 9 <= snapshot['eta_seconds'] <= 10.5
+    assert 4.5 <= snapshot['messages_per_second'] <= 5.5
+
+
+def test_eta_never_goes_negative():
+    stats = IngestionStats(total=10)
+    stats.started -= 1
+    stats.add(persisted=12)
+    assert stats.snapshot()['eta_seconds'] == 0
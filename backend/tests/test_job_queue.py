@@ -0,0 +1,113 @@
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from app.db.database import SessionLocal
+from app.models.job import IngestionJob
+from app.services.job_queue import JobQueue
+
+
+def queue_jobs(db, user_id, kinds):
+    """Queue jobs that sort ahead of any other queued job in the database."""
+    queue = JobQueue(db)
+    job_ids = [queue.enqueue(user_id, kind).id for kind in kinds]
+    db.execute(
+        update(IngestionJob)
+        .where(IngestionJob.id.in_(job_ids))
+        .values(run_after=datetime(2000, 1, 1))
+    )
+    db.commit()
+    return job_ids
+
+
+def test_enqueue_returns_the_active_job_of_the_same_kind(db, user_id):
+    queue = JobQueue(db)
+    job = queue.enqueue(user_id, 'sync')
+    assert queue.enqueue(user_id, 'sync').id == job.id
+    assert queue.enqueue(user_id, 'backfill').id != job.id
+
+    claimed = queue.claim('worker-a')
+    queue.complete(claimed, 'worker-a', {})
+    assert queue.enqueue(user_id, 'sync').id != job.id
+
+
+def test_concurrent_workers_claim_different_jobs(user_id, db):
+    job_ids = queue_jobs(db, user_id, ['sync', 'backfill'])
+    barrier = threading.Barrier(2)
+    claimed = {}
+
+    def work(worker_id):
+        session = SessionLocal()
+        try:
+            barrier.wait()
+            claimed[worker_id] = JobQueue(session).claim(worker_id).id
+        finally:
+            session.close()
+
+    workers = [threading.Thread(target=work, args=(f"worker-{i}",)) for i in range(2)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert sorted(claimed.values()) == sorted(job_ids)
+
+
+def test_stale_worker_cannot_finish_a_requeued_job(db, user_id):
+    queue = JobQueue(db)
+    job_id, = queue_jobs(db, user_id, ['sync'])
+    stale = queue.claim('worker-a')
+    assert stale.id == job_id
+    db.execute(
+        update(IngestionJob)
+        .where(IngestionJob.id == job_id)
+        .values(locked_at=datetime.utcnow() - timedelta(hours=1))
+    )
+    db.commit()
+
+    assert queue.requeue_stale(60) >= 1
+    db.execute(update(IngestionJob).where(IngestionJob.id == job_id).values(run_after=datetime(2000, 1, 1)))
+    db.commit()
+    assert queue.claim('worker-b').id == job_id
+
+    queue.complete(stale, 'worker-a', {'stored': 1})
+    queue.fail(stale, 'worker-a', 'late failure')
+    job = queue.get_job(job_id)
+    db.refresh(job)
+    assert job.status == 'running'
+    assert job.locked_by == 'worker-b'
+    assert job.last_error == 'Worker stopped responding'
+
+
+def test_failed_jobs_are_retried_until_attempts_run_out(db, user_id):
+    queue = JobQueue(db)
+    job_id, = queue_jobs(db, user_id, ['sync'])
+    db.execute(update(IngestionJob).where(IngestionJob.id == job_id).values(max_attempts=2))
+    db.commit()
+
+    job = queue.claim('worker-a')
+    queue.fail(job, 'worker-a', 'boom')
+    db.refresh(job)
+    assert job.status == 'queued'
+    assert job.run_after > datetime.utcnow()
+    assert job.locked_by is None
+
+    db.execute(update(IngestionJob).where(IngestionJob.id == job_id).values(run_after=datetime(2000, 1, 1)))
+    db.commit()
+    job = queue.claim('worker-a')
+    assert job.attempts == 2
+    queue.fail(job, 'worker-a', 'boom again')
+    db.refresh(job)
+    assert job.status == 'failed'
+    assert job.finished_at is not None
+
+
+def test_released_jobs_do_not_use_an_attempt(db, user_id):
+    queue = JobQueue(db)
+    queue_jobs(db, user_id, ['sync'])
+    job = queue.claim('worker-a')
+    queue.release(job, 'worker-a')
+    db.refresh(job)
+    assert job.status == 'queued'
+    assert job.attempts == 0
@@ -0,0 +1,100 @@
+import base64
+
+from app.services.mime import decode_body, extract_body, html_to_text, parse_message
+
+
+def encode(text):
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip('=')
+
+
+def part(mime_type, text, **extra):
+    return {'mimeType': mime_type, 'body': {'data': encode(text)}, **extra}
+
+
+def test_decode_body_restores_padding():
+    assert decode_body(encode("hello"), 100) == b"hello"
+
+
+def test_decode_body_keeps_at_most_max_bytes():
+    for max_bytes in range(1, 12):
+        assert decode_body(encode("abcdefghijk"), max_bytes) == b"abcdefghijk"[:max_bytes]
+
+
+def test_html_to_text_drops_scripts_and_breaks_blocks():
+    markup = (
+        "<html><head><title>x</title></head><body><style>p {}</style>"
+        "<p>First&nbsp;line</p><div>Second <b>line</b></div><script>alert(1)</script></body></html>"
+    )
+    text = html_to_text(markup)
+    assert [line.strip() for line in text.splitlines()] == ["First\xa0line", "Second line"]
+
+
+def test_plain_text_is_preferred_over_html():
+    payload = {
+        'mimeType': 'multipart/alternative',
+        'parts': [part('text/plain', "Plain body"), part('text/html', "<p>HTML body</p>")],
+    }
+    assert extract_body(payload, 1000) == "Plain body"
+
+
+def test_html_is_used_when_there_is_no_plain_text():
+    payload = {'mimeType': 'multipart/alternative', 'parts': [part('text/html', "<p>HTML body</p>")]}
+    assert extract_body(payload, 1000) == "HTML body"
+
+
+def test_attachments_are_skipped():
+    payload = {
+        'mimeType': 'multipart/mixed',
+        'parts': [
+            part('text/plain', "Body"),
+            part('text/plain', "notes.txt contents", filename='notes.txt'),
+            {'mimeType': 'text/plain', 'body': {'attachmentId': 'a1', 'size': 10}},
+        ],
+    }
+    assert extract_body(payload, 1000) == "Body"
+
+
+def test_nested_parts_share_one_byte_budget():
+    payload = {
+        'mimeType': 'multipart/mixed',
+        'parts': [
+            {'mimeType': 'multipart/alternative', 'parts': [part('text/plain', "x" * 30)]},
+            part('text/plain', "y" * 30),
+        ],
+    }
+    body = extract_body(payload, 40)
+    assert len(body.replace('\n', '')) == 40
+
+
+def test_parse_message():
+    message = {
+        'id': 'm1',
+        'threadId': 't1',
+        'internalDate': '1700000000000',
+        'labelIds': ['INBOX', 'UNREAD'],
+        'payload': {
+            'mimeType': 'text/plain',
+            'headers': [
+                {'name': 'Subject', 'value': 'Quarterly report'},
+                {'name': 'From', 'value': 'Jane <jane@example.com>'},
+                {'name': 'To', 'value': 'a@example.com,b@example.com'},
+            ],
+            'body': {'data': encode("See attached.")},
+        },
+    }
+    assert parse_message(message, 1000) == {
+        'id': 'm1',
+        'threadId': 't1',
+        'subject': 'Quarterly report',
+        'sender': 'Jane <jane@example.com>',
+        'recipients': ['a@example.com', 'b@example.com'],
+        'content': 'See attached.',
+        'timestamp': 1700000000000,
+        'labels': ['INBOX', 'UNREAD'],
+    }
+
+
+def test_parse_message_without_headers():
+    message = {'id': 'm2', 'threadId': 't2', 'internalDate': '0', 'payload': {'mimeType': 'text/plain', 'body': {}}}
+    parsed = parse_message(message, 1000)
+    assert (parsed['subject'], parsed['sender'], parsed['content'], parsed['labels']) == ('', '', '', [])
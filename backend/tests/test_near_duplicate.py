@@ -0,0 +1,92 @@
+import random
+
+import pytest
+
+from app.services.near_duplicate import (
+    BAND_COUNT,
+    NearDuplicateIndex,
+    bands,
+    hamming_distance,
+    simhash,
+    to_signed,
+)
+
+NEWSLETTER = (
+    "Your order number {n} has shipped and is on its way. Track your package with the "
+    "carrier link below. Thanks for shopping with Example Store, we hope you enjoy your "
+    "purchase and come back soon. Questions? Reply to this email or visit our help center "
+    "any time day or night for support with returns and refunds."
+)
+
+
+def unrelated(seed):
+    rng = random.Random(seed)
+    return " ".join(f"word{rng.randrange(10000)}" for _ in range(60))
+
+
+def test_short_text_has_no_fingerprint():
+    assert simhash("Thanks, see you tomorrow.") is None
+
+
+def test_fingerprint_ignores_case_and_punctuation():
+    text = NEWSLETTER.format(n=1)
+    assert simhash(text) == simhash(text.upper().replace(',', ''))
+
+
+def test_near_duplicates_are_close_and_unrelated_text_is_not():
+    text = NEWSLETTER.format(n=1001)
+    assert hamming_distance(simhash(text), simhash(text + " Unsubscribe here.")) <= 6
+    assert hamming_distance(simhash(unrelated(1)), simhash(unrelated(2))) > 7
+
+
+def test_bands_reassemble_the_fingerprint():
+    fingerprint = simhash(NEWSLETTER.format(n=1))
+    parts = bands(fingerprint)
+    assert len(parts) == BAND_COUNT
+    assert sum(band << (8 * i) for i, band in enumerate(parts)) == fingerprint
+
+
+def test_fingerprints_within_seven_bits_share_a_band():
+    rng = random.Random(7)
+    for _ in range(500):
+        fingerprint = rng.getrandbits(64)
+        flipped = fingerprint
+        for bit in rng.sample(range(64), 7):
+            flipped ^= 1 << bit
+        assert set(enumerate(bands(fingerprint))) & set(enumerate(bands(flipped)))
+
+
+def test_to_signed_fits_bigint():
+    assert to_signed(0) == 0
+    assert to_signed((1 << 63) - 1) == (1 << 63) - 1
+    assert to_signed(1 << 63) == -(1 << 63)
+    assert to_signed((1 << 64) - 1) == -1
+
+
+def test_distance_beyond_the_bands_is_rejected():
+    with pytest.raises(ValueError):
+        NearDuplicateIndex(None, max_distance=BAND_COUNT)
+
+
+def test_batch_links_near_duplicates_to_the_first_email(monkeypatch):
+    index = NearDuplicateIndex(None, max_distance=6)
+    monkeypatch.setattr(index, '_find_stored_canonicals', lambda user_id, fingerprints: {})
+    text = NEWSLETTER.format(n=1001)
+    fingerprints = {
+        'a': simhash(text),
+        'b': simhash(unrelated(1)),
+        'c': simhash(text + " Unsubscribe here."),
+    }
+    assert index.find_canonicals(1, fingerprints) == {'c': 'a'}
+
+
+def test_stored_matches_take_precedence_over_the_batch(monkeypatch):
+    index = NearDuplicateIndex(None, max_distance=6)
+    monkeypatch.setattr(index, '_find_stored_canonicals', lambda user_id, fingerprints: {'a': 'stored'})
+    text = NEWSLETTER.format(n=1001)
+    fingerprints = {
+        'a': simhash(text),
+        'c': simhash(text + " Unsubscribe here."),
+    }
+    # 'a' is a duplicate itself, so it cannot be 'c's canonical
+    assert index.find_canonicals(1, fingerprints) == {'a': 'stored'}
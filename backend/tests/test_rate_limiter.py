@@ -0,0 +1,74 @@
+import asyncio
+import time
+import uuid
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+from sqlalchemy import delete
+
+from app.models.rate_limit import RateLimitBucket
+from app.services.rate_limiter import RateLimiter, retry_after_seconds
+
+
+def http_error(status, headers=None, content=b''):
+    return HttpError(httplib2.Response({'status': status, **(headers or {})}), content)
+
+
+@pytest.fixture
+def limiter(db):
+    """A Gmail limiter drawing from a bucket of the test's own, at 40 units a second."""
+    key = f"test:{uuid.uuid4().hex}:global"
+    limiter = RateLimiter('gmail')
+    limiter.global_rate = 40
+    limiter._keys = lambda: [key]
+    yield limiter
+    RateLimiter._leases.pop(key, None)
+    db.execute(delete(RateLimitBucket).where(RateLimitBucket.key == key))
+    db.commit()
+
+
+def test_retry_after_is_read_from_rate_limit_errors():
+    assert retry_after_seconds(http_error(429, {'retry-after': '3'})) == 3.0
+    assert retry_after_seconds(http_error(429)) == 0.0
+    assert retry_after_seconds(http_error(403, content=b'{"reason": "rateLimitExceeded"}')) == 0.0
+    assert retry_after_seconds(http_error(403, content=b'{"reason": "forbidden"}')) is None
+    assert retry_after_seconds(http_error(500)) is None
+    assert retry_after_seconds(ValueError('not an HTTP error')) is None
+
+
+def test_concurrent_callers_share_the_budget(limiter):
+    async def scenario():
+        await asyncio.gather(*(limiter.acquire() for _ in range(80)))
+
+    started = time.monotonic()
+    asyncio.run(scenario())
+    # A full bucket covers the first 40 units, the rest refill at 40 a second
+    assert time.monotonic() - started >= 0.9
+
+
+def test_rate_limit_errors_block_the_bucket(limiter):
+    async def scenario():
+        await limiter.acquire()
+        assert limiter.penalize(0.5) == 0.5
+        started = time.monotonic()
+        await limiter.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) >= 0.45
+
+
+def test_calls_are_retried_after_rate_limit_errors(limiter, monkeypatch):
+    penalties = []
+    monkeypatch.setattr(limiter, 'penalize', lambda retry_after=None: penalties.append(retry_after) or 0.0)
+    responses = [http_error(429, {'retry-after': '1'}), http_error(429), 'done']
+
+    async def fn():
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    assert asyncio.run(limiter.call(fn)) == 'done'
+    # A 429 without Retry-After falls back to the bucket's backoff
+    assert penalties == [1.0, None]
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from app.services.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        flight = SingleFlight('test')
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 'answer'
+
+        results = await asyncio.gather(*(flight.do('key', fetch) for _ in range(5)))
+        return results, calls, flight.metrics()
+
+    results, calls, metrics = asyncio.run(scenario())
+    assert results == ['answer'] * 5
+    assert len(calls) == 1
+    assert metrics == {'calls': 1, 'saved': 4, 'in_flight': 0, 'saved_rate': 0.8}
+
+
+def test_different_keys_are_not_coalesced():
+    async def scenario():
+        flight = SingleFlight('test')
+
+        async def echo(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        return await asyncio.gather(flight.do('a', lambda: echo('a')), flight.do('b', lambda: echo('b')))
+
+    assert asyncio.run(scenario()) == ['a', 'b']
+
+
+def test_results_are_not_kept_after_the_call():
+    async def scenario():
+        flight = SingleFlight('test')
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            return len(calls)
+
+        return await flight.do('key', fetch), await flight.do('key', fetch)
+
+    assert asyncio.run(scenario()) == (1, 2)
+
+
+def test_errors_reach_every_caller():
+    async def scenario():
+        flight = SingleFlight('test')
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError('upstream failed')
+
+        return await asyncio.gather(flight.do('key', fail), flight.do('key', fail), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert [type(result) for result in results] == [ValueError, ValueError]
+
+
+def test_one_caller_giving_up_does_not_cancel_the_others():
+    async def scenario():
+        flight = SingleFlight('test')
+
+        async def fetch():
+            await asyncio.sleep(0.05)
+            return 'answer'
+
+        impatient = asyncio.create_task(flight.do('key', fetch))
+        patient = asyncio.create_task(flight.do('key', fetch))
+        await asyncio.sleep(0.01)
+        impatient.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await impatient
+        return await patient
+
+    assert asyncio.run(scenario()) == 'answer'
+
+
+def test_call_is_cancelled_once_every_caller_gives_up():
+    async def scenario():
+        flight = SingleFlight('test')
+        cancelled = asyncio.Event()
+
+        async def fetch():
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        callers = [asyncio.create_task(flight.do('key', fetch)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.wait_for(cancelled.wait(), 1)
+        return flight.metrics()['in_flight']
+
+    assert asyncio.run(scenario()) == 0
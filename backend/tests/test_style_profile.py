@@ -0,0 +1,101 @@
+from app.services.style_profile import (
+    MAX_SENTENCE_WORDS,
+    compute_stats,
+    empty_stats,
+    merge_stats,
+    summarize_stats,
+    truncate_stats,
+)
+
+EMAIL = [
+    ('e1', "Hi Sam, the quarterly report is ready. Can you review the quarterly report?", True, False),
+    ('e1', "Can you review the quarterly report? I'd love feedback by Friday! Thanks, Alex", False, True),
+]
+
+
+def test_empty_stats_summarize_to_nothing():
+    summary = summarize_stats(empty_stats())
+    assert summary['emails'] == 0
+    assert summary['avg_sentence_words'] is None
+    assert summary['sentence_words_p50'] is None
+    assert summary['greetings'] == {}
+    assert summary['common_phrases'] == []
+
+
+def test_compute_stats_counts_each_sentence_once_per_email():
+    stats = compute_stats(EMAIL)
+    assert stats['emails'] == 1
+    # The overlapping question opens the second chunk but is counted once
+    assert stats['sentences'] == 4
+    assert stats['questions'] == 1
+    assert stats['exclamations'] == 1
+    assert stats['contractions'] == 1
+    assert sum(stats['sentence_length_hist']) == 4
+
+
+def test_sentences_shared_by_different_emails_are_counted_for_each():
+    rows = [('e1', "See you soon.", True, True), ('e2', "See you soon.", True, True)]
+    assert compute_stats(rows)['sentences'] == 2
+
+
+def test_compute_stats_finds_greetings_and_sign_offs():
+    stats = compute_stats(EMAIL)
+    assert stats['greetings'] == {'hi': 1}
+    assert stats['sign_offs'] == {'thanks': 1}
+
+
+def test_greetings_are_only_read_from_first_chunks():
+    assert compute_stats([('e1', "Hello there.", False, False)])['greetings'] == {}
+
+
+def test_phrases_are_counted_without_stopword_only_ones():
+    stats = compute_stats(EMAIL)
+    assert stats['ngrams']['quarterly report'] == 2
+    assert stats['ngrams']['the quarterly report'] == 2
+    assert stats['ngrams']['love feedback'] == 1
+    assert 'is ready' in stats['ngrams']
+    assert 'you review the' in stats['ngrams']
+    assert set(compute_stats([('e2', "It is on the list.", True, True)])['ngrams']) == {'the list', 'on the list'}
+
+
+def test_long_sentences_share_the_last_bin():
+    stats = compute_stats([('e1', " ".join(["word"] * (MAX_SENTENCE_WORDS + 20)) + ".", True, True)])
+    assert stats['sentence_length_hist'][MAX_SENTENCE_WORDS] == 1
+    assert stats['words'] == MAX_SENTENCE_WORDS + 20
+
+
+def test_merging_matches_computing_at_once():
+    first = [('e1', "Hello team. The launch is on track.", True, True)]
+    second = [('e2', "Hello team. The launch is on track? Cheers", True, True)]
+    assert merge_stats(compute_stats(first), compute_stats(second)) == compute_stats(first + second)
+
+
+def test_merge_keeps_every_phrase():
+    a = dict(empty_stats(), ngrams={'quarterly report': 5, 'next steps': 1})
+    b = dict(empty_stats(), ngrams={'quarterly report': 1, 'launch date': 3})
+    assert merge_stats(a, b)['ngrams'] == {'quarterly report': 6, 'next steps': 1, 'launch date': 3}
+
+
+def test_truncate_keeps_the_most_frequent_phrases():
+    stats = dict(empty_stats(), ngrams={'quarterly report': 6, 'next steps': 1, 'launch date': 3})
+    truncated = truncate_stats(stats, max_ngrams=2)
+    assert truncated['ngrams'] == {'quarterly report': 6, 'launch date': 3}
+    assert stats['ngrams']['next steps'] == 1
+
+
+def test_summarize_stats():
+    stats = empty_stats()
+    stats.update(emails=4, sentences=4, words=20, word_chars=90, questions=1, contractions=2,
+                 greetings={'hi': 3}, sign_offs={'thanks': 2})
+    for length in (2, 4, 6, 8):
+        stats['sentence_length_hist'][length] += 1
+    summary = summarize_stats(stats)
+    assert summary['avg_sentence_words'] == 5.0
+    assert summary['sentence_words_std'] == 2.2
+    assert summary['sentence_words_p50'] == 4
+    assert summary['sentence_words_p90'] == 8
+    assert summary['avg_word_chars'] == 4.5
+    assert summary['question_rate'] == 0.25
+    assert summary['contraction_rate'] == 0.1
+    assert summary['greetings'] == {'hi': 0.75}
+    assert summary['sign_offs'] == {'thanks': 0.5}
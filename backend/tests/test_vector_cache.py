@@ -0,0 +1,114 @@
+import threading
+
+import numpy as np
+import pytest
+from sqlalchemy import delete, func, insert, select
+
+from app.db.database import SessionLocal
+from app.models.document import DocumentChunk
+from app.services import vector_cache
+from app.services.vector_cache import VectorCache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch, user_id):
+    monkeypatch.setattr(vector_cache.settings, 'VECTOR_CACHE_ENABLED', True)
+    yield VectorCache(str(tmp_path))
+    VectorCache._mapped.pop(user_id, None)
+    VectorCache._queries.pop(user_id, None)
+
+
+def store_chunks(db, user_id, count, rng):
+    embeddings = rng.standard_normal((count, 1536))
+    ids = db.scalars(insert(DocumentChunk).returning(DocumentChunk.id), [
+        {
+            'user_id': user_id,
+            'source_type': 'email',
+            'source_id': f"message-{i}",
+            'chunk_index': 0,
+            'content': f"Chunk {i}",
+            'embedding': embedding,
+        }
+        for i, embedding in enumerate(embeddings)
+    ]).all()
+    db.commit()
+    return dict(zip(ids, embeddings))
+
+
+def exact_top(chunks, query, k):
+    ids = list(chunks)
+    vectors = np.stack([chunks[chunk_id] for chunk_id in ids])
+    scores = vectors @ query / np.linalg.norm(vectors, axis=1)
+    return [ids[i] for i in np.argsort(-scores)[:k]]
+
+
+def cached_ids(cache, user_id):
+    return sorted(int(chunk_id) for chunk_id in cache._map(user_id).ids)
+
+
+def test_users_are_searched_in_postgres_until_cached(db, user_id, cache):
+    store_chunks(db, user_id, 5, np.random.default_rng(0))
+    assert cache.search(user_id, np.ones(1536), 3) is None
+    assert cache.build(user_id) == 5
+    assert cache.search(user_id, np.ones(1536), 3) is not None
+
+
+def test_search_ranks_like_an_exact_scan(db, user_id, cache):
+    rng = np.random.default_rng(1)
+    chunks = store_chunks(db, user_id, 50, rng)
+    cache.build(user_id)
+    query = rng.standard_normal(1536)
+    query /= np.linalg.norm(query)
+
+    results = cache.search(user_id, query, 5)
+    assert [chunk_id for chunk_id, _ in results] == exact_top(chunks, query, 5)
+    assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+
+
+def test_new_chunks_are_appended_and_seen_by_mapped_readers(db, user_id, cache):
+    rng = np.random.default_rng(2)
+    chunks = store_chunks(db, user_id, 10, rng)
+    cache.build(user_id)
+    mapped = cache._map(user_id)
+    assert cache._map(user_id) is mapped
+
+    chunks.update(store_chunks(db, user_id, 4, rng))
+    assert cache.extend(db, user_id) == 4
+    assert cached_ids(cache, user_id) == sorted(chunks)
+
+
+def test_files_out_of_line_with_postgres_are_rebuilt(db, user_id, cache):
+    chunks = store_chunks(db, user_id, 10, np.random.default_rng(3))
+    cache.build(user_id)
+    deleted = min(chunks)
+    db.execute(delete(DocumentChunk).where(DocumentChunk.user_id == user_id, DocumentChunk.id == deleted))
+    db.commit()
+
+    cache.extend(db, user_id)
+    assert cached_ids(cache, user_id) == sorted(set(chunks) - {deleted})
+
+
+def test_concurrent_appends_cache_each_chunk_once(db, user_id, cache):
+    rng = np.random.default_rng(4)
+    store_chunks(db, user_id, 5, rng)
+    cache.build(user_id)
+    store_chunks(db, user_id, 20, rng)
+    barrier = threading.Barrier(4)
+
+    def append():
+        session = SessionLocal()
+        try:
+            barrier.wait()
+            VectorCache(cache.directory).extend(session, user_id)
+        finally:
+            session.close()
+
+    writers = [threading.Thread(target=append) for _ in range(4)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+
+    stored = db.scalar(select(func.count()).select_from(DocumentChunk).where(DocumentChunk.user_id == user_id))
+    assert cache._map(user_id).meta['rows'] == stored
+    assert len(set(cached_ids(cache, user_id))) == stored